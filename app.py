@@ -1,17 +1,14 @@
 
 import streamlit as st
-import pandas as pd
-import sys
 import os
-import time
 from datetime import datetime, date
 
-# Add current directory to path so we can import tools
-sys.path.append(os.getcwd())
-
-from tools.fattoboost_client import fetch_fattoboost_month
-from tools.dataforseo_client import fetch_keyword_trends
-from tools.report_builder import generate_report
+from tools.pipeline import extract_domain
+from tools.run_checkpoint import RunCheckpoint
+from tools.response_cache import credential_scope
+from tools.periods import plan_year
+from tools.job_queue import get_default_job_queue
+from tools import telemetry
 
 st.set_page_config(page_title="Opportunity Engine 2025", layout="wide")
 
@@ -43,6 +40,7 @@ with st.expander("📚 Guida all'uso (Tutorial)", expanded=True):
     *   Scarica il file che conterrà:
         *   12 tab mensili con i dati grezzi.
         *   1 tab di **Riepilogo** con metriche aggregate (Clic Totali, Mese Primo Clic, Mese Picco, Trend 7/30gg).
+        *   1 tab **Changes** con le query/pagine nuove, perse o con click molto cambiati rispetto all'analisi precedente e al mese precedente.
     """)
 
 # --- Sidebar Inputs ---
@@ -58,157 +56,270 @@ gsc_property = st.sidebar.text_input("Proprietà GSC", value="sc-domain:naturasi
 
 # 3. Settings
 country = st.sidebar.selectbox("Paese", ["ITA", "USA", "UK"])
+year = st.sidebar.number_input("Anno", min_value=2015, max_value=date.today().year, value=2025, step=1)
+GRANULARITY_LABELS = {"month": "Mensile", "week": "Settimanale"}
+granularity = st.sidebar.selectbox("Finestre di estrazione", list(GRANULARITY_LABELS), format_func=GRANULARITY_LABELS.get, help="Un foglio del report per ogni mese o per ogni settimana")
 analyze_trends = st.sidebar.checkbox("Arricchisci con Trends (DataForSEO)", value=True)
+trend_budget_calls = st.sidebar.number_input("Budget Trends (chiamate API)", min_value=0, value=0, step=50, help="Numero massimo di task DataForSEO (una keyword ciascuno) per l'analisi; le query di maggior valore (click, impression e posizione) vengono scaricate per prime (0 = nessun limite)")
+trend_budget_minutes = st.sidebar.number_input("Tempo massimo Trends (minuti)", min_value=0, value=0, step=5, help="Oltre questo tempo non vengono avviati altri task; il report contiene i trend delle query di maggior valore (0 = nessun limite)")
+report_changes = st.sidebar.checkbox("Foglio Variazioni", value=True, help="Query e pagine nuove, perse o con click molto cambiati rispetto all'analisi precedente della proprietà e al mese precedente")
+export_columnar = st.sidebar.checkbox("Esporta anche in Parquet (BI)", value=True, help="Dati mensili in un'unica tabella e Riepilogo in formato Parquet, con tipi espliciti")
+use_cache = st.sidebar.checkbox("Usa cache locale delle risposte API", value=True, help="Riutilizza i dati già scaricati (mesi chiusi: 30 giorni, mese corrente: 1 ora)")
+incremental_refresh = st.sidebar.checkbox("Aggiornamento incrementale", value=True, help="Scarica solo i mesi mancanti, falliti o ancora aperti e riutilizza quelli già salvati per questa proprietà")
+# Job mode is only offered when the FattoBoost jobs endpoint is configured (FATTOBOOST_JOBS_URL)
+use_jobs = bool(os.environ.get("FATTOBOOST_JOBS_URL")) and st.sidebar.checkbox("Estrazione a job (asincrona)", value=False, help="Invia ogni mese come job FattoBoost e ne controlla lo stato, invece di tenere aperta una richiesta per ore; i job interrotti vengono ripresi")
+max_parallel_months = st.sidebar.number_input("Mesi in parallelo (FattoBoost)", min_value=1, max_value=12, value=4, help="Numero massimo di mesi elaborati contemporaneamente dal server FattoBoost")
+split_timeout_min = st.sidebar.number_input("Timeout per finestra (minuti)", min_value=0, value=60, step=15, help="Una finestra che non risponde entro questo tempo viene divisa in due metà scaricate in parallelo (0 = nessun limite; non usato con l'estrazione a job)")
+adaptive_concurrency = st.sidebar.checkbox("Concorrenza adattiva", value=True, help="Aumenta le richieste in parallelo finché le API rispondono bene e le riduce su 429/5xx o Retry-After (il valore sopra resta il massimo)")
 
 # --- Main Logic ---
 
-def extract_domain(prop_url):
-    # Simple extraction logic
-    s = prop_url.replace("sc-domain:", "").replace("https://", "").replace("http://", "")
-    if "/" in s:
-        s = s.split("/")[0]
-    return s
+# Column labels of the Step 2 table (Italian UI)
+SELECTION_LABELS = {
+    'query': 'Query',
+    'clicks': 'Click Totali',
+    'impressions': 'Impression Totali',
+    'average_position': 'Pos. Media',
+    'ctr': 'CTR Medio'
+}
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def aggregate_for_selection(fingerprint, _dataset):
+    """Per-query table behind Step 2; recomputed only when the dataset fingerprint changes."""
+    from tools.compact_dataset import aggregate_queries
+
+    with telemetry.span("aggregate") as span:
+        df_grouped = aggregate_queries(_dataset)
+        
+        # Rounding for display
+        df_grouped['average_position'] = df_grouped['average_position'].round(1)
+        df_grouped['ctr'] = df_grouped['ctr'].round(4)
+        span.add("rows", len(df_grouped))
+    return df_grouped
+
+# Column labels of the timing panel
+TELEMETRY_LABELS = {
+    'name': 'Fase',
+    'parent': 'Dentro',
+    'wall_s': 'Tempo (s)',
+    'requests': 'Richieste',
+    'http_errors': 'Errori HTTP',
+    'retries': 'Retry',
+    'bytes': 'Byte',
+    'rows': 'Righe',
+    'peak_rss_mb': 'Picco RAM (MB)',
+    'rss_growth_mb': 'Crescita RAM (MB)',
+}
+
+def show_telemetry_panel(run, previous=None):
+    """Timing panel of the current run; `previous` is the run report of the last run, if any."""
+    if run is None or not run.spans:
+        return
+    with st.expander("⏱️ Tempi di esecuzione"):
+        df = run.summary_frame()
+        st.dataframe(df[list(TELEMETRY_LABELS)].rename(columns=TELEMETRY_LABELS), hide_index=True, use_container_width=True)
+        if previous is not None:
+            st.caption(f"Confronto con l'esecuzione precedente ({previous.get('started_at')})")
+            st.dataframe(telemetry.compare_runs(previous, run.to_dict()), use_container_width=True)
+
+# Seconds between two status checks of a background job
+POLL_SECONDS = 1
 
-# Session State Initialization
-if "monthly_data" not in st.session_state:
-    st.session_state.monthly_data = {}
-if "unique_queries" not in st.session_state:
-    st.session_state.unique_queries = []
+def job_log_lines(logs):
+    return [f"[{datetime.fromtimestamp(t).strftime('%H:%M:%S')}] {msg}" for t, msg in logs]
+
+@st.fragment(run_every=POLL_SECONDS)
+def job_panel(job_id):
+    """
+    Progress of a background job (see tools/job_queue.py). Only this fragment reruns every
+    POLL_SECONDS, without sleeping in the script thread; once the job is over the whole app
+    reruns to pick up its result.
+    """
+    status = job_queue.status(job_id)
+    if status is None or status["status"] not in ("queued", "running"):
+        st.rerun()
+    st.progress(status["progress"])
+    if status["status"] == "queued":
+        st.text(f"In coda: {status['position']} analisi prima di questa ({job_queue.max_workers} in esecuzione al massimo)...")
+    else:
+        st.text(status["status_text"] or "")
+    st.code("\n".join(job_log_lines(status["logs"])[-10:])) # Show last 10 logs
+
+def follow_job(job_id):
+    """
+    Returns the status of a finished background job (None if it is unknown); while the job is
+    queued or running, shows its job_panel and ends this run of the script.
+    """
+    status = job_queue.status(job_id)
+    if status is not None and status["status"] in ("queued", "running"):
+        job_panel(job_id)
+        st.stop()
+    return status
+
+# Long steps run in worker processes shared by all the sessions of this server; the app
+# refers to them by name, so their dependencies are only imported by the workers
+job_queue = get_default_job_queue(preload=["app_jobs"])
+
+# Session State Initialization (the dataset is built by the extraction job)
+if "dataset" not in st.session_state:
+    st.session_state.dataset, st.session_state.dataset_fingerprint = None, None
+if "unique_query_count" not in st.session_state:
+    st.session_state.unique_query_count = 0
 if "step" not in st.session_state:
     st.session_state.step = 1 # 1: Config, 2: Review/Select, 3: Processing Trends
 
+# Every rerun records into the telemetry of the current analysis (see tools/telemetry.py)
+telemetry.activate(st.session_state.get("telemetry"))
+
 # Step 1: Configuration & Start
-if st.session_state.step == 1:
+if st.session_state.step == 1 and st.session_state.get("extraction_job") is None:
+    # A run interrupted by a closed tab or a crash can continue from its checkpoints
+    checkpoint = RunCheckpoint(gsc_property, country, year, scope=credential_scope(fattoboost_token)) if gsc_property else None
+    resume_run = False
+    if checkpoint is not None and checkpoint.is_unfinished():
+        stage_labels = {"extract": "estrazione", "select": "selezione query", "enrich": "trends"}
+        st.warning(f"⏸️ Trovata un'analisi interrotta per **{gsc_property}** "
+                   f"(fase: {stage_labels.get(checkpoint.stage, checkpoint.stage)}, "
+                   f"{len(checkpoint.trends())} trend salvati, ultimo aggiornamento {checkpoint.state().get('updated_at')}).")
+        resume_run = st.button("Riprendi Analisi Interrotta")
     start_process = st.button("Avvia Estrazione (FattoBoost)")
 
-    if start_process:
+    if start_process or resume_run:
         if not fattoboost_token or not gsc_property:
             st.error("Per favore inserisci il Token FattoBoost e la Proprietà GSC.")
             st.stop()
         
-        # Derby property pattern from GSC property
-        derived_pattern = extract_domain(gsc_property)
-        
-        st.info(f"Avvio analisi per: **{gsc_property}** (Anno 2025)")
-        st.caption(f"Pattern proprietà rilevato: {derived_pattern}")
-        
-        # Progress Containers
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        log_area = st.empty()
+        if not resume_run:
+            checkpoint.start({"incremental": incremental_refresh, "use_jobs": use_jobs, "granularity": granularity})
+        run_settings = checkpoint.settings
+        run_telemetry = telemetry.RunTelemetry(f"{gsc_property} {year}", meta={
+            "property": gsc_property, "country": country, "year": year, "resumed": resume_run, **run_settings,
+            "adaptive_concurrency": adaptive_concurrency, "max_parallel_months": max_parallel_months,
+        })
+        st.session_state.telemetry = run_telemetry
         
-        logs = []
-        def log(msg):
-            logs.append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
-            log_area.code("\n".join(logs[-10:])) # Show last 10 logs
+        # 1. Fetch Monthly Data (months run in parallel, see tools/extraction_engine.py)
+        # Labels are for display only: the window dates travel with the data up to the report
+        months = plan_year(year, run_settings.get("granularity", granularity))
+        st.session_state.extraction_job = job_queue.submit(
+            "extract", "app_jobs:extraction_job",
+            token=fattoboost_token,
+            property_url=gsc_property,
+            country=country,
+            months=months,
+            max_parallel_months=max_parallel_months,
+            incremental=run_settings.get("incremental", incremental_refresh),
+            use_cache=use_cache,
+            # A resumed job-mode run falls back to synchronous requests if the endpoint is gone
+            use_jobs=run_settings.get("use_jobs", use_jobs) and bool(os.environ.get("FATTOBOOST_JOBS_URL")),
+            checkpoint=checkpoint,
+            adaptive_concurrency=adaptive_concurrency,
+            split_timeout=split_timeout_min * 60 or None
+        )
+        st.session_state.checkpoint = checkpoint
+        st.session_state.periods = months
+        st.session_state.year = year
+        st.session_state.granularity = run_settings.get("granularity", granularity)
+        st.rerun()
 
-        # 1. Fetch Monthly Data
-        monthly_data = {}
-        months = [
-            ("Gen 2025", "2025-01-01", "2025-01-31"),
-            ("Feb 2025", "2025-02-01", "2025-02-28"),
-            ("Mar 2025", "2025-03-01", "2025-03-31"),
-            ("Apr 2025", "2025-04-01", "2025-04-30"),
-            ("Mag 2025", "2025-05-01", "2025-05-31"),
-            ("Giu 2025", "2025-06-01", "2025-06-30"),
-            ("Lug 2025", "2025-07-01", "2025-07-31"),
-            ("Ago 2025", "2025-08-01", "2025-08-31"),
-            ("Set 2025", "2025-09-01", "2025-09-30"),
-            ("Ott 2025", "2025-10-01", "2025-10-31"),
-            ("Nov 2025", "2025-11-01", "2025-11-30"),
-            ("Dic 2025", "2025-12-01", "2025-12-31"),
-        ]
-        
-        total_months = len(months)
-        current_idx = 0
-        
-        all_queries_set = set()
-        
-        for month_name, start_d, end_d in months:
-            status_text.text(f"Scaricamento dati per {month_name}...")
-            log(f"Richiesta {month_name} ({start_d} - {end_d})...")
-            
-            try:
-                records = fetch_fattoboost_month(
-                    token=fattoboost_token,
-                    start_date=start_d,
-                    end_date=end_d,
-                    property_url=gsc_property,
-                    property_pattern=derived_pattern,
-                    show_keywords="nobrand",
-                    country=country,
-                    log_callback=log
-                )
-                
-                if records:
-                    monthly_data[month_name] = records
-                    # Collect unique queries
-                    for r in records:
-                        if 'query' in r:
-                            all_queries_set.add(r['query'])
-                    log(f"✅ {month_name}: {len(records)} record trovati.")
-                else:
-                    log(f"⚠️ {month_name}: Nessun dato restituito (o errore gestito).")
-                    
-            except Exception as e:
-                log(f"❌ Errore in {month_name}: {str(e)}")
-                
-            current_idx += 1
-            progress_bar.progress(current_idx / total_months)
-            time.sleep(1) # Brief pause to be nice to API
-            
-        # Store in session state
-        st.session_state.monthly_data = monthly_data
-        st.session_state.unique_queries = sorted(list(all_queries_set))
+# Step 1: Extraction running in the background
+elif st.session_state.step == 1:
+    checkpoint = st.session_state.checkpoint
+    st.info(f"Avvio analisi per: **{checkpoint.property_url}** (Anno {st.session_state.year}, finestre {GRANULARITY_LABELS[st.session_state.granularity].lower()})")
+    # Derby property pattern from GSC property
+    st.caption(f"Pattern proprietà rilevato: {extract_domain(checkpoint.property_url)}")
+    
+    job_id = st.session_state.extraction_job
+    status = follow_job(job_id)
+    del st.session_state.extraction_job
+    try:
+        if status is None:
+            raise RuntimeError("job non trovato (server riavviato?)")
+        result, spans = job_queue.result(job_id)
+    except Exception as e:
+        # The form is shown again: the checkpoints allow resuming the run
+        st.error(f"Estrazione non riuscita: {e}")
+        st.stop()
+    
+    run_telemetry = st.session_state.get("telemetry")
+    if run_telemetry is not None:
+        for record in spans:
+            run_telemetry.add(record)
+    
+    # Store in session state as one compact typed table
+    st.session_state.dataset = result["dataset"]
+    st.session_state.dataset_fingerprint = result["fingerprint"]
+    st.session_state.unique_query_count = result["unique_query_count"]
+    
+    # A resumed run continues from the stage it had reached
+    if checkpoint.stage == "extract":
+        checkpoint.set_stage("select")
+    if checkpoint.stage == "enrich":
+        st.session_state.selected_queries = checkpoint.selection() or []
+        st.session_state.step = 3
+    else:
         st.session_state.step = 2
-        st.rerun()
+    st.rerun()
 
 # Step 2: Review & Select
 elif st.session_state.step == 2:
-    st.success(f"✅ Estrazione Completata! Trovate {len(st.session_state.unique_queries)} query univoche.")
+    # The table helpers need pandas: only loaded by the sessions that reach this step
+    from tools.query_selection import QuerySelection, filter_queries, sort_queries, page_count, page_slice, top_queries
+
+    st.success(f"✅ Estrazione Completata! Trovate {st.session_state.unique_query_count} query univoche.")
+    show_telemetry_panel(st.session_state.get("telemetry"))
     
     st.subheader("Seleziona Query per Analisi Trends")
-    st.markdown("Seleziona le query per cui vuoi ottenere i dati di Google Trends. In questa tabella sono mostrate le metriche aggregate per l'anno 2025.")
+    st.markdown(f"Seleziona le query per cui vuoi ottenere i dati di Google Trends. In questa tabella sono mostrate le metriche aggregate per l'anno {st.session_state.get('year', year)}.")
     
-    # 1. Aggregate Data from Session State
-    all_records = []
-    for month, records in st.session_state.monthly_data.items():
-        all_records.extend(records)
+    # 1. Aggregate Data from Session State (memoized on the dataset fingerprint)
+    table = aggregate_for_selection(st.session_state.dataset_fingerprint, st.session_state.dataset)
     
-    if all_records:
-        full_df = pd.DataFrame(all_records)
-        # Ensure numeric types
-        cols_to_numeric = ['clicks', 'impressions', 'average_position', 'ctr']
-        for c in cols_to_numeric:
-            full_df[c] = pd.to_numeric(full_df[c], errors='coerce').fillna(0)
-
-        # Grouping
-        df_grouped = full_df.groupby('query').agg({
-            'clicks': 'sum',
-            'impressions': 'sum',
-            'average_position': 'mean',
-            'ctr': 'mean' 
-        }).reset_index()
+    # The selection is a compact set kept across reruns; all queries are selected by default
+    if st.session_state.get("selection_fingerprint") != st.session_state.dataset_fingerprint:
+        st.session_state.query_selection = QuerySelection(default=True)
+        st.session_state.selection_fingerprint = st.session_state.dataset_fingerprint
+    selection = st.session_state.query_selection
+    
+    if not table.empty:
+        # 2. Filters and sorting run here; only the visible page is sent to the browser
+        f1, f2, f3, f4 = st.columns([3, 1, 1, 2])
+        search = f1.text_input("Cerca query", value="")
+        min_clicks = f2.number_input("Click minimi", min_value=0, value=0, step=1)
+        min_impressions = f3.number_input("Impression minime", min_value=0, value=0, step=10)
+        max_position = float(max(1.0, table['average_position'].max()))
+        position_range = f4.slider("Pos. Media", min_value=0.0, max_value=max_position, value=(0.0, max_position), step=0.5)
         
-        # Rounding for display
-        df_grouped['average_position'] = df_grouped['average_position'].round(1)
-        df_grouped['ctr'] = df_grouped['ctr'].round(4)
+        s1, s2, s3 = st.columns([2, 1, 1])
+        sort_by = s1.selectbox("Ordina per", list(SELECTION_LABELS), format_func=SELECTION_LABELS.get)
+        ascending = s2.checkbox("Crescente", value=sort_by in ("query", "average_position"))
+        page_size = s3.selectbox("Righe per pagina", [50, 100, 250, 500], index=1)
         
-        # Add Checkbox
-        df_grouped.insert(0, "Analizza", True)
+        view = filter_queries(table, search, min_clicks, min_impressions, position_range)
+        view = sort_queries(view, sort_by, ascending)
         
-        # Renaming for UI (Italian)
-        df_grouped = df_grouped.rename(columns={
-            'query': 'Query',
-            'clicks': 'Click Totali',
-            'impressions': 'Impression Totali',
-            'average_position': 'Pos. Media',
-            'ctr': 'CTR Medio'
-        })
+        # 3. Bulk actions (on the filtered queries)
+        b1, b2, b3, b4 = st.columns([1, 1, 1, 2])
+        if b1.button("Seleziona filtrate"):
+            selection.set_bulk(view['query'], True)
+        if b2.button("Deseleziona filtrate"):
+            selection.set_bulk(view['query'], False)
+        top_n = b4.number_input("N", min_value=1, value=min(100, len(table)), step=10, label_visibility="collapsed")
+        if b3.button(f"Solo le prime {top_n} per click"):
+            selection.reset(False, top_queries(view, top_n, by='clicks'))
+        
+        n_pages = page_count(len(view), page_size)
+        page = st.number_input(f"Pagina (di {n_pages})", min_value=1, max_value=n_pages, value=1, step=1)
+        page_df = page_slice(view, page, page_size)
         
-        # Display using data_editor
+        display_df = page_df.rename(columns=SELECTION_LABELS)
+        display_df.insert(0, "Analizza", selection.mask(page_df['query']))
+        
+        # The editor key changes with the page, the filters and any bulk action,
+        # so stale checkbox edits are never re-applied to a different set of rows
+        editor_key = f"selection_{selection.version}_{page}_{page_size}_{sort_by}_{ascending}_{search}_{min_clicks}_{min_impressions}_{position_range}"
         edited_df = st.data_editor(
-            df_grouped,
+            display_df,
             column_config={
                 "Analizza": st.column_config.CheckboxColumn(
                     "Analizza?",
@@ -223,102 +334,149 @@ elif st.session_state.step == 2:
                 "Impression Totali": st.column_config.NumberColumn("Impression Totali"),
                 "Pos. Media": st.column_config.NumberColumn("Pos. Media", format="%.1f"),
             },
-            disabled=["Query", "Click Totali", "Impression Totali", "Pos. Media", "CTR Medio"],
+            disabled=list(SELECTION_LABELS.values()),
             hide_index=True,
-            use_container_width=True
+            use_container_width=True,
+            key=editor_key
         )
+        
+        # Fold the checkbox edits of this page into the compact selection
+        checked = edited_df["Analizza"].to_numpy(dtype=bool)
+        selection.set(edited_df.loc[checked, "Query"], True)
+        selection.set(edited_df.loc[~checked, "Query"], False)
+        
+        st.caption(f"{len(view)} query corrispondono ai filtri · {selection.count(len(table))} selezionate su {len(table)}")
     else:
         st.warning("Nessun dato trovato da aggregare.")
-        edited_df = pd.DataFrame(columns=["Analizza", "Query"])
 
     col1, col2 = st.columns([1, 4])
     with col1:
         if st.button("Arricchisci e Genera Report"):
-            # Filter based on Checkbox
-            if not edited_df.empty:
-                selected_queries = edited_df[edited_df["Analizza"] == True]["Query"].tolist()
-            else:
-                selected_queries = []
+            selected_queries = selection.selected(table['query']) if not table.empty else []
                 
             st.session_state.selected_queries = selected_queries
+            st.session_state.checkpoint.save_selection(selected_queries)
+            st.session_state.checkpoint.set_stage("enrich")
             st.session_state.step = 3
             st.rerun()
     with col2:
         if st.button("Salta Trends (Solo Report)"):
             st.session_state.selected_queries = []
+            st.session_state.checkpoint.save_selection([])
+            st.session_state.checkpoint.set_stage("enrich")
             st.session_state.step = 3
             st.rerun()
 
 # Step 3: Enrich & Build
 elif st.session_state.step == 3:
-    st.info("Elaborazione Trends e Generazione Report in corso...")
-    
-    selected_queries = st.session_state.selected_queries
-    monthly_data = st.session_state.monthly_data
-    
-    # Progress Containers
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    log_area = st.empty()
-    
-    logs = []
-    def log(msg):
-        logs.append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
-        log_area.code("\n".join(logs[-10:]))
+    checkpoint = st.session_state.get("checkpoint")
+    run_telemetry = st.session_state.get("telemetry")
+    output_file = f"Report_{gsc_property.replace(':','_').replace('/','_')}_{st.session_state.get('year', year)}.xlsx"
+    full_path = os.path.join(os.getcwd(), output_file)
     
-    # 2. Trends Analysis
-    trends_results = {}
-    if selected_queries and analyze_trends:
-        status_text.text(f"Scaricamento Trends per {len(selected_queries)} query...")
-        log(f"Avvio Analisi Trends per {len(selected_queries)} query selezionate...")
+    # The report is built once in the background; reruns (e.g. after a download) only show it
+    if "report_result" not in st.session_state:
+        st.info("Elaborazione Trends e Generazione Report in corso...")
         
-        # Define callback
-        total_q = len(selected_queries)
-        def update_trends_progress(current, total, msg):
-             # Map 0-1 to progress bar
-             progress_bar.progress(current / total)
-             status_text.text(f"Trends: {current}/{total} - {msg}")
-            
-        try:
-            trends_results = fetch_keyword_trends(
-                selected_queries, 
-                dataforseo_user, 
-                dataforseo_pass, 
-                location_code=2380, # Italy fixed for now
-                progress_callback=update_trends_progress
+        if st.session_state.get("report_error"):
+            st.error(f"Impossibile generare il report: {st.session_state.report_error}")
+            if st.button("Riprova"):
+                del st.session_state.report_error
+                st.rerun()
+            st.stop()
+        
+        if st.session_state.get("report_job") is None:
+            # A new report replaces the timings of the previous attempt
+            if run_telemetry is not None:
+                run_telemetry.drop("trends", "changes", "report", "columnar")
+            st.session_state.report_job = job_queue.submit(
+                "report", "app_jobs:report_job",
+                dataset=st.session_state.dataset,
+                selected_queries=st.session_state.selected_queries,
+                analyze_trends=analyze_trends,
+                dataforseo_user=dataforseo_user,
+                dataforseo_pass=dataforseo_pass,
+                checkpoint=checkpoint,
+                use_cache=use_cache,
+                adaptive_concurrency=adaptive_concurrency,
+                periods=st.session_state.get("periods"),
+                output_dir=os.getcwd(),
+                output_file=output_file,
+                export_columnar=export_columnar,
+                changes_key=dict(property_url=gsc_property, country=country, period=st.session_state.get("year", year),
+                                 scope=credential_scope(fattoboost_token)) if report_changes else None,
+                trend_budget_calls=trend_budget_calls or None,
+                trend_budget_seconds=trend_budget_minutes * 60 or None
             )
-            log(f"✅ Trends raccolti per {len(trends_results)} query.")
+        
+        job_id = st.session_state.report_job
+        status = follow_job(job_id)
+        del st.session_state.report_job
+        try:
+            if status is None:
+                raise RuntimeError("job non trovato (server riavviato?)")
+            result, spans = job_queue.result(job_id)
         except Exception as e:
-            log(f"❌ Errore scaricamento trends: {e}")
+            st.session_state.report_error = str(e)
+            st.rerun()
+        
+        result["logs"] = job_log_lines(status["logs"])
+        if run_telemetry is not None:
+            for record in spans:
+                run_telemetry.add(record)
             
-    # 3. Report Generation
-    status_text.text("Generazione File Excel...")
-    progress_bar.progress(1.0)
+            # Run report next to the Excel file, compared with the one of the previous run
+            telemetry_path = os.path.splitext(full_path)[0] + "_telemetry.json"
+            st.session_state.previous_telemetry = telemetry.load_run_report(telemetry_path)
+            run_telemetry.export_json(telemetry_path)
+            result["logs"].append(f"[{datetime.now().strftime('%H:%M:%S')}] ⏱️ Tempi di esecuzione salvati in {telemetry_path}")
+            result["telemetry_path"] = telemetry_path
+        
+        if checkpoint is not None and checkpoint.stage != "done":
+            checkpoint.finish()
+        st.session_state.report_result = result
     
-    output_file = f"Report_{gsc_property.replace(':','_').replace('/','_')}_2025.xlsx"
-    full_path = os.path.join(os.getcwd(), output_file)
+    result = st.session_state.report_result
+    st.code("\n".join(result["logs"][-10:]))
+    coverage = result.get("coverage")
+    if coverage is not None and coverage["missing"]:
+        st.warning(f"🎯 Trend scaricati per {coverage['enriched']} query su {coverage['queries']} selezionate "
+                   f"({coverage['value_share']:.0%} del valore): le altre sono state escluse dal budget o non hanno dati.")
     
-    try:
-        final_path = generate_report(monthly_data, trends_results, output_path=full_path)
-        log(f"✅ Report salvato in {final_path}")
-        
-        with open(final_path, "rb") as f:
+    with open(result["report_path"], "rb") as f:
+        st.download_button(
+            label="📥 Scarica Report Excel Finale",
+            data=f,
+            file_name=output_file,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    
+    labels = {"monthly": "📥 Scarica Dati Mensili (Parquet)", "summary": "📥 Scarica Riepilogo (Parquet)", "changes": "📥 Scarica Variazioni (Parquet)"}
+    for kind, path in result["columnar_paths"].items():
+        with open(path, "rb") as f:
             st.download_button(
-                label="📥 Scarica Report Excel Finale",
+                label=labels[kind],
                 data=f,
-                file_name=output_file,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                file_name=os.path.basename(path),
+                mime="application/vnd.apache.parquet",
+                key=f"download_{kind}"
             )
-            
-        st.success("Analisi Completata!")
-        
-        if st.button("Avvia Nuova Analisi"):
-            for key in ["monthly_data", "unique_queries", "step", "selected_queries"]:
-                if key in st.session_state:
-                    del st.session_state[key]
-            st.rerun()
-        
-    except Exception as e:
-        log(f"❌ Errore generazione report: {e}")
-        st.error(f"Impossibile generare il report: {e}")
-
+    
+    if result.get("telemetry_path"):
+        show_telemetry_panel(run_telemetry, st.session_state.get("previous_telemetry"))
+        with open(result["telemetry_path"], "rb") as f:
+            st.download_button(
+                label="📥 Scarica Tempi di Esecuzione (JSON)",
+                data=f,
+                file_name=os.path.basename(result["telemetry_path"]),
+                mime="application/json",
+                key="download_telemetry"
+            )
+    
+    st.success("Analisi Completata!")
+    
+    if st.button("Avvia Nuova Analisi"):
+        for key in ["dataset", "dataset_fingerprint", "unique_query_count", "step", "selected_queries", "checkpoint", "query_selection", "selection_fingerprint", "telemetry", "previous_telemetry", "periods", "year", "granularity", "extraction_job", "report_job", "report_result", "report_error"]:
+            if key in st.session_state:
+                del st.session_state[key]
+        st.rerun()
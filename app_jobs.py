@@ -0,0 +1,210 @@
+"""
+The two long steps of app.py (Step 1 extraction, Step 3 trends and report), run in the
+worker processes of tools/job_queue.py so that the Streamlit script thread is not held for
+the whole run. Progress and log lines go back to the UI through the job reporter; the
+results are returned to the app, which keeps them in the session state.
+"""
+import os
+
+from tools.pipeline import extract_property_months, resume_trends
+from tools.compact_dataset import build_dataset, aggregate_queries, split_months, unique_query_count
+from tools.query_index import QueryIndex
+from tools.dataforseo_client import fetch_keyword_trends
+from tools.report_builder import generate_report, generate_columnar_report
+from tools.report_diff import build_changes, load_snapshot, save_snapshot, STATUS_ORDER
+from tools.response_cache import get_default_cache
+from tools.trend_store import get_default_trend_store
+from tools.http_transport import transport_stats_line
+from tools.rate_limit import AdaptiveLimiter, CallBudget
+from tools.trend_priority import query_values, rank_keywords, trend_coverage
+from tools.periods import trend_range
+from tools import telemetry
+
+
+def extraction_job(job, token, property_url, country, months, max_parallel_months, incremental, use_cache,
+                   use_jobs, checkpoint, adaptive_concurrency, split_timeout):
+    """
+    Step 1: fetches the months from FattoBoost (in parallel, see tools/extraction_engine.py)
+    and builds the compact dataset.
+    job: JobReporter of the job
+    Returns { 'dataset', 'fingerprint', 'unique_query_count', 'stats' }.
+    """
+    cache = get_default_cache() if use_cache else None
+    fattoboost_limiter = AdaptiveLimiter("FattoBoost", initial=min(2, max_parallel_months), max_limit=max_parallel_months) if adaptive_concurrency else None
+
+    def on_month_done(month_name, records, error, done_count, total_count):
+        if error is not None:
+            job.log(f"❌ Errore in {month_name}: {str(error)}")
+        elif records:
+            job.log(f"✅ {month_name}: {len(records)} record trovati.")
+        else:
+            job.log(f"⚠️ {month_name}: Nessun dato restituito (o errore gestito).")
+
+        job.progress(done_count / total_count, f"Mesi completati: {done_count}/{total_count} (ultimo: {month_name})")
+        if fattoboost_limiter is not None:
+            job.log(f"⚙️ {fattoboost_limiter.status_line()}")
+
+    # Incremental mode: only months that are missing, failed or still open are fetched
+    job.progress(0.0, f"Scaricamento mesi ({max_parallel_months} in parallelo)...")
+    with telemetry.span("extract"):
+        monthly_data, extraction_stats = extract_property_months(
+            token=token,
+            property_url=property_url,
+            country=country,
+            months=months,
+            max_in_flight=max_parallel_months,
+            incremental=incremental,
+            cache=cache,
+            log_callback=job.log,
+            on_month_done=on_month_done,
+            use_jobs=use_jobs,
+            checkpoint=checkpoint,
+            limiter=fattoboost_limiter,
+            split_timeout=split_timeout
+        )
+    job.progress(1.0)
+
+    if extraction_stats["resumed"]:
+        job.log(f"⏯️ {extraction_stats['resumed']} mesi ripresi dal checkpoint dell'analisi interrotta.")
+    if extraction_stats["reused"]:
+        job.log(f"♻️ {extraction_stats['reused']} mesi riutilizzati dall'esecuzione precedente, {extraction_stats['fetched']} scaricati.")
+    if not extraction_stats["fetched"]:
+        job.log("✅ Tutti i mesi sono già aggiornati, nessuna chiamata API necessaria.")
+    if cache is not None:
+        job.log(cache.stats_line())
+    job.log(transport_stats_line())
+
+    # One compact typed table goes back to the app (the record lists are dropped)
+    with telemetry.span("dataset") as span:
+        dataset, fingerprint = build_dataset(monthly_data)
+        span.add("rows", len(dataset))
+    del monthly_data
+    return {
+        "dataset": dataset,
+        "fingerprint": fingerprint,
+        "unique_query_count": unique_query_count(dataset),
+        "stats": extraction_stats,
+    }
+
+
+def report_job(job, dataset, selected_queries, analyze_trends, dataforseo_user, dataforseo_pass, checkpoint,
+               use_cache, adaptive_concurrency, periods, output_dir, output_file, export_columnar, changes_key=None,
+               trend_budget_calls=None, trend_budget_seconds=None):
+    """
+    Step 3: trends of the selected queries, changes since the previous run and month over
+    month, Excel report and (optionally) columnar export.
+    job: JobReporter of the job
+    changes_key: { 'property_url', 'country', 'period', 'scope' } of the run-over-run snapshot
+        (see tools/report_diff.py); None skips the Changes sheet.
+    trend_budget_calls / trend_budget_seconds: Optional cap on the DataForSEO tasks / time of the
+        enrichment; keywords are fetched highest value first (see tools/trend_priority.py).
+    Returns { 'trends', 'coverage', 'changes', 'report_path', 'columnar_paths' }; a failed
+    columnar export is only logged, a failed report raises.
+    """
+    monthly_data = split_months(dataset)
+
+    # 2. Trends Analysis
+    trends_results = {}
+    coverage = None
+    # Raw series are shared across properties and runs (see tools/trend_store.py)
+    trend_store = get_default_trend_store() if use_cache else None
+    if selected_queries and analyze_trends:
+        # Variants differing only in case, accents, punctuation or word order share one keyword
+        values = query_values(aggregate_queries(dataset))
+        query_index = QueryIndex(selected_queries, weights=values)
+        job.log(f"🔗 {query_index.stats_line()}")
+        
+        # Highest-value keywords first, so a budget that runs out leaves out the least useful ones
+        keywords = rank_keywords(query_index, values)
+        budget = CallBudget(trend_budget_calls, trend_budget_seconds) if trend_budget_calls or trend_budget_seconds else None
+
+        job.progress(0.0, f"Scaricamento Trends per {len(query_index.groups)} keyword...")
+        job.log(f"Avvio Analisi Trends per {len(selected_queries)} query selezionate ({len(query_index.groups)} keyword distinte)...")
+
+        # Without the fixed 2 req/s pacing, DataForSEO concurrency follows latency and 429s
+        trends_limiter = AdaptiveLimiter("DataForSEO", initial=2, max_limit=8) if adaptive_concurrency else None
+
+        def update_trends_progress(current, total, msg):
+            pacing = f" [{trends_limiter.status_line()}]" if trends_limiter is not None else ""
+            job.progress(current / total, f"Trends: {current}/{total} - {msg}{pacing}")
+
+        # Trend series cover the period of the report
+        trend_dates = dict(zip(("date_from", "date_to"), trend_range(periods))) if periods else {}
+
+        def fetch_trends(queries, on_batch_done):
+            return fetch_keyword_trends(
+                queries,
+                dataforseo_user,
+                dataforseo_pass,
+                location_code=2380, # Italy fixed for now
+                **trend_dates,
+                progress_callback=update_trends_progress,
+                store=trend_store,
+                on_batch_done=on_batch_done,
+                adaptive=trends_limiter,
+                requests_per_second=None if trends_limiter is not None else 2.0,
+                budget=budget
+            )
+
+        try:
+            # Trends already saved by an interrupted run (or a previous rerun) are not fetched again
+            with telemetry.span("trends", queries=len(selected_queries), keywords=len(query_index.groups)) as span:
+                trends_results = query_index.expand(resume_trends(keywords, checkpoint, fetch_trends))
+                coverage = trend_coverage(selected_queries, trends_results, values)
+                span.set(coverage=coverage["value_share"])
+            job.log(f"✅ Trends raccolti per {len(trends_results)} query.")
+            job.log(f"🎯 Copertura trend: {coverage['enriched']}/{coverage['queries']} query, "
+                    f"{coverage['value_share']:.0%} del valore (click e impression attesi)")
+            if budget is not None:
+                job.log(f"💶 {budget.status_line()}")
+            if trend_store is not None:
+                job.log(trend_store.stats_line())
+            if trends_limiter is not None:
+                job.log(f"⚙️ {trends_limiter.status_line()}")
+            job.log(transport_stats_line())
+        except Exception as e:
+            job.log(f"❌ Errore scaricamento trends: {e}")
+
+    # Changes since the previous report of the property and month over month
+    changes, totals = None, None
+    if changes_key is not None:
+        job.progress(1.0, "Calcolo variazioni...")
+        with telemetry.span("changes") as span:
+            previous = load_snapshot(**changes_key)
+            changes, totals = build_changes(monthly_data, previous)
+            span.add("rows", len(changes))
+        counts = changes['Status'].value_counts()
+        labels = {"new": "nuove", "lost": "perse", "up": "in crescita", "down": "in calo"}
+        job.log(f"🔀 Variazioni: {', '.join(f'{counts.get(s, 0)} {labels[s]}' for s in STATUS_ORDER)}"
+                + (f" (rispetto all'esecuzione del {previous.attrs['saved_at']} e mese su mese)" if previous is not None else " (mese su mese, nessuna esecuzione precedente)"))
+
+    # 3. Report Generation
+    job.progress(1.0, "Generazione File Excel...")
+    full_path = os.path.join(output_dir, output_file)
+    with telemetry.span("report"):
+        final_path = generate_report(monthly_data, trends_results, output_path=full_path, periods=periods, changes=changes)
+    job.log(f"✅ Report salvato in {final_path}")
+
+    # Columnar export for BI / warehouse loads
+    columnar_paths = {}
+    if export_columnar:
+        job.progress(1.0, "Generazione export Parquet...")
+        try:
+            with telemetry.span("columnar"):
+                columnar_paths = generate_columnar_report(
+                    monthly_data, trends_results,
+                    output_dir=output_dir,
+                    basename=os.path.splitext(output_file)[0],
+                    periods=periods,
+                    changes=changes
+                )
+            job.log(f"✅ Export Parquet salvato: {', '.join(columnar_paths.values())}")
+        except Exception as e:
+            job.log(f"⚠️ Export Parquet non riuscito: {e}")
+
+    # The next report of the property is compared with this one
+    if totals is not None:
+        save_snapshot(totals, **changes_key)
+
+    return {"trends": len(trends_results), "coverage": coverage, "changes": len(changes) if changes is not None else 0,
+            "report_path": final_path, "columnar_paths": columnar_paths}
@@ -0,0 +1,448 @@
+"""
+Headless batch runner: builds the Opportunity report for many GSC properties without Streamlit.
+
+Usage:
+    python batch_runner.py properties.json --output-dir reports/
+
+properties.json:
+    {
+      "credentials": {"fattoboost_token": "...", "dataforseo_user": "...", "dataforseo_pass": "..."},
+      "defaults": {"country": "ITA", "analyze_trends": true},
+      "properties": [
+        {"gsc_property": "sc-domain:example.it"},
+        {"gsc_property": "https://www.example.com/", "country": "USA", "analyze_trends": false}
+      ]
+    }
+
+Credentials can be left out of the file and passed through the FATTOBOOST_TOKEN,
+DATAFORSEO_USER and DATAFORSEO_PASS environment variables instead (preferred).
+A plain text file with one property per line is also accepted.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from tools.pipeline import extract_domain, extract_property_months, unique_queries, resume_trends
+from tools.run_checkpoint import RunCheckpoint
+from tools.query_index import QueryIndex
+from tools.fattoboost_client import stream_fattoboost_month
+from tools.report_diff import build_changes, changes_stats_line, load_snapshot, save_snapshot
+from tools.periods import plan_windows, plan_year, trend_range, GRANULARITIES
+from tools.dataforseo_client import fetch_keyword_trends
+from tools.rate_limit import SharedBackoff, TokenBucket, AdaptiveLimiter, CallBudget
+from tools.trend_priority import query_values, rank_keywords, trend_coverage, coverage_line
+from tools.compact_dataset import build_dataset, aggregate_queries
+from tools.report_builder import generate_report, generate_columnar_report
+from tools.response_cache import get_default_cache, credential_scope
+from tools.trend_store import get_default_trend_store
+from tools.http_transport import configure_transport, transport_stats
+from tools import fattoboost_client, telemetry
+
+ENV_CREDENTIALS = {
+    "fattoboost_token": "FATTOBOOST_TOKEN",
+    "dataforseo_user": "DATAFORSEO_USER",
+    "dataforseo_pass": "DATAFORSEO_PASS",
+}
+
+
+def load_jobs(path):
+    """
+    Reads the properties file and returns a list of jobs, one dict per property with
+    credentials and settings resolved (property entry > defaults > file credentials > env).
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+
+    if path.lower().endswith(".json"):
+        config = json.loads(text)
+    else:
+        config = {"properties": [
+            {"gsc_property": line.strip()} for line in text.splitlines()
+            if line.strip() and not line.strip().startswith("#")
+        ]}
+
+    base = {"country": "ITA", "analyze_trends": True}
+    for key, env in ENV_CREDENTIALS.items():
+        if os.environ.get(env):
+            base[key] = os.environ[env]
+    base.update(config.get("credentials", {}))
+    base.update(config.get("defaults", {}))
+
+    jobs = []
+    for entry in config.get("properties", []):
+        if isinstance(entry, str):
+            entry = {"gsc_property": entry}
+        job = dict(base)
+        job.update(entry)
+        jobs.append(job)
+    return jobs
+
+
+def report_basename(gsc_property, period):
+    return f"Report_{gsc_property.replace(':', '_').replace('/', '_')}_{period}"
+
+
+def plan_period(settings):
+    """
+    Fetch windows of the run and the tag naming its reports and checkpoints:
+    the year (--year), or start_end when --start/--end are given.
+    """
+    if settings.start or settings.end:
+        start = settings.start or f"{settings.year}-01-01"
+        end = settings.end or f"{settings.year}-12-31"
+        return f"{start}_{end}", plan_windows(start, end, settings.granularity)
+    return str(settings.year), plan_year(settings.year, settings.granularity)
+
+
+def run_in_memory(job, settings, shared, months, result, log):
+    """
+    Default mode: months are fetched in parallel and kept (incrementally) in the dataset store.
+    Progress is checkpointed, so a property interrupted by a previous run continues where it stopped.
+    """
+    prop = job["gsc_property"]
+    checkpoint = RunCheckpoint(prop, job.get("country", "ITA"), settings.period, scope=credential_scope(job["fattoboost_token"]))
+    if checkpoint.is_unfinished() and not settings.restart:
+        log(f"[*] Resuming interrupted run ({checkpoint.describe()})")
+    else:
+        checkpoint.start({"incremental": not settings.full_refresh})
+    with telemetry.span("extract"):
+        monthly_data, stats = extract_property_months(
+            token=job["fattoboost_token"],
+            property_url=prop,
+            country=job.get("country", "ITA"),
+            months=months,
+            max_in_flight=settings.months_in_flight,
+            incremental=checkpoint.settings.get("incremental", not settings.full_refresh),
+            cache=shared["cache"],
+            log_callback=log,
+            slots=shared["fattoboost_slots"],
+            backoff=shared["fattoboost_backoff"],
+            limiter=shared["fattoboost_adaptive"],
+            use_jobs=settings.jobs,
+            checkpoint=checkpoint,
+            split_timeout=settings.split_timeout,
+            max_records=settings.max_records
+        )
+    queries = unique_queries(monthly_data)
+    result.update({
+        "months_fetched": stats["fetched"],
+        "months_reused": stats["reused"],
+        "months_resumed": stats["resumed"],
+        "months_failed": stats["failed"],
+        "months_with_data": len(monthly_data),
+        "records": sum(len(r) for r in monthly_data.values()),
+        "unique_queries": len(queries),
+    })
+    if stats["failed"]:
+        result["errors"].append(f"Months without data: {', '.join(stats['failed'])}")
+
+    result["trends"] = 0
+    checkpoint.set_stage("enrich")
+    fetch_trends = trends_fetcher(job, settings, shared, result)
+    trends_results = {}
+    if fetch_trends and queries:
+        # Highest-value keywords first, so a budget that runs out leaves out the least useful ones
+        dataset, _ = build_dataset(monthly_data)
+        values = query_values(aggregate_queries(dataset))
+        del dataset
+        query_index = QueryIndex(queries, weights=values)
+        log(query_index.stats_line())
+        result["trend_keywords"] = len(query_index.groups)
+        with telemetry.span("trends", queries=len(queries), keywords=len(query_index.groups)) as span:
+            trends_results = query_index.expand(resume_trends(rank_keywords(query_index, values), checkpoint, fetch_trends))
+            coverage = trend_coverage(queries, trends_results, values)
+            span.set(coverage=coverage["value_share"])
+        log(coverage_line(coverage))
+        result["trends"] = len(trends_results)
+        result["trend_coverage"] = coverage
+
+    # Run over run (against the previous report of the property) and month over month
+    changes, totals = None, None
+    if not settings.no_changes:
+        with telemetry.span("changes") as span:
+            previous = load_snapshot(prop, job.get("country", "ITA"), settings.period, scope=credential_scope(job["fattoboost_token"]))
+            changes, totals = build_changes(monthly_data, previous)
+            span.add("rows", len(changes))
+        log(changes_stats_line(changes) + ("" if previous is not None else " (no previous run, month over month only)"))
+        result["changes"] = len(changes)
+
+    basename = report_basename(prop, settings.period)
+    with telemetry.span("report"):
+        result["report"] = generate_report(
+            monthly_data, trends_results,
+            output_path=os.path.join(settings.output_dir, basename + ".xlsx"),
+            periods=months,
+            changes=changes
+        )
+    if settings.columnar:
+        with telemetry.span("columnar"):
+            result["columnar"] = generate_columnar_report(
+                monthly_data, trends_results, settings.output_dir, basename=basename, periods=months, changes=changes
+            )
+    if totals is not None:
+        save_snapshot(totals, prop, job.get("country", "ITA"), settings.period, scope=credential_scope(job["fattoboost_token"]))
+    checkpoint.finish()
+
+
+def trends_fetcher(job, settings, shared, result):
+    """
+    Returns a function (queries, on_batch_done=None) -> trends dict for the property,
+    or None if trends are disabled.
+    """
+    if job.get("analyze_trends") and not settings.no_trends:
+        if job.get("dataforseo_user") and job.get("dataforseo_pass"):
+            budget = None
+            if settings.trend_budget or settings.trend_time_budget:
+                budget = CallBudget(settings.trend_budget, settings.trend_time_budget)
+            # Trend series cover the period of the report
+            date_from, date_to = trend_range(settings.windows)
+            def fetch(queries, on_batch_done=None):
+                trends = fetch_keyword_trends(
+                    queries,
+                    job["dataforseo_user"],
+                    job["dataforseo_pass"],
+                    location_code=job.get("location_code", 2380),
+                    date_from=date_from,
+                    date_to=date_to,
+                    store=shared["trend_store"],
+                    limiter=shared["dataforseo_limiter"],
+                    requests_per_second=None if shared["dataforseo_adaptive"] else settings.dataforseo_rps,
+                    adaptive=shared["dataforseo_adaptive"],
+                    slots=shared["dataforseo_slots"],
+                    on_batch_done=on_batch_done,
+                    budget=budget
+                )
+                if budget is not None:
+                    result["trend_budget"] = budget.status_line()
+                result["trends"] = len(trends)
+                result["trend_errors"] = sum(1 for t in trends.values() if t.get("trend") == "Error")
+                return trends
+            return fetch
+        result["errors"].append("DataForSEO credentials missing, trends skipped")
+    return None
+
+
+def run_streaming(job, settings, shared, months, result, log):
+    """
+    Streaming mode: every month goes from the FattoBoost response straight into the
+    Excel sheet in typed batches, and trends are fetched once the monthly sheets are
+    written. Peak memory is about one batch plus the per-query Summary aggregates.
+    Months are fetched one after the other and nothing is kept in the dataset store.
+    """
+    prop = job["gsc_property"]
+    counts = {}
+
+    def month_batches(month_name, start_d, end_d):
+        with shared["fattoboost_slots"]:
+            for batch in stream_fattoboost_month(
+                token=job["fattoboost_token"],
+                start_date=start_d,
+                end_date=end_d,
+                property_url=prop,
+                property_pattern=extract_domain(prop),
+                country=job.get("country", "ITA"),
+                log_callback=log,
+                backoff=shared["fattoboost_backoff"],
+                cache=shared["cache"],
+                limiter=shared["fattoboost_adaptive"]
+            ):
+                counts[month_name] = counts.get(month_name, 0) + len(batch)
+                yield batch
+
+    monthly_data = {name: month_batches(name, start_d, end_d) for name, start_d, end_d in months}
+    fetch_trends = trends_fetcher(job, settings, shared, result)
+    result["trends"] = 0
+
+    def fetch_deduplicated(query_table):
+        # Called by generate_report with the per-query totals once every month has been written
+        queries = list(query_table['query'])
+        values = query_values(query_table)
+        query_index = QueryIndex(queries, weights=values)
+        log(query_index.stats_line())
+        result["trend_keywords"] = len(query_index.groups)
+        with telemetry.span("trends", queries=len(queries), keywords=len(query_index.groups)) as span:
+            trends = query_index.expand(fetch_trends(rank_keywords(query_index, values)))
+            coverage = trend_coverage(queries, trends, values)
+            span.set(coverage=coverage["value_share"])
+        log(coverage_line(coverage))
+        result["trends"] = len(trends)
+        result["trend_coverage"] = coverage
+        return trends
+
+    basename = report_basename(prop, settings.period)
+    # Months are streamed while the report is written, so extraction is part of this span
+    with telemetry.span("report", streamed=True):
+        result["report"] = generate_report(
+            monthly_data, fetch_deduplicated if fetch_trends else {},
+            output_path=os.path.join(settings.output_dir, basename + ".xlsx"),
+            periods=months
+        )
+    failed = [name for name, _, _ in months if not counts.get(name)]
+    result.update({
+        "months_fetched": len(months),
+        "months_reused": 0,
+        "months_failed": failed,
+        "months_with_data": len(months) - len(failed),
+        "records": sum(counts.values()),
+    })
+    if failed:
+        result["errors"].append(f"Months without data: {', '.join(failed)}")
+    if settings.columnar:
+        result["errors"].append("Columnar export is not available in streaming mode")
+
+
+def run_property(job, settings, shared):
+    """
+    Runs the full pipeline (extraction, trends, report) for one property.
+    Its stage timings are written next to the report as <report>_telemetry.json.
+    Returns a JSON-serialisable result dictionary; never raises.
+    """
+    prop = job["gsc_property"]
+    started = time.time()
+    result = {
+        "gsc_property": prop,
+        "country": job.get("country"),
+        "status": "ok",
+        "errors": [],
+    }
+    run_telemetry = telemetry.RunTelemetry(f"{prop} {settings.period}", meta={
+        "property": prop, "country": job.get("country"), "period": settings.period, "granularity": settings.granularity,
+        "mode": "stream" if settings.stream else "jobs" if settings.jobs else "in_memory",
+        "adaptive": settings.adaptive, "full_refresh": settings.full_refresh,
+    })
+    telemetry.activate(run_telemetry)
+
+    def log(msg):
+        print(f"[{prop}] {msg.strip()}")
+
+    try:
+        if not job.get("fattoboost_token"):
+            raise ValueError("Missing FattoBoost token")
+
+        months = settings.windows
+        if settings.stream:
+            run_streaming(job, settings, shared, months, result, log)
+        else:
+            run_in_memory(job, settings, shared, months, result, log)
+    except Exception as e:
+        result["status"] = "failed"
+        result["errors"].append(f"{type(e).__name__}: {e}")
+        log(f"[FAIL] {e}")
+
+    result["duration_s"] = round(time.time() - started, 1)
+    telemetry.activate(None)
+    try:
+        result["telemetry"] = run_telemetry.export_json(
+            os.path.join(settings.output_dir, report_basename(prop, settings.period) + "_telemetry.json")
+        )
+    except OSError as e:
+        result["errors"].append(f"Telemetry not written: {e}")
+    return result
+
+
+def run_batch(jobs, settings):
+    """Processes all jobs on a thread pool and returns the run summary dictionary."""
+    os.makedirs(settings.output_dir, exist_ok=True)
+    settings.period, settings.windows = plan_period(settings)
+
+    # One keep-alive pool per API, sized to its concurrency cap
+    configure_transport("fattoboost", pool_size=settings.max_fattoboost,
+                        connect_timeout=fattoboost_client.CONNECT_TIMEOUT, read_timeout=fattoboost_client.READ_TIMEOUT)
+    configure_transport("dataforseo", pool_size=settings.max_dataforseo, connect_timeout=10, read_timeout=60)
+
+    # Per-source caps shared by every property of the batch
+    shared = {
+        "cache": None if settings.no_cache else get_default_cache(),
+        "trend_store": None if settings.no_cache else get_default_trend_store(),
+        "fattoboost_slots": threading.BoundedSemaphore(settings.max_fattoboost),
+        "fattoboost_backoff": SharedBackoff(),
+        "dataforseo_slots": threading.BoundedSemaphore(settings.max_dataforseo),
+        "dataforseo_limiter": None if settings.adaptive else TokenBucket(settings.dataforseo_rps),
+        # AIMD concurrency below the caps above (--adaptive)
+        "fattoboost_adaptive": AdaptiveLimiter("FattoBoost", max_limit=settings.max_fattoboost, log_callback=print) if settings.adaptive else None,
+        "dataforseo_adaptive": AdaptiveLimiter("DataForSEO", max_limit=settings.max_dataforseo, log_callback=print) if settings.adaptive else None,
+    }
+
+    started = datetime.now()
+    results = []
+    print(f"[*] Batch of {len(jobs)} properties, {settings.workers} in parallel...")
+    with ThreadPoolExecutor(max_workers=max(1, settings.workers)) as pool:
+        futures = [pool.submit(run_property, job, settings, shared) for job in jobs]
+        for future in as_completed(futures):
+            res = future.result()
+            results.append(res)
+            print(f"[*] {len(results)}/{len(jobs)} done - {res['gsc_property']}: {res['status']} ({res['duration_s']}s)")
+
+    order = {job["gsc_property"]: i for i, job in enumerate(jobs)}
+    results.sort(key=lambda r: order.get(r["gsc_property"], 0))
+
+    summary = {
+        "started_at": started.isoformat(timespec="seconds"),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "period": settings.period,
+        "windows": len(settings.windows),
+        "properties": len(jobs),
+        "succeeded": sum(1 for r in results if r["status"] == "ok"),
+        "failed": sum(1 for r in results if r["status"] != "ok"),
+        "cache": shared["cache"].stats_line() if shared["cache"] is not None else None,
+        "trend_store": shared["trend_store"].stats_line() if shared["trend_store"] is not None else None,
+        "http": transport_stats(),
+        "adaptive": [shared[k].status_line() for k in ("fattoboost_adaptive", "dataforseo_adaptive") if shared[k] is not None],
+        "results": results,
+    }
+    summary_path = os.path.join(settings.output_dir, f"run_summary_{started.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"[OK] Run summary written to {summary_path}")
+    summary["summary_path"] = summary_path
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Opportunity reports for many GSC properties.")
+    parser.add_argument("properties_file", help="JSON config or text file with one GSC property per line")
+    parser.add_argument("--output-dir", default="reports", help="Directory for the reports and the run summary")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--start", default=None, help="First day of a custom span (YYYY-MM-DD), instead of the whole --year")
+    parser.add_argument("--end", default=None, help="Last day of a custom span (YYYY-MM-DD)")
+    parser.add_argument("--granularity", choices=GRANULARITIES, default="month", help="Fetch window (and report sheet) size")
+    parser.add_argument("--split-timeout", type=float, default=None,
+                        help="Seconds after which a window that hasn't answered is split in two halves fetched in parallel (not with --jobs)")
+    parser.add_argument("--max-records", type=int, default=None,
+                        help="Split windows returning at least this many records (e.g. a server-side row cap)")
+    parser.add_argument("--workers", type=int, default=4, help="Properties processed in parallel")
+    parser.add_argument("--months-in-flight", type=int, default=4, help="Months in flight per property")
+    parser.add_argument("--max-fattoboost", type=int, default=6, help="FattoBoost requests in flight across the whole batch")
+    parser.add_argument("--max-dataforseo", type=int, default=4, help="DataForSEO tasks in flight across the whole batch")
+    parser.add_argument("--dataforseo-rps", type=float, default=2.0, help="DataForSEO requests per second across the whole batch")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Adapt concurrency to observed latency and 429/5xx (AIMD) up to the --max-* caps, instead of fixed pacing")
+    parser.add_argument("--full-refresh", action="store_true", help="Ignore stored months and fetch everything again")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoints of interrupted runs instead of resuming them")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local response cache and trend store")
+    parser.add_argument("--no-trends", action="store_true", help="Skip DataForSEO enrichment")
+    parser.add_argument("--trend-budget", type=int, default=None,
+                        help="Max DataForSEO tasks per property (one keyword each); highest-value queries are fetched first")
+    parser.add_argument("--trend-time-budget", type=float, default=None,
+                        help="Seconds after which no more trend tasks are started for a property")
+    parser.add_argument("--columnar", action="store_true", help="Also write Parquet files")
+    parser.add_argument("--no-changes", action="store_true",
+                        help="Skip the Changes sheet (run over run and month over month deltas; not available with --stream)")
+    parser.add_argument("--jobs", action="store_true",
+                        help="Submit months as FattoBoost jobs and poll them instead of holding one long request open (resumable); needs FATTOBOOST_JOBS_URL")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream months from the API straight into the report (bounded memory, months fetched sequentially, no incremental store)")
+    args = parser.parse_args(argv)
+    if args.jobs and not os.environ.get("FATTOBOOST_JOBS_URL"):
+        parser.error("--jobs needs the FattoBoost jobs endpoint in FATTOBOOST_JOBS_URL")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    summary = run_batch(load_jobs(args.properties_file), args)
+    raise SystemExit(0 if summary["failed"] == 0 else 1)
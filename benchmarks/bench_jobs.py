@@ -0,0 +1,73 @@
+"""
+Benchmark: blocking FattoBoost requests vs job-based extraction, against the local
+stand-in server (benchmarks/mock_fattoboost.py), when connections get dropped.
+
+Usage:
+    python -m benchmarks.bench_jobs [server_seconds]
+
+Synchronous mode loses the whole server computation when the response is dropped and
+starts it over; job mode only loses a poll. The last scenario interrupts a job-based run
+before the job is done and checks that the next run resumes the same job.
+"""
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_fattoboost import MockFattoBoost
+from tools.extraction_engine import fetch_months_concurrently
+from tools.fattoboost_client import fetch_fattoboost_month, fetch_fattoboost_month_job
+from tools.http_transport import HTTPTransport
+
+MONTHS = [
+    ("Gen 2025", "2025-01-01", "2025-01-31"),
+    ("Feb 2025", "2025-02-01", "2025-02-28"),
+    ("Mar 2025", "2025-03-01", "2025-03-31"),
+    ("Apr 2025", "2025-04-01", "2025-04-30"),
+]
+
+BASE_KWARGS = dict(token="test", property_url="sc-domain:example.com", property_pattern="example.com")
+
+
+def run(mock, fetch_fn, **kwargs):
+    start = time.perf_counter()
+    results = fetch_months_concurrently(
+        MONTHS,
+        fetch_kwargs=dict(BASE_KWARGS, transport=HTTPTransport(pool_size=len(MONTHS)), **kwargs),
+        max_in_flight=len(MONTHS),
+        log_callback=lambda msg: None,
+        fetch_fn=fetch_fn
+    )
+    return results, time.perf_counter() - start
+
+
+def main(server_seconds):
+    print(f"{len(MONTHS)} months in parallel, {server_seconds}s of server time per month")
+    print(f"{'mode':<28} {'wall (s)':>9} {'computations':>13} {'dropped':>8} {'months':>7}")
+
+    with MockFattoBoost(sync_seconds=server_seconds, drop_sync=2) as mock:
+        results, elapsed = run(mock, fetch_fattoboost_month, url=mock.base_url)
+        print(f"{'sync, 2 responses dropped':<28} {elapsed:>9.1f} {mock.counters['computations']:>13} "
+              f"{mock.counters['dropped']:>8} {len(results):>7}")
+
+    with tempfile.TemporaryDirectory() as jobs_dir:
+        with MockFattoBoost(job_seconds=server_seconds, poll_drop_rate=0.3) as mock:
+            results, elapsed = run(mock, fetch_fattoboost_month_job, jobs_url=mock.jobs_url,
+                                   jobs_dir=jobs_dir, poll_interval=1)
+            print(f"{'jobs, 30% polls dropped':<28} {elapsed:>9.1f} {mock.counters['computations']:>13} "
+                  f"{mock.counters['dropped']:>8} {len(results):>7}")
+
+    with tempfile.TemporaryDirectory() as jobs_dir:
+        with MockFattoBoost(job_seconds=server_seconds) as mock:
+            # First run gives up before the jobs are done, the second one resumes them
+            interrupted, _ = run(mock, fetch_fattoboost_month_job, jobs_url=mock.jobs_url,
+                                 jobs_dir=jobs_dir, poll_interval=1, max_wait=server_seconds / 3)
+            results, elapsed = run(mock, fetch_fattoboost_month_job, jobs_url=mock.jobs_url,
+                                   jobs_dir=jobs_dir, poll_interval=1)
+            assert not interrupted
+            assert mock.counters["submissions"] == len(MONTHS), "interrupted jobs were submitted again"
+            print(f"{'jobs, interrupted + resumed':<28} {elapsed:>9.1f} {mock.counters['computations']:>13} "
+                  f"{mock.counters['dropped']:>8} {len(results):>7}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 4.0)
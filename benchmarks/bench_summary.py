@@ -0,0 +1,123 @@
+"""
+Benchmark: Summary sheet computation, legacy per-query loop vs the SummaryAccumulator
+used by generate_report.
+
+Usage:
+    python -m benchmarks.bench_summary [rows ...]
+
+The legacy implementation below is a verbatim copy of the loop that used to live in
+tools/report_builder.generate_report. tests/test_summary.py checks that both versions
+give the same table; the benchmark compares them again on its own sizes before timing.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from tools.report_builder import SummaryAccumulator
+
+MONTHS = pd.date_range("2025-01-01", periods=12, freq="MS")
+
+
+def synthetic_master_df(rows, seed=42):
+    """Random query-month rows shaped like the FattoBoost records."""
+    rng = np.random.default_rng(seed)
+    n_queries = max(1, rows // 6)
+    return pd.DataFrame({
+        'query': [f"query {i}" for i in rng.integers(0, n_queries, rows)],
+        'page': [f"https://example.com/p/{i}" for i in rng.integers(0, 500, rows)],
+        'clicks': rng.poisson(0.8, rows),
+        'impressions': rng.poisson(40, rows),
+        'average_position': rng.uniform(1, 60, rows).round(2),
+        'ctr': rng.uniform(0, 0.2, rows).round(4),
+        'search_volume': rng.integers(0, 5000, rows),
+        '_month_date': MONTHS[rng.integers(0, 12, rows)],
+    })
+
+
+def synthetic_trends(master_df, share=0.3, seed=7):
+    rng = np.random.default_rng(seed)
+    queries = master_df['query'].unique()
+    picked = queries[rng.random(len(queries)) < share]
+    return {q: {"last_value": int(rng.integers(0, 100)), "year_trend": "Up", "data_points": 52} for q in picked}
+
+
+def legacy_summary(master_df, trends_data):
+    summary_list = []
+    grouped = master_df.groupby('query')
+    for query, group in grouped:
+        total_clicks = group['clicks'].sum()
+        total_impressions = group['impressions'].sum()
+        avg_pos = group['average_position'].mean()
+        avg_ctr = group['ctr'].mean()
+        max_vol = group['search_volume'].max()
+
+        sorted_group = group.sort_values('_month_date')
+        clicks_only = sorted_group[sorted_group['clicks'] > 0]
+
+        first_click_month = "N/A"
+        last_click_month = "N/A"
+        peak_month = "N/A"
+
+        if not clicks_only.empty:
+            f_date = clicks_only.iloc[0]['_month_date']
+            l_date = clicks_only.iloc[-1]['_month_date']
+            if pd.notnull(f_date):
+                first_click_month = f_date.strftime('%b %Y')
+            if pd.notnull(l_date):
+                last_click_month = l_date.strftime('%b %Y')
+
+        peak_idx = sorted_group['clicks'].idxmax()
+        peak_row = sorted_group.loc[peak_idx]
+        p_date = peak_row['_month_date']
+        if pd.notnull(p_date):
+            peak_month = p_date.strftime('%b %Y')
+
+        record = {
+            'Query': query,
+            'Total Clicks': total_clicks,
+            'Total Impressions': total_impressions,
+            'Avg Position': avg_pos,
+            'Avg CTR': avg_ctr,
+            'Max Search Volume': max_vol,
+            'First Click Month': first_click_month,
+            'Peak Click Month': peak_month,
+            'Last Click Month': last_click_month
+        }
+        if query in trends_data:
+            for k, v in trends_data[query].items():
+                record[f"Trend {k}"] = v
+        summary_list.append(record)
+    return pd.DataFrame(summary_list)
+
+
+def streaming_summary(master_df, trends_data, batch_size=20_000):
+    acc = SummaryAccumulator()
+    for month_date, month_df in master_df.groupby('_month_date', sort=False):
+        for start in range(0, len(month_df), batch_size):
+            acc.add(month_df.iloc[start:start + batch_size], month_date)
+    return acc.result(trends_data)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'legacy (s)':>12} {'accumulator (s)':>16} {'speedup':>9}")
+    for rows in sizes:
+        master_df = synthetic_master_df(rows)
+        trends = synthetic_trends(master_df)
+
+        new, new_s = timed(streaming_summary, master_df, trends)
+        old, old_s = timed(legacy_summary, master_df, trends)
+
+        pd.testing.assert_frame_equal(old, new, check_dtype=False)
+        print(f"{rows:>10} {old_s:>12.3f} {new_s:>16.3f} {old_s / new_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 50_000])
@@ -0,0 +1,92 @@
+"""
+Benchmark: trend metrics computed per keyword in a Python loop vs the batched
+NumPy pass of tools/trend_analytics.trend_metrics.
+
+Usage:
+    python -m benchmarks.bench_trend_analytics [keywords ...]
+
+The per-keyword version below computes the same metrics one series at a time;
+tests/test_trend_analytics.py checks that both agree, and the benchmark compares them
+again on its own sizes before timing.
+"""
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from tools.trend_analytics import trend_metrics
+
+WEEKS = 53
+
+
+def synthetic_series(keywords, seed=3):
+    """Weekly Google Trends-like series (0-100), with a few missing values."""
+    rng = np.random.default_rng(seed)
+    dates = [date(2024, 1, 1) + timedelta(weeks=i) for i in range(WEEKS)]
+    values = rng.integers(0, 101, (keywords, WEEKS))
+    missing = rng.random((keywords, WEEKS)) < 0.02
+    return {
+        f"keyword {k}": [
+            {'date_from': d.isoformat(), 'date_to': (d + timedelta(days=6)).isoformat(),
+             'values': [] if missing[k, i] else [int(values[k, i])]}
+            for i, d in enumerate(dates)
+        ]
+        for k in range(keywords)
+    }
+
+
+def per_keyword_metrics(series_by_keyword):
+    rows = {}
+    for kw, points in series_by_keyword.items():
+        dates = [date.fromisoformat(p['date_from']) for p in points]
+        values = [p['values'][0] if p['values'] else None for p in points]
+        valid = [(d, v) for d, v in zip(dates, values) if v is not None]
+        last_value = values[-1] or 0
+        first_value = values[0] or 0
+        row = {
+            'last_value': last_value,
+            'year_trend': 'Up' if last_value > first_value else 'Down',
+            'data_points': len(points),
+            'slope_per_week': np.nan, 'delta_7d': np.nan, 'delta_30d': np.nan,
+            'peak_month': None, 'volatility': np.nan,
+        }
+        if valid:
+            x = np.array([(d - dates[0]).days / 7.0 for d, _ in valid])
+            y = np.array([v for _, v in valid], dtype=float)
+            if len(valid) > 1:
+                row['slope_per_week'] = round(np.polyfit(x, y, 1)[0], 3)
+            if y.mean() > 0:
+                row['volatility'] = round(y.std() / y.mean(), 3)
+            row['peak_month'] = valid[int(np.argmax(y))][0].strftime('%b %Y')
+            last_date, last_v = valid[-1]
+            for days, col in [(7, 'delta_7d'), (30, 'delta_30d')]:
+                earlier = [v for d, v in valid if d <= last_date - timedelta(days=days)]
+                if earlier:
+                    row[col] = last_v - earlier[-1]
+        rows[kw] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'keywords':>10} {'per keyword (s)':>16} {'vectorized (s)':>15} {'speedup':>9}")
+    for keywords in sizes:
+        series = synthetic_series(keywords)
+        new, new_s = timed(trend_metrics, series)
+        old, old_s = timed(per_keyword_metrics, series)
+        pd.testing.assert_frame_equal(
+            old.astype(object).where(old.notna(), None), new.astype(object).where(new.notna(), None),
+            check_dtype=False, check_names=False, check_exact=False, atol=1e-3
+        )
+        print(f"{keywords:>10} {old_s:>16.3f} {new_s:>15.3f} {old_s / new_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000])
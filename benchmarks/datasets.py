@@ -0,0 +1,65 @@
+"""
+Synthetic monthly datasets shaped like the FattoBoost records, from 1k to 1M rows,
+for the offline benchmarks. Same seed, same data.
+"""
+import numpy as np
+import pandas as pd
+
+from tools.periods import months_of_year
+
+# Dataset sizes of the suite; "1M" is the size of our biggest properties over a year
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+
+
+def parse_size(label):
+    """"100k" / "1M" / "2500" -> number of rows."""
+    label = label.strip()
+    if label in SIZES:
+        return SIZES[label]
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(label[-1:].lower(), 1)
+    return int(float(label[:-1] if multiplier > 1 else label) * multiplier)
+
+
+def size_label(rows):
+    for label, n in SIZES.items():
+        if n == rows:
+            return label
+    return str(rows)
+
+
+def synthetic_monthly_data(rows, year=2025, seed=42):
+    """
+    { month_name: DataFrame } with `rows` records spread over the 12 months of `year`
+    (about 6 records per distinct query, 500 pages).
+    """
+    rng = np.random.default_rng(seed)
+    n_queries = max(1, rows // 6)
+    queries = np.array([f"query {i}" for i in range(n_queries)], dtype=object)
+    pages = np.array([f"https://example.com/p/{i}" for i in range(500)], dtype=object)
+    month_of_row = np.sort(rng.integers(0, 12, rows))
+    df = pd.DataFrame({
+        'query': queries[rng.integers(0, n_queries, rows)],
+        'page': pages[rng.integers(0, 500, rows)],
+        'clicks': rng.poisson(0.8, rows),
+        'impressions': rng.poisson(40, rows),
+        'average_position': rng.uniform(1, 60, rows).round(2),
+        'ctr': rng.uniform(0, 0.2, rows).round(4),
+        'search_volume': rng.integers(0, 5000, rows),
+    })
+    bounds = np.searchsorted(month_of_row, np.arange(13))
+    return {
+        month_name: df.iloc[bounds[m]:bounds[m + 1]].reset_index(drop=True)
+        for m, (month_name, _, _) in enumerate(months_of_year(year))
+    }
+
+
+def synthetic_trends(queries, share=0.3, seed=7):
+    """Trend results (as returned by fetch_keyword_trends) for `share` of the queries."""
+    rng = np.random.default_rng(seed)
+    queries = list(queries)
+    picked = rng.random(len(queries)) < share
+    return {
+        q: {"last_value": int(rng.integers(0, 100)), "year_trend": "Up", "data_points": 53,
+            "slope_per_week": 0.1, "delta_7d": 2, "delta_30d": -3, "peak_month": "Mar 2025", "volatility": 0.4}
+        for q, keep in zip(queries, picked) if keep
+    }
@@ -0,0 +1,163 @@
+"""
+Benchmark: cold import time of the app and tools modules, each in a fresh interpreter.
+
+Usage:
+    python -m benchmarks.import_time [--repeat N] [--max-ms MS] [--jobs [--workers N]]
+
+Heavy dependencies (pandas / numpy / pyarrow, openpyxl, requests) are only imported by the
+code paths that need them: every module is checked against the heavy modules it is allowed
+to load at import time (EXPECTED_HEAVY) and the run fails (exit code 1) on any extra one,
+or when a module takes longer than --max-ms. app.py needs streamlit, so it is checked from its source:
+every tools module it imports at module level (run by every new session) must be free of heavy
+modules; the others are imported where they are used. --jobs also times the first job of every worker of a
+JobQueue, with and without the preloaded task module. Preloading imports the task module once in
+the forkserver instead of once per worker: it pays off from 2 workers on (with a single worker the
+import just moves from the worker to the forkserver).
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "openpyxl", "requests")
+
+DATAFRAMES = {"pandas", "numpy", "pyarrow"}
+
+# Heavy modules each module may load just by being imported
+EXPECTED_HEAVY = {
+    "tools.periods": set(),
+    "tools.rate_limit": set(),
+    "tools.telemetry": set(),
+    "tools.run_checkpoint": set(),
+    "tools.response_cache": set(),
+    "tools.job_store": set(),
+    "tools.dataset_store": set(),
+    "tools.record_stream": set(),
+    "tools.trend_store": set(),
+    "tools.job_queue": set(),
+    "tools.query_index": set(),
+    "tools.pipeline": set(),
+    "tools.dataforseo_client": set(),
+    "tools.excel_writer": set(),
+    "tools.http_transport": set(),
+    "tools.fattoboost_client": set(),
+    "tools.extraction_engine": set(),
+    "tools.trend_priority": {"numpy"},
+    "tools.compact_dataset": DATAFRAMES,
+    "tools.query_selection": DATAFRAMES,
+    "tools.trend_analytics": DATAFRAMES,
+    "tools.report_diff": DATAFRAMES,
+    "tools.report_builder": DATAFRAMES,
+    "app_jobs": DATAFRAMES,
+}
+
+PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(elapsed, ','.join(m for m in {heavy!r} if m in sys.modules))\n"
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import(module, repeat):
+    """Best of `repeat` fresh-interpreter imports: (milliseconds, heavy modules loaded)."""
+    best, heavy = None, set()
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                             cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+        elapsed = float(out[0]) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+        heavy = set(out[1].split(",")) if len(out) > 1 else set()
+    return best, heavy
+
+
+def module_level_imports(path):
+    """Modules imported by the top-level statements of a source file (not inside functions or branches)."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    modules = set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            # "from tools import telemetry" imports tools.telemetry
+            modules.update(f"{node.module}.{alias.name}" for alias in node.names)
+            modules.add(node.module)
+    return modules
+
+
+def first_job(job):
+    """Task of the --jobs case: what a real job imports before doing any work."""
+    import app_jobs  # noqa: F401
+    return os.getpid()
+
+
+def _first_jobs_ms(preload, workers):
+    from tools.job_queue import JobQueue
+
+    queue = JobQueue(max_workers=workers, preload=preload)
+    start = time.perf_counter()
+    job_ids = [queue.submit("bench", "benchmarks.import_time:first_job") for _ in range(workers)]
+    while any(queue.status(job_id)["status"] not in ("done", "failed") for job_id in job_ids):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    for job_id in job_ids:
+        queue.result(job_id)
+    queue.shutdown()
+    return elapsed * 1000
+
+
+def time_first_jobs(preload, workers):
+    """
+    Submit-to-done time of the first job of every worker of a new queue, in its own
+    interpreter (the forkserver is started once per process).
+    """
+    code = f"from benchmarks.import_time import _first_jobs_ms; print(_first_jobs_ms({preload!r}, {workers}))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return float(out.split()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold import time of the app and tools modules.")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per module (the best one counts)")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if a module without heavy dependencies takes longer")
+    parser.add_argument("--jobs", action="store_true", help="Also time the first job of every JobQueue worker")
+    parser.add_argument("--workers", type=int, default=4, help="Workers of the --jobs case (the app's default on 4+ CPUs)")
+    args = parser.parse_args(argv)
+
+    print(f"{'module':<26} {'import (ms)':>12}  heavy modules loaded")
+    violations = []
+    for module, allowed in EXPECTED_HEAVY.items():
+        elapsed, heavy = time_import(module, args.repeat)
+        extra = heavy - allowed
+        print(f"{module:<26} {elapsed:>12.1f}  {', '.join(sorted(heavy)) or '-'}")
+        if extra:
+            violations.append(f"{module} imports {', '.join(sorted(extra))}")
+        if args.max_ms is not None and not allowed and elapsed > args.max_ms:
+            violations.append(f"{module} took {elapsed:.0f}ms (budget {args.max_ms:.0f}ms)")
+
+    for module in sorted(module_level_imports(os.path.join(ROOT, "app.py"))):
+        if module in EXPECTED_HEAVY and EXPECTED_HEAVY[module]:
+            violations.append(f"app imports {module} at module level ({', '.join(sorted(EXPECTED_HEAVY[module]))})")
+
+    if args.jobs:
+        print(f"\n{f'first jobs ({args.workers} workers)':<26} {'wall (ms)':>12}")
+        plain = min(time_first_jobs([], args.workers) for _ in range(args.repeat))
+        preloaded = min(time_first_jobs(["app_jobs"], args.workers) for _ in range(args.repeat))
+        print(f"{'no preload':<26} {plain:>12.1f}")
+        print(f"{'preload app_jobs':<26} {preloaded:>12.1f}  ({plain / preloaded:.1f}x)")
+
+    if violations:
+        for violation in violations:
+            print(f"    [ERROR] {violation}")
+        sys.exit(1)
+    print("[OK] No heavy dependency imported outside its code paths")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
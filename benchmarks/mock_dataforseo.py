@@ -0,0 +1,100 @@
+"""
+Local stand-in for the DataForSEO Google Trends explore/live endpoint, for running
+fetch_keyword_trends offline (no API credits spent).
+
+    POST /v3/keywords_data/google_trends/explore/live
+
+Every task gets one weekly google_trends_graph item covering its date range (or `points`
+weeks), with deterministic values per keyword, after `latency` seconds. A share of the
+calls can be answered with 429 (`rate_limit_rate`, with a Retry-After header) or 500
+(`server_error_rate`). `counters` records tasks, keywords and rejected calls.
+
+Usage:
+    python -m benchmarks.mock_dataforseo --port 8766 --latency 0.5 --rate-limit-rate 0.1
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.mock_server import MockServer, send_json
+
+API_PATH = "/v3/keywords_data/google_trends/explore/live"
+
+
+def synthetic_trends_task(task, points=None):
+    """DataForSEO-like result of one explore task, deterministic per keyword."""
+    keywords = task.get("keywords") or []
+    start = date.fromisoformat(task.get("date_from") or "2024-01-01")
+    end = date.fromisoformat(task.get("date_to") or "2024-12-31")
+    weeks = points if points is not None else max(1, (end - start).days // 7 + 1)
+    rngs = [random.Random(kw) for kw in keywords]
+    data = []
+    for i in range(weeks):
+        week = start + timedelta(weeks=i)
+        data.append({
+            "date_from": week.isoformat(),
+            "date_to": (week + timedelta(days=6)).isoformat(),
+            "values": [rng.randrange(101) for rng in rngs],
+        })
+    return {
+        "status_code": 20000,
+        "result": [{"items": [{"type": "google_trends_graph", "keywords": keywords, "data": data}]}],
+    }
+
+
+class MockDataForSEO(MockServer):
+    def __init__(self, latency=0.2, points=None, rate_limit_rate=0.0, server_error_rate=0.0, retry_after=1, seed=0):
+        super().__init__({"calls": 0, "tasks": 0, "keywords": 0, "server_errors": 0},
+                         rate_limit_rate=rate_limit_rate, retry_after=retry_after, seed=seed)
+        self.latency = latency
+        self.points = points
+        self.server_error_rate = server_error_rate
+
+    @property
+    def url(self):
+        return self.address + API_PATH
+
+    def _post(self, handler, payload):
+        if handler.path.rstrip("/") != API_PATH:
+            send_json(handler, 404, {"status_code": 40400, "status_message": "Not found"})
+            return
+        self._count("calls")
+        if self._rate_limited(handler):
+            return
+        time.sleep(self.latency)
+        if self.server_error_rate and self._chance(self.server_error_rate):
+            self._count("server_errors")
+            send_json(handler, 500, {"status_code": 50000, "status_message": "Internal error"})
+            return
+        tasks = payload if isinstance(payload, list) else [payload]
+        self._count("tasks", len(tasks))
+        self._count("keywords", sum(len(t.get("keywords") or []) for t in tasks))
+        send_json(handler, 200, {
+            "status_code": 20000,
+            "status_message": "Ok.",
+            "tasks": [synthetic_trends_task(t, self.points) for t in tasks],
+        })
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the DataForSEO Google Trends API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.5, help="Server time of a task")
+    parser.add_argument("--points", type=int, default=None, help="Weekly points per series (default: the task's date range)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls answered with a 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="Share of calls answered with a 500")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    mock = MockDataForSEO(args.latency, args.points, args.rate_limit_rate, args.server_error_rate)
+    mock.start(args.host, args.port)
+    print(f"[*] Mock DataForSEO listening on {mock.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
@@ -0,0 +1,157 @@
+"""
+Local stand-in for the FattoBoost API, for trying the clients offline.
+
+Serves the synchronous endpoint and the job endpoints used by
+fetch_fattoboost_month_job, with synthetic records and simulated server time:
+
+    POST /api/internal_linking_opportunities              blocks `sync_seconds`, returns the month
+    POST /api/internal_linking_opportunities/jobs         returns {"job_id"}; the job takes `job_seconds`
+    GET  /api/internal_linking_opportunities/jobs/<id>    job status
+    GET  /api/internal_linking_opportunities/jobs/<id>/result
+
+Connection drops can be simulated (`drop_sync` synchronous responses are dropped after
+the computation, `poll_drop_rate` of the polls are dropped), as well as an account
+tier: with `max_concurrent` set, synchronous requests beyond that many in flight get a
+429 with a Retry-After header; `rate_limit_rate` answers that share of the requests with a
+429 regardless. `counters` records how many month computations the server had to run.
+
+Usage:
+    python -m benchmarks.mock_fattoboost --port 8765 --job-seconds 30
+"""
+import argparse
+import random
+import time
+import uuid
+
+from benchmarks.mock_server import MockServer, send_json
+
+API_PATH = "/api/internal_linking_opportunities"
+
+
+def synthetic_month(payload, records=1000):
+    """Deterministic FattoBoost-like records for a request payload."""
+    rng = random.Random(f"{payload.get('searchConsoleProperty')}|{payload.get('dateRangeStart')}")
+    return [
+        {
+            "query": f"query {rng.randrange(records * 2)}",
+            "page": f"https://example.com/p/{rng.randrange(500)}",
+            "clicks": rng.randrange(20),
+            "impressions": rng.randrange(2000),
+            "average_position": round(rng.uniform(1, 60), 2),
+            "ctr": round(rng.uniform(0, 0.2), 4),
+            "search_volume": rng.randrange(5000),
+        }
+        for _ in range(records)
+    ]
+
+
+class MockFattoBoost(MockServer):
+    def __init__(self, sync_seconds=1.0, job_seconds=1.0, records=1000, drop_sync=0, poll_drop_rate=0.0, seed=0,
+                 max_concurrent=None, retry_after=1, rate_limit_rate=0.0):
+        super().__init__({"computations": 0, "submissions": 0, "polls": 0},
+                         rate_limit_rate=rate_limit_rate, retry_after=retry_after, seed=seed)
+        self.sync_seconds = sync_seconds
+        self.job_seconds = job_seconds
+        self.records = records
+        self.drop_sync = drop_sync
+        self.poll_drop_rate = poll_drop_rate
+        self.max_concurrent = max_concurrent
+        self._in_flight = 0
+        self._jobs = {}
+
+    @property
+    def base_url(self):
+        return self.address + API_PATH
+
+    @property
+    def jobs_url(self):
+        return self.base_url + "/jobs"
+
+    def _post(self, handler, payload):
+        path = handler.path.rstrip("/")
+        if path in (API_PATH, API_PATH + "/jobs") and self._rate_limited(handler):
+            return
+        if path == API_PATH:
+            with self._lock:
+                rejected = self.max_concurrent is not None and self._in_flight >= self.max_concurrent
+                if not rejected:
+                    self._in_flight += 1
+            if rejected:
+                self._count("rejected")
+                send_json(handler, 429, {"success": False, "message": "Too many requests"},
+                          {"Retry-After": str(self.retry_after)})
+                return
+            self._count("computations")
+            time.sleep(self.sync_seconds)
+            with self._lock:
+                self._in_flight -= 1
+                drop = self.drop_sync > 0
+                if drop:
+                    self.drop_sync -= 1
+            if drop:
+                self._drop(handler)
+                return
+            send_json(handler, 200, {"success": True, "data": synthetic_month(payload, self.records)})
+        elif path == API_PATH + "/jobs":
+            self._count("computations")
+            self._count("submissions")
+            job_id = uuid.uuid4().hex
+            with self._lock:
+                self._jobs[job_id] = {"payload": payload, "ready_at": time.time() + self.job_seconds}
+            send_json(handler, 202, {"success": True, "job_id": job_id})
+        else:
+            send_json(handler, 404, {"success": False, "message": "Not found"})
+
+    def _get(self, handler):
+        parts = handler.path.rstrip("/").split("/")
+        if handler.path.startswith(API_PATH + "/jobs/") and len(parts) in (5, 6):
+            with self._lock:
+                job = self._jobs.get(parts[4])
+            if job is None:
+                send_json(handler, 404, {"success": False, "message": "Unknown job"})
+                return
+            remaining = job["ready_at"] - time.time()
+            if len(parts) == 6:
+                if remaining > 0:
+                    send_json(handler, 409, {"success": False, "message": "Job not finished"})
+                else:
+                    send_json(handler, 200, {"success": True, "data": synthetic_month(job["payload"], self.records)})
+                return
+            self._count("polls")
+            if self._chance(self.poll_drop_rate):
+                self._drop(handler)
+                return
+            if remaining > 0:
+                progress = 1 - remaining / self.job_seconds if self.job_seconds else 1
+                send_json(handler, 200, {"status": "running", "progress": round(progress, 2)})
+            else:
+                send_json(handler, 200, {"status": "done", "progress": 1.0})
+        else:
+            send_json(handler, 404, {"success": False, "message": "Not found"})
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the FattoBoost API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sync-seconds", type=float, default=5.0, help="Server time of a synchronous request")
+    parser.add_argument("--job-seconds", type=float, default=5.0, help="Server time of a job")
+    parser.add_argument("--records", type=int, default=1000, help="Records per month")
+    parser.add_argument("--drop-sync", type=int, default=0, help="Number of synchronous responses to drop")
+    parser.add_argument("--poll-drop-rate", type=float, default=0.0, help="Share of job polls to drop")
+    parser.add_argument("--max-concurrent", type=int, default=None, help="Synchronous requests in flight before 429s")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with a 429")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    mock = MockFattoBoost(args.sync_seconds, args.job_seconds, args.records, args.drop_sync, args.poll_drop_rate,
+                          max_concurrent=args.max_concurrent, rate_limit_rate=args.rate_limit_rate)
+    mock.start(args.host, args.port)
+    print(f"[*] Mock FattoBoost listening on {mock.base_url} (jobs: {mock.jobs_url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
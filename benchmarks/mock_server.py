@@ -0,0 +1,105 @@
+"""
+Shared plumbing of the local API stand-ins (mock_fattoboost.py, mock_dataforseo.py):
+a threaded HTTP server on a background thread, JSON answers, dropped connections,
+429 injection and request counters.
+"""
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockServer:
+    """
+    Base class: subclasses implement _post(handler, payload) and _get(handler).
+    rate_limit_rate: Share of the requests answered with a 429 (and a Retry-After
+                     header of `retry_after` seconds) instead of being served.
+    counters: Request counters, updated with _count(name).
+    """
+
+    def __init__(self, counters, rate_limit_rate=0.0, retry_after=1, seed=0):
+        self.counters = dict(counters, rejected=0, dropped=0)
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._server = None
+
+    @property
+    def address(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host="127.0.0.1", port=0):
+        """Starts the server on a background thread; port 0 picks a free port."""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                mock._post(self, payload)
+
+            def do_GET(self):
+                mock._get(self)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start() if self._server is None else self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _post(self, handler, payload):
+        send_json(handler, 404, {"success": False, "message": "Not found"})
+
+    def _get(self, handler):
+        send_json(handler, 404, {"success": False, "message": "Not found"})
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def _chance(self, rate):
+        with self._lock:
+            return self._rng.random() < rate
+
+    def _rate_limited(self, handler):
+        """Answers with a 429 for `rate_limit_rate` of the calls; True if it did."""
+        if not self.rate_limit_rate or not self._chance(self.rate_limit_rate):
+            return False
+        self._count("rejected")
+        send_json(handler, 429, {"success": False, "message": "Too many requests"},
+                  {"Retry-After": str(self.retry_after)})
+        return True
+
+    def _drop(self, handler):
+        # Close the socket without an answer, like a proxy timing out
+        self._count("dropped")
+        handler.close_connection = True
+        handler.connection.close()
+
+
+def send_json(handler, status, body, headers=None):
+    data = json.dumps(body).encode("utf-8")
+    handler.send_response(status)
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(data)))
+    handler.end_headers()
+    handler.wfile.write(data)
@@ -0,0 +1,264 @@
+"""
+Offline benchmark suite: extraction and trend enrichment against local stand-in servers
+(mock_fattoboost.py, mock_dataforseo.py), Summary and Step 2 aggregation, Excel and
+columnar writing and the Changes table, on synthetic datasets from 1k to 1M rows. No API credits are spent.
+
+Usage:
+    python -m benchmarks.suite [--sizes 1k,10k,100k] [--cases extraction,summary,...]
+                               [--label before] [--baseline latest|<results.json>]
+
+Every run is stored in benchmarks/results/<label>_<timestamp>.json (environment, settings
+and one entry per case and size, with the telemetry counters of tools/telemetry.py).
+--baseline compares the run with a stored one: run with --label before on the base commit
+of a change and with --baseline latest once it is applied. The suite uses the APIs of the
+tools package as they are now (QueryIndex, SummaryAccumulator, iter_json_array, ...), so
+the base commit must already contain benchmarks/suite.py: trees older than the suite
+can't be measured with it.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.datasets import parse_size, size_label, synthetic_monthly_data, synthetic_trends
+from benchmarks.mock_dataforseo import MockDataForSEO
+from benchmarks.mock_fattoboost import MockFattoBoost
+from tools import telemetry
+from tools.compact_dataset import aggregate_queries, build_dataset
+from tools.dataforseo_client import fetch_keyword_trends
+from tools.extraction_engine import fetch_months_concurrently
+from tools.http_transport import HTTPTransport
+from tools.periods import months_of_year, period_dates
+from tools.report_diff import build_changes
+from tools.report_builder import SummaryAccumulator, generate_columnar_report, generate_report
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+CASES = ["extraction", "trends", "summary", "step2", "changes", "excel", "columnar"]
+# Cases that don't depend on the dataset size
+UNSIZED_CASES = {"trends"}
+
+
+def bench_extraction(rows, args):
+    """12 months fetched 4 at a time from the FattoBoost stand-in (rows spread over the months)."""
+    months = months_of_year(2025)
+    with MockFattoBoost(sync_seconds=args.latency, records=max(1, rows // len(months)),
+                        rate_limit_rate=args.rate_limit_rate, retry_after=0) as mock:
+        fetched = fetch_months_concurrently(
+            months,
+            fetch_kwargs=dict(token="bench", property_url="sc-domain:example.com", property_pattern="example.com",
+                              url=mock.base_url, transport=HTTPTransport(pool_size=4)),
+            max_in_flight=4,
+            log_callback=lambda msg: None
+        )
+    return {"months": len(fetched), "rejected": mock.counters["rejected"]}
+
+
+def bench_trends(rows, args):
+    """`--keywords` keywords enriched through the DataForSEO stand-in, adaptive concurrency off."""
+    keywords = [f"query {i}" for i in range(args.keywords)]
+    with MockDataForSEO(latency=args.latency, rate_limit_rate=args.rate_limit_rate, retry_after=0) as mock:
+        results = fetch_keyword_trends(keywords, "bench", "bench", url=mock.url, transport=HTTPTransport(),
+                                       requests_per_second=None, max_in_flight=4)
+    return {"keywords": len(results), "errors": sum(1 for r in results.values() if r.get("trend") == "Error"),
+            "rejected": mock.counters["rejected"]}
+
+
+def bench_summary(monthly_data, args):
+    acc = SummaryAccumulator()
+    dates = period_dates(months_of_year(2025))
+    for month_name, df in monthly_data.items():
+        acc.add(df, pd.Timestamp(dates[month_name]))
+        telemetry.record("rows", len(df))
+    summary = acc.result(synthetic_trends(acc.queries()))
+    return {"summary_rows": len(summary)}
+
+
+def bench_step2(monthly_data, args):
+    dataset, _ = build_dataset(monthly_data)
+    table = aggregate_queries(dataset)
+    telemetry.record("rows", len(dataset))
+    return {"queries": len(table)}
+
+
+def bench_changes(monthly_data, args):
+    """Month over month, plus run over run against the same data with every click count doubled."""
+    _, previous = build_changes(monthly_data, month_over_month=False)
+    previous['clicks'] *= 2
+    changes, totals = build_changes(monthly_data, previous)
+    telemetry.record("rows", sum(len(df) for df in monthly_data.values()))
+    return {"changes": len(changes), "keys": len(totals)}
+
+
+def bench_excel(monthly_data, args):
+    with tempfile.TemporaryDirectory() as out:
+        path = generate_report(monthly_data, _trends_for(monthly_data), output_path=os.path.join(out, "bench.xlsx"),
+                               periods=months_of_year(2025))
+        return {"file_mb": round(os.path.getsize(path) / 1e6, 2)}
+
+
+def bench_columnar(monthly_data, args):
+    with tempfile.TemporaryDirectory() as out:
+        paths = generate_columnar_report(monthly_data, _trends_for(monthly_data), out, basename="bench",
+                                         periods=months_of_year(2025))
+        return {"file_mb": round(sum(os.path.getsize(p) for p in paths.values()) / 1e6, 2)}
+
+
+def _trends_for(monthly_data):
+    queries = pd.unique(np.concatenate([df['query'].to_numpy() for df in monthly_data.values()]))
+    return synthetic_trends(queries)
+
+
+BENCHMARKS = {
+    "extraction": bench_extraction,
+    "trends": bench_trends,
+    "summary": bench_summary,
+    "step2": bench_step2,
+    "changes": bench_changes,
+    "excel": bench_excel,
+    "columnar": bench_columnar,
+}
+
+
+def run_case(case, size, args, monthly_data=None):
+    """Runs one case under a telemetry span and returns its result entry."""
+    run = telemetry.RunTelemetry(f"bench {case}")
+    telemetry.activate(run)
+    try:
+        # The clients' progress messages would break up the results table
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet, telemetry.span(case) as span:
+            details = BENCHMARKS[case](monthly_data if monthly_data is not None else size, args)
+            span.set(**details)
+    finally:
+        telemetry.activate(None)
+    entry = dict(run.spans[-1], case=case, size=size_label(size) if case not in UNSIZED_CASES else "-")
+    entry.pop("name")
+    entry.pop("parent")
+    entry["rows_per_s"] = round(entry["rows"] / entry["wall_s"]) if entry["rows"] and entry["wall_s"] else None
+    return entry
+
+
+def run_suite(args):
+    results = []
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    cases = [c.strip() for c in args.cases.split(",")]
+    for case in [c for c in cases if c in UNSIZED_CASES]:
+        results.append(run_case(case, 0, args))
+        _print_entry(results[-1])
+    for size in sorted(sizes):
+        sized = [c for c in cases if c not in UNSIZED_CASES]
+        monthly_data = synthetic_monthly_data(size) if any(c != "extraction" for c in sized) else None
+        for case in sized:
+            try:
+                results.append(run_case(case, size, args, None if case == "extraction" else monthly_data))
+            except ImportError as e:
+                # e.g. columnar without pyarrow
+                print(f"    [WARN] {case} skipped: {e}")
+                continue
+            _print_entry(results[-1])
+        del monthly_data
+    return results
+
+
+def _print_entry(e):
+    rate = f"{e['rows_per_s']:,}" if e["rows_per_s"] else "-"
+    print(f"{e['case']:<11} {e['size']:>5} {e['wall_s']:>9.3f} {rate:>12} {e['requests']:>6} {e['retries']:>7} "
+          f"{(e['rss_growth_mb'] if e['rss_growth_mb'] is not None else '-'):>9}")
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(RESULTS_DIR), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    versions = {}
+    for module in ["numpy", "pandas", "pyarrow", "openpyxl", "requests"]:
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "git_commit": commit, **versions}
+
+
+def save_results(label, args, results):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    created = datetime.now()
+    path = os.path.join(RESULTS_DIR, f"{label}_{created.strftime('%Y%m%d_%H%M%S')}.json")
+    settings = {k: v for k, v in vars(args).items() if k not in ("baseline", "label", "verbose")}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"label": label, "created_at": created.isoformat(timespec="seconds"), "environment": environment(),
+                   "settings": settings, "results": results}, f, indent=2, default=str)
+    return path
+
+
+def latest_results(exclude=None):
+    paths = [p for p in glob.glob(os.path.join(RESULTS_DIR, "*.json")) if p != exclude]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def compare(baseline, current):
+    """
+    (case, size) table of the wall time of two result files and the change in percent
+    (positive = slower than the baseline), for the cases of `current`.
+    """
+    def frame(results):
+        return pd.DataFrame(results["results"]).set_index(["case", "size"])[["wall_s", "requests", "retries"]]
+
+    before, after = frame(baseline), frame(current)
+    out = after.join(before, how="left", rsuffix="_baseline")
+    out["change_pct"] = ((out["wall_s"] / out["wall_s_baseline"].where(out["wall_s_baseline"] > 0) - 1) * 100).round(1)
+    return out[["wall_s_baseline", "wall_s", "change_pct", "requests_baseline", "requests", "retries_baseline", "retries"]]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite (local stand-in servers, synthetic data).")
+    parser.add_argument("--sizes", default="1k,10k,100k", help="Dataset sizes, e.g. 1k,10k,100k,1M")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"Comma separated subset of {', '.join(CASES)}")
+    parser.add_argument("--latency", type=float, default=0.05, help="Server time of a mock API call, in seconds")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.05, help="Share of mock API calls answered with a 429")
+    parser.add_argument("--keywords", type=int, default=200, help="Keywords of the trends case")
+    parser.add_argument("--verbose", action="store_true", help="Show the progress messages of the clients")
+    parser.add_argument("--label", default="run", help="Name of the stored results file")
+    parser.add_argument("--baseline", default=None, help="Results file to compare with, or 'latest'")
+    args = parser.parse_args(argv)
+    unknown = set(c.strip() for c in args.cases.split(",")) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    baseline_path = latest_results() if args.baseline == "latest" else args.baseline
+    print(f"{'case':<11} {'size':>5} {'wall (s)':>9} {'rows/s':>12} {'req':>6} {'retries':>7} {'+RSS MB':>9}")
+    started = time.perf_counter()
+    results = run_suite(args)
+    path = save_results(args.label, args, results)
+    print(f"[OK] {len(results)} results in {time.perf_counter() - started:.1f}s, saved to {path}")
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(path, encoding="utf-8") as f:
+            current = json.load(f)
+        print(f"\nCompared with {os.path.basename(baseline_path)} ({baseline['environment'].get('git_commit')}):")
+        print(compare(baseline, current).to_string())
+    elif args.baseline:
+        print("    [WARN] No stored results to compare with.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
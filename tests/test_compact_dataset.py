@@ -0,0 +1,25 @@
+from tools.compact_dataset import aggregate_queries, build_dataset, split_months, unique_query_count
+
+MONTHLY = {
+    "Feb 2025": [{"query": "a", "page": "/p", "clicks": 2, "impressions": 20, "average_position": 4.0, "ctr": 0.1}],
+    "Gen 2025": [{"query": "a", "page": "/p", "clicks": "1", "impressions": 10, "average_position": None, "ctr": 0.1},
+                 {"query": "b", "page": "/q", "clicks": 0, "impressions": 5, "average_position": 9.0, "ctr": 0.0}],
+    "Mar 2025": [],
+}
+
+
+def test_dataset_is_typed_and_keeps_the_month_order():
+    dataset, fingerprint = build_dataset(MONTHLY)
+    assert list(dataset['_month'].cat.categories) == ["Feb 2025", "Gen 2025"]
+    assert str(dataset['query'].dtype) == "category" and str(dataset['clicks'].dtype) == "Int32"
+    assert unique_query_count(dataset) == 2
+    assert build_dataset(MONTHLY)[1] == fingerprint
+    assert build_dataset({"Feb 2025": MONTHLY["Feb 2025"]})[1] != fingerprint
+    assert list(split_months(dataset)) == ["Feb 2025", "Gen 2025"]
+    assert build_dataset({})[1] == "empty"
+
+
+def test_aggregate_counts_missing_positions_as_zero():
+    dataset, _ = build_dataset(MONTHLY)
+    row = aggregate_queries(dataset).set_index('query').loc["a"]
+    assert (row['clicks'], row['impressions'], row['average_position']) == (3, 30, 2.0)
@@ -0,0 +1,39 @@
+from benchmarks.mock_dataforseo import MockDataForSEO
+from tools.dataforseo_client import fetch_keyword_trends
+from tools.http_transport import HTTPTransport
+from tools.rate_limit import CallBudget
+from tools.response_cache import ResponseCache
+
+KEYWORDS = ["scarpe rosse", "borse", "cinture", "zaini"]
+
+
+def fetch(mock, keywords, **kwargs):
+    return fetch_keyword_trends(keywords, "user", "pass", date_from="2025-01-01", date_to="2025-03-31",
+                                requests_per_second=50, transport=HTTPTransport(), url=mock.url, **kwargs)
+
+
+def test_every_keyword_gets_a_result_and_is_fetched_once(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    with MockDataForSEO(latency=0.01) as mock:
+        results = fetch(mock, KEYWORDS, cache=cache)
+        assert set(results) == set(KEYWORDS)
+        assert all(r["data_points"] == 13 for r in results.values())
+        assert mock.counters["tasks"] == mock.counters["keywords"] == len(KEYWORDS)
+
+        assert fetch(mock, KEYWORDS, cache=cache) == results
+        assert mock.counters["tasks"] == len(KEYWORDS)
+
+
+def test_server_errors_are_retried():
+    with MockDataForSEO(latency=0.01, server_error_rate=0.3, seed=1) as mock:
+        results = fetch(mock, KEYWORDS, max_retries=8)
+    assert all("last_value" in results[kw] for kw in KEYWORDS)
+    assert mock.counters["server_errors"] > 0
+
+
+def test_budget_leaves_the_lowest_priority_keywords_out():
+    budget = CallBudget(max_calls=2)
+    with MockDataForSEO(latency=0.01) as mock:
+        results = fetch(mock, KEYWORDS, budget=budget, max_in_flight=1)
+    assert list(results) == KEYWORDS[:2]
+    assert budget.skipped == KEYWORDS[2:]
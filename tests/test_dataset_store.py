@@ -0,0 +1,30 @@
+from datetime import date, datetime
+
+from tools.dataset_store import load_property_dataset, merge_months, plan_refresh, save_property_dataset
+from tools.response_cache import credential_scope
+
+MONTHS = [("Gen 2025", "2025-01-01", "2025-01-31"), ("Feb 2025", "2025-02-01", "2025-02-28")]
+
+
+def test_datasets_are_only_loaded_with_the_token_that_stored_them(tmp_path):
+    base_dir = str(tmp_path)
+    dataset = merge_months({"property": "sc-domain:example.com", "country": "ITA"}, MONTHS[:1],
+                           {"Gen 2025": [{"keyword": "a"}]}, now=datetime(2025, 3, 1))
+    save_property_dataset(dataset, base_dir, scope=credential_scope("token-a"))
+
+    assert load_property_dataset("sc-domain:example.com", "ITA", base_dir, scope=credential_scope("token-a")) == dataset
+    assert load_property_dataset("sc-domain:example.com", "ITA", base_dir, scope=credential_scope("token-b"))["months"] == {}
+    assert load_property_dataset("sc-domain:example.com", "ITA", base_dir)["months"] == {}
+    assert all("token-a" not in path.name for path in tmp_path.iterdir())
+
+
+def test_refresh_skips_settled_months_only():
+    dataset = merge_months({}, MONTHS, {"Gen 2025": [{"keyword": "a"}]}, now=datetime(2025, 3, 1))
+    assert plan_refresh(dataset, MONTHS, today=date(2025, 3, 10)) == MONTHS[1:]
+
+
+def test_failed_month_keeps_the_records_of_an_earlier_run():
+    dataset = merge_months({}, MONTHS[:1], {"Gen 2025": [{"keyword": "a"}]}, now=datetime(2025, 3, 1))
+    merge_months(dataset, MONTHS[:1], {}, now=datetime(2025, 4, 1))
+    assert dataset["months"]["Gen 2025"]["records"] == [{"keyword": "a"}]
+    assert dataset["months"]["Gen 2025"]["status"] == "ok"
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from tools.excel_writer import StreamingExcelWriter
+
+
+def test_sheets_continue_past_the_row_limit_with_the_same_header(tmp_path):
+    path = str(tmp_path / "report.xlsx")
+    with StreamingExcelWriter(path, max_rows=4) as writer:
+        writer.write_frame("Gen 2025", pd.DataFrame({'query': ["a", "b"], 'clicks': [1, 2]}))
+        writer.write_frame("Gen 2025", pd.DataFrame({'query': ["c", "d"], 'clicks': [3, np.nan], 'extra': [0, 0]}))
+
+    wb = load_workbook(path)
+    assert wb.sheetnames == ["Gen 2025", "Gen 2025 (2)"]
+    assert list(wb["Gen 2025"].values) == [("query", "clicks"), ("a", 1), ("b", 2), ("c", 3)]
+    # Missing values become empty cells, columns not in the header are dropped
+    assert list(wb["Gen 2025 (2)"].values) == [("query", "clicks"), ("d", None)]
+    assert wb["Gen 2025"].auto_filter.ref == "A1:B4"
+
+
+def test_float32_values_keep_their_decimals_and_long_names_stay_unique(tmp_path):
+    path = str(tmp_path / "report.xlsx")
+    name = "x" * 40
+    with StreamingExcelWriter(path) as writer:
+        writer.write_frame(name, pd.DataFrame({'average_position': np.array([6.91], dtype='float32')}))
+        writer.write_frame(name + " bis", pd.DataFrame({'v': [1]}))
+
+    wb = load_workbook(path)
+    assert [len(title) for title in wb.sheetnames] == [31, 31]
+    assert len(set(wb.sheetnames)) == 2
+    assert wb.worksheets[0]["A2"].value == 6.91
@@ -0,0 +1,126 @@
+import threading
+import time
+
+from tools.extraction_engine import IncompleteWindow, fetch_months_concurrently, merge_split_records
+from tools.fattoboost_client import WindowTimeout
+
+
+def test_merge_sums_and_weights_by_impressions():
+    merged = merge_split_records([
+        [{"query": "q", "page": "/a", "clicks": 3, "impressions": 100, "average_position": 2.0, "ctr": 3.0}],
+        [{"query": "q", "page": "/a", "clicks": 1, "impressions": 300, "average_position": 4.0, "ctr": 1.0}],
+    ])
+    assert merged == [{"query": "q", "page": "/a", "clicks": 4, "impressions": 400, "average_position": 3.5, "ctr": 1.5}]
+
+
+def test_merge_keeps_ctr_in_the_source_unit():
+    # A percentage stays a percentage (not recomputed as clicks / impressions)
+    merged = merge_split_records([
+        [{"query": "q", "page": "/a", "clicks": 10, "impressions": 100, "ctr": 10.0}],
+        [{"query": "q", "page": "/a", "clicks": 10, "impressions": 100, "ctr": 10.0}],
+    ])
+    assert merged[0]["ctr"] == 10.0
+
+
+def test_merge_converts_string_fields():
+    merged = merge_split_records([
+        [{"query": "q", "page": "/a", "clicks": "3", "impressions": "100", "average_position": "2.5", "search_volume": "90"}],
+        [{"query": "q", "page": "/a", "clicks": "2", "impressions": "100", "average_position": "3.5", "search_volume": "120"}],
+    ])
+    assert merged[0]["clicks"] == 5
+    assert merged[0]["impressions"] == 200
+    assert merged[0]["average_position"] == 3.0
+    assert merged[0]["search_volume"] == 120
+
+
+def test_merge_skips_missing_and_invalid_fields():
+    merged = merge_split_records([
+        [{"query": "q", "page": "/a", "clicks": None, "impressions": None, "average_position": None, "ctr": ""}],
+        [{"query": "q", "page": "/a", "clicks": "n/a", "impressions": 50, "average_position": 7, "search_volume": None}],
+    ])
+    assert merged[0]["clicks"] == 0
+    assert merged[0]["impressions"] == 50
+    assert merged[0]["average_position"] == 7
+    assert merged[0]["ctr"] == ""
+
+
+def test_merge_without_impressions_uses_plain_mean():
+    merged = merge_split_records([
+        [{"query": "q", "page": "/a", "average_position": 2}],
+        [{"query": "q", "page": "/a", "average_position": 4}],
+        [{"query": "other", "page": "/b", "clicks": 1}],
+    ])
+    assert merged[0]["average_position"] == 3.0
+    assert merged[1] == {"query": "other", "page": "/b", "clicks": 1}
+
+
+def split_fetch(failing_start=None, fail_with=None):
+    """Fake fetch_fn: the whole month times out, its halves answer (the one starting at failing_start fails)."""
+    def fetch(start_date, end_date, log_callback=None, backoff=None, read_timeout=None, **kwargs):
+        if (start_date, end_date) == ("2025-01-01", "2025-01-31"):
+            raise WindowTimeout("too slow")
+        if start_date == failing_start:
+            if fail_with is not None:
+                raise fail_with
+            return []
+        return [{"query": f"q {start_date}", "page": "/a", "clicks": 1, "impressions": 10}]
+    return fetch
+
+
+def run_split(fetch_fn):
+    done = []
+    results = fetch_months_concurrently(
+        [("Gen 2025", "2025-01-01", "2025-01-31")], fetch_kwargs={}, split_timeout=5,
+        log_callback=lambda msg: None, fetch_fn=fetch_fn,
+        on_month_done=lambda name, records, error, *counts: done.append((name, records, error)))
+    return results, done
+
+
+def test_split_month_is_merged_from_both_halves():
+    results, done = run_split(split_fetch())
+    assert sorted(r["query"] for r in results["Gen 2025"]) == ["q 2025-01-01", "q 2025-01-17"]
+    assert done[0][2] is None
+
+
+def test_split_month_with_an_empty_half_is_an_error():
+    results, done = run_split(split_fetch(failing_start="2025-01-17"))
+    assert results == {}
+    name, records, error = done[0]
+    assert records == [] and isinstance(error, IncompleteWindow)
+
+
+def test_split_month_with_a_failed_half_is_an_error():
+    results, done = run_split(split_fetch(failing_start="2025-01-01", fail_with=RuntimeError("boom")))
+    assert results == {}
+    assert isinstance(done[0][2], IncompleteWindow) and "boom" in str(done[0][2])
+
+
+def test_months_run_in_parallel_up_to_the_cap_and_come_back_in_order():
+    months = [(f"M{i}", f"2025-{i:02d}-01", f"2025-{i:02d}-28") for i in range(1, 7)]
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def fetch(start_date, end_date, log_callback=None, backoff=None, **kwargs):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        if start_date.startswith("2025-03"):
+            raise RuntimeError("server error")
+        log_callback(f"fetched {start_date}")
+        return [{"query": start_date}]
+
+    caller = threading.current_thread()
+    logs, done = [], []
+    results = fetch_months_concurrently(
+        months, fetch_kwargs={}, max_in_flight=3, fetch_fn=fetch, log_callback=logs.append,
+        on_month_done=lambda name, records, error, n, total: done.append((threading.current_thread(), name, n, total)))
+    assert in_flight[1] == 3
+    assert list(results) == ["M1", "M2", "M4", "M5", "M6"]
+    # Callbacks run in the calling thread
+    assert {d[0] for d in done} == {caller}
+    assert sorted(d[2] for d in done) == [1, 2, 3, 4, 5, 6] and {d[3] for d in done} == {6}
+    # Worker log lines are forwarded with their month
+    assert "[M6] fetched 2025-06-01" in logs
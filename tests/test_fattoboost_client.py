@@ -0,0 +1,24 @@
+import pandas as pd
+
+from benchmarks.mock_fattoboost import MockFattoBoost
+from tools.fattoboost_client import stream_fattoboost_month
+from tools.http_transport import HTTPTransport
+from tools.response_cache import ResponseCache
+
+MONTH = dict(start_date="2025-01-01", end_date="2025-01-31", property_url="sc-domain:example.com",
+             property_pattern="example.com", log_callback=lambda msg: None)
+
+
+def test_stream_yields_batches_and_caches_them_for_the_same_token(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    with MockFattoBoost(sync_seconds=0, records=250) as mock:
+        kwargs = dict(MONTH, cache=cache, batch_size=100, transport=HTTPTransport(), url=mock.base_url)
+        batches = list(stream_fattoboost_month(token="token-a", **kwargs))
+        assert [len(b) for b in batches] == [100, 100, 50]
+
+        cached = pd.concat(list(stream_fattoboost_month(token="token-a", **kwargs)), ignore_index=True)
+        assert mock.counters["computations"] == 1
+        pd.testing.assert_frame_equal(cached, pd.concat(batches, ignore_index=True))
+
+        list(stream_fattoboost_month(token="token-b", **kwargs))
+        assert mock.counters["computations"] == 2
@@ -0,0 +1,45 @@
+from benchmarks.mock_fattoboost import MockFattoBoost
+from tools.fattoboost_client import fetch_fattoboost_month_job
+from tools.http_transport import HTTPTransport
+
+MONTH = dict(token="test", start_date="2025-01-01", end_date="2025-01-31", property_url="sc-domain:example.com",
+             property_pattern="example.com", log_callback=lambda msg: None)
+
+
+def fetch(mock, jobs_dir, **kwargs):
+    return fetch_fattoboost_month_job(jobs_url=mock.jobs_url, jobs_dir=str(jobs_dir), transport=HTTPTransport(),
+                                      poll_interval=0.05, **dict(MONTH, **kwargs))
+
+
+def test_job_is_submitted_polled_and_downloaded(tmp_path):
+    with MockFattoBoost(job_seconds=0.2, records=50) as mock:
+        records = fetch(mock, tmp_path)
+        assert len(records) == 50
+        assert mock.counters["submissions"] == 1
+        assert mock.counters["polls"] >= 2
+    # A finished job leaves no handle behind
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_interrupted_run_resumes_the_same_job(tmp_path):
+    with MockFattoBoost(job_seconds=0.5, records=50) as mock:
+        assert fetch(mock, tmp_path, max_wait=0.1) == []
+        assert len(list(tmp_path.iterdir())) == 1
+        assert len(fetch(mock, tmp_path)) == 50
+        assert mock.counters["submissions"] == 1
+
+
+def test_unknown_job_is_submitted_again(tmp_path):
+    with MockFattoBoost(job_seconds=0.5, records=50) as mock:
+        fetch(mock, tmp_path, max_wait=0.1)
+    # The server lost the job (404): the saved handle is dropped and the month submitted again
+    with MockFattoBoost(job_seconds=0.1, records=50) as mock:
+        assert len(fetch(mock, tmp_path)) == 50
+        assert mock.counters["submissions"] == 1
+
+
+def test_dropped_poll_is_retried(tmp_path):
+    with MockFattoBoost(job_seconds=0.2, records=50, poll_drop_rate=0.5) as mock:
+        assert len(fetch(mock, tmp_path)) == 50
+        assert mock.counters["dropped"] >= 1
+        assert mock.counters["submissions"] == 1
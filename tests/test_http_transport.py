@@ -0,0 +1,40 @@
+import socket
+
+import pytest
+import requests
+
+from benchmarks.mock_fattoboost import MockFattoBoost
+from tools.http_transport import HTTPTransport
+from tools.rate_limit import AdaptiveLimiter
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_counters_per_host_and_limiter_feedback():
+    transport = HTTPTransport()
+    limiter = AdaptiveLimiter("api", initial=2, cooldown=0)
+    with MockFattoBoost(sync_seconds=0, records=10) as mock:
+        host = mock.address.split("//")[1]
+        assert transport.post(mock.base_url, json={}, limiter=limiter).status_code == 200
+        assert transport.get(mock.jobs_url + "/unknown", limiter=limiter).status_code == 404
+    stats = transport.stats()[host]
+    assert (stats["requests"], stats["errors"], stats["status"]) == (2, 1, {"200": 1, "404": 1})
+    assert stats["bytes"] > 0
+    assert limiter.in_flight == 0 and limiter.latency is not None
+
+
+def test_network_error_halves_the_limit_and_a_local_error_only_frees_the_slot():
+    transport = HTTPTransport(connect_timeout=1)
+    limiter = AdaptiveLimiter("api", initial=4, cooldown=0)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.get(f"http://127.0.0.1:{free_port()}/", limiter=limiter)
+    assert (limiter.limit, limiter.in_flight) == (2, 0)
+    # Fails before anything is sent: no feedback for the limiter, but the slot is back
+    with pytest.raises(TypeError):
+        transport.post(f"http://127.0.0.1:{free_port()}/", json=object(), limiter=limiter)
+    assert (limiter.limit, limiter.in_flight) == (2, 0)
+    assert list(transport.stats().values())[0]["status"] == {"network_error": 1}
@@ -0,0 +1,9 @@
+import os
+
+from benchmarks.import_time import EXPECTED_HEAVY, ROOT, module_level_imports
+
+
+def test_app_only_imports_cheap_modules_at_module_level():
+    imported = module_level_imports(os.path.join(ROOT, "app.py"))
+    assert "tools.telemetry" in imported
+    assert [m for m in sorted(imported) if EXPECTED_HEAVY.get(m)] == []
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from tools import telemetry
+from tools.job_queue import JobQueue
+
+
+def report_job(job, n):
+    job.log(f"working on {n}")
+    job.progress(0.5, "halfway")
+    with telemetry.span("work"):
+        telemetry.record("items", n)
+    return n * 2
+
+
+def failing_job(job):
+    job.log("about to fail")
+    raise ValueError("bad input")
+
+
+def wait(queue, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = queue.status(job_id)
+        if status["status"] in ("done", "failed"):
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"{job_id} did not finish")
+
+
+@pytest.fixture(scope="module")
+def queue():
+    queue = JobQueue(max_workers=2)
+    yield queue
+    queue.shutdown()
+
+
+def test_job_reports_logs_progress_and_result(queue):
+    job_id = queue.submit("double", report_job, n=21)
+    status = wait(queue, job_id)
+    assert status["status"] == "done" and status["progress"] == 1.0
+    assert status["status_text"] == "halfway"
+    assert [msg for _, msg in status["logs"]] == ["working on 21"]
+    result, spans = queue.result(job_id)
+    assert result == 42
+    assert [(s["name"], s["items"]) for s in spans] == [("work", 21)]
+    # Collected jobs leave the queue
+    assert queue.status(job_id) is None
+
+
+def test_failed_job_raises_its_error(queue):
+    job_id = queue.submit("fail", failing_job)
+    status = wait(queue, job_id)
+    assert (status["status"], status["error"]) == ("failed", "bad input")
+    with pytest.raises(ValueError):
+        queue.result(job_id)
+
+
+def test_unknown_job():
+    queue = JobQueue(max_workers=1)
+    assert queue.status("missing-1") is None
+    with pytest.raises(KeyError):
+        queue.result("missing-1")
+    assert queue.stats_line() == "Job queue: 0 running, 0 queued (1 workers)"
@@ -0,0 +1,25 @@
+from datetime import date
+
+from tools.periods import label_date, months_of_year, plan_windows, split_window, trend_range
+
+
+def test_plan_windows_clips_months_to_the_span():
+    windows = plan_windows("2025-01-15", "2025-03-10")
+    assert windows == [("Gen 2025", "2025-01-15", "2025-01-31"), ("Feb 2025", "2025-02-01", "2025-02-28"),
+                       ("Mar 2025", "2025-03-01", "2025-03-10")]
+
+
+def test_split_window_covers_the_window_without_gaps():
+    halves = split_window(("Gen 2025", "2025-01-01", "2025-01-31"))
+    assert [(h.start, h.end) for h in halves] == [("2025-01-01", "2025-01-16"), ("2025-01-17", "2025-01-31")]
+
+
+def test_label_date_reads_italian_and_english_months():
+    assert label_date("Gen 2025") == date(2025, 1, 1)
+    assert label_date("Dec 2024") == date(2024, 12, 1)
+    assert label_date("06 Gen 2025") is None
+
+
+def test_trend_range_follows_the_period_and_stops_today():
+    assert trend_range(months_of_year(2025)) == ("2025-01-01", "2025-12-31")
+    assert trend_range(months_of_year(2026), today=date(2026, 10, 18)) == ("2026-01-01", "2026-10-18")
@@ -0,0 +1,25 @@
+from tools import fattoboost_client
+from tools.pipeline import extract_property_months
+from tools.run_checkpoint import RunCheckpoint
+
+MONTHS = [("Gen 2025", "2025-01-01", "2025-01-31"), ("Feb 2025", "2025-02-01", "2025-02-28")]
+
+
+def test_resumed_months_are_not_counted_as_fetched(tmp_path, monkeypatch):
+    requested = []
+
+    def fetch(start_date, end_date, log_callback=None, backoff=None, **kwargs):
+        requested.append(start_date)
+        return [{"query": f"q {start_date}", "page": "/p", "clicks": 1}]
+
+    monkeypatch.setattr(fattoboost_client, "fetch_fattoboost_month", fetch)
+    checkpoint = RunCheckpoint("sc-domain:example.com", "ITA", 2025, base_dir=str(tmp_path)).start()
+    checkpoint.save_month("Gen 2025", "2025-01-01", "2025-01-31", [{"query": "q", "page": "/p", "clicks": 2}])
+
+    monthly, stats = extract_property_months("token", "sc-domain:example.com", "ITA", MONTHS, incremental=False,
+                                             checkpoint=checkpoint, log_callback=lambda msg: None)
+    assert requested == ["2025-02-01"]
+    assert stats == {"fetched": 1, "reused": 0, "resumed": 1, "failed": []}
+    assert list(monthly) == ["Gen 2025", "Feb 2025"]
+    # The month fetched in this run is checkpointed as well
+    assert set(checkpoint.completed_months(MONTHS)) == {"Gen 2025", "Feb 2025"}
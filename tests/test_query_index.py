@@ -0,0 +1,20 @@
+from tools.query_index import QueryIndex, normalize_query
+
+
+def test_variants_share_a_key():
+    assert normalize_query("Olio d'Oliva") == normalize_query("olio  d oliva") == normalize_query("oliva olio d")
+    assert normalize_query("Caffè") == normalize_query("caffe")
+    assert normalize_query("!!!") == "!!!"
+
+
+def test_one_keyword_per_group_and_trends_for_every_variant():
+    index = QueryIndex(["olio d oliva", "Olio d'Oliva", "caffe", "Caffè"], weights={"Olio d'Oliva": 10, "caffe": 3})
+    assert index.representatives() == ["Olio d'Oliva", "caffe"]
+    assert index.variants("OLIO D'OLIVA") == ["olio d oliva", "Olio d'Oliva"]
+    expanded = index.expand({"Olio d'Oliva": {"last_value": 50}})
+    assert expanded == {"olio d oliva": {"last_value": 50}, "Olio d'Oliva": {"last_value": 50}}
+    assert index.stats_line() == "Query index: 4 queries -> 2 trend keywords (2 variants merged, 2 API calls saved)"
+
+
+def test_ties_go_to_the_alphabetically_first_variant():
+    assert QueryIndex(["b a", "a b"]).representatives() == ["a b"]
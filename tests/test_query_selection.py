@@ -0,0 +1,34 @@
+import pandas as pd
+
+from tools.query_selection import QuerySelection, filter_queries, page_count, page_slice, sort_queries, top_queries
+
+TABLE = pd.DataFrame({
+    'query': ["scarpe rosse", "scarpe nere", "borse", "cinture", "zaini"],
+    'clicks': [10, 30, 30, 0, 5],
+    'impressions': [100, 300, 200, 50, 80],
+    'average_position': [3.0, 8.5, 12.0, 40.0, 6.0],
+    'ctr': [0.1, 0.1, 0.15, 0.0, 0.06],
+})
+
+
+def test_selection_keeps_only_the_exceptions():
+    selection = QuerySelection(default=True)
+    selection.set(["borse", "zaini"], False)
+    selection.set(["zaini"], True)
+    assert selection.toggled == {"borse"}
+    assert selection.count(len(TABLE)) == 4
+    assert selection.selected(TABLE['query']) == ["scarpe rosse", "scarpe nere", "cinture", "zaini"]
+
+    selection.reset(False, ["cinture"])
+    assert selection.mask(TABLE['query']).tolist() == [False, False, False, True, False]
+    assert selection.version == 1
+
+
+def test_filters_sorting_and_pages():
+    view = filter_queries(TABLE, search="SCARPE", min_clicks=1, position_range=(0, 10))
+    assert view['query'].tolist() == ["scarpe rosse", "scarpe nere"]
+    # Ties on clicks are broken by query
+    assert sort_queries(TABLE)['query'].tolist() == ["borse", "scarpe nere", "scarpe rosse", "zaini", "cinture"]
+    assert top_queries(TABLE, 2) == ["borse", "scarpe nere"]
+    assert page_count(len(TABLE), 2) == 3
+    assert page_slice(sort_queries(TABLE, 'query', True), 9, 2)['query'].tolist() == ["zaini"]
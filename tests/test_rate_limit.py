@@ -0,0 +1,78 @@
+import time
+
+from tools.rate_limit import AdaptiveLimiter, CallBudget, SharedBackoff, TokenBucket
+
+
+def test_budget_stops_at_the_call_cap_and_records_what_was_left_out():
+    budget = CallBudget(max_calls=3)
+    assert [budget.spend() for _ in range(4)] == [True, True, True, False]
+    budget.skip(["d", "e"])
+    assert budget.exhausted and budget.reason == "calls"
+    assert budget.spent == 3
+    assert budget.status_line() == "Budget: 3/3 calls, exhausted (calls), 2 left out"
+
+
+def test_budget_runs_out_of_time():
+    budget = CallBudget(max_seconds=0)
+    assert not budget.spend()
+    assert budget.reason == "time"
+    assert CallBudget().spend(100)
+
+
+def release_all(limiter, n, status):
+    tickets = [limiter.acquire() for _ in range(n)]
+    for ticket in tickets:
+        limiter.release(ticket, status)
+
+
+def test_limiter_grows_by_one_and_halves_on_errors():
+    messages = []
+    limiter = AdaptiveLimiter("api", initial=4, max_limit=8, log_callback=messages.append)
+    release_all(limiter, 4, 200)
+    assert limiter.limit == 5
+    release_all(limiter, 2, 429)
+    # A burst of failures within the cooldown halves the limit once
+    assert limiter.limit == 2
+    assert limiter.in_flight == 0
+    assert [m.split(" (")[0] for m in messages] == ["[*] api: concurrency 4 -> 5", "[*] api: concurrency 5 -> 2"]
+
+
+def test_limiter_stays_within_its_bounds():
+    limiter = AdaptiveLimiter("api", initial=2, min_limit=1, max_limit=2, cooldown=0)
+    release_all(limiter, 2, 200)
+    assert limiter.limit == 2
+    for status in (None, 503):
+        release_all(limiter, 1, status)
+    assert limiter.limit == 1
+
+
+def test_cancelled_request_frees_its_slot_without_feedback():
+    limiter = AdaptiveLimiter("api", initial=1)
+    limiter.cancel(limiter.acquire())
+    assert (limiter.limit, limiter.in_flight, limiter.latency) == (1, 0, None)
+
+
+def test_retry_after_pauses_new_requests():
+    limiter = AdaptiveLimiter("api", initial=2)
+    limiter.release(limiter.acquire(), 429, retry_after=0.2)
+    start = time.monotonic()
+    limiter.cancel(limiter.acquire())
+    assert time.monotonic() - start >= 0.15
+
+
+def test_token_bucket_paces_requests_after_the_burst():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    # Two from the burst, two more at 20 per second
+    assert 0.08 <= time.monotonic() - start < 0.5
+
+
+def test_shared_backoff_holds_every_worker():
+    backoff = SharedBackoff()
+    backoff.trigger(0.2)
+    backoff.trigger(0.05)
+    start = time.monotonic()
+    backoff.wait()
+    assert time.monotonic() - start >= 0.15
@@ -0,0 +1,51 @@
+import openpyxl
+import pandas as pd
+
+from tools.periods import months_of_year
+from tools.report_builder import generate_columnar_report, generate_report, month_dates
+
+MONTHLY_DATA = {
+    "Gen 2025": [{"query": "ufficio design", "page": "/a", "clicks": 5, "impressions": 50}],
+    "Feb 2025": [{"query": "ufficio design", "page": "/a", "clicks": 2, "impressions": 40}],
+}
+
+
+def summary_rows(path):
+    sheet = openpyxl.load_workbook(path)["Summary"]
+    header, *rows = [[c.value for c in row] for row in sheet.iter_rows()]
+    return [dict(zip(header, row)) for row in rows]
+
+
+def test_generate_report_without_periods_dates_months_from_labels(tmp_path):
+    path = generate_report(MONTHLY_DATA, {}, output_path=str(tmp_path / "report.xlsx"))
+    row = summary_rows(path)[0]
+    assert row["First Click Month"] == "Jan 2025"
+    assert row["Peak Click Month"] == "Jan 2025"
+    assert row["Last Click Month"] == "Feb 2025"
+
+
+def test_generate_report_with_periods(tmp_path):
+    path = generate_report(MONTHLY_DATA, {}, output_path=str(tmp_path / "report.xlsx"), periods=months_of_year(2025))
+    row = summary_rows(path)[0]
+    assert (row["First Click Month"], row["Last Click Month"]) == ("Jan 2025", "Feb 2025")
+
+
+def test_month_dates_prefers_periods_and_leaves_unknown_labels_undated():
+    dates = month_dates({"Gen 2025": [], "Mar 2025": [], "Extra": []}, {"Gen 2025": "2025-01-15"})
+    assert str(dates["Gen 2025"].date()) == "2025-01-15"
+    assert str(dates["Mar 2025"].date()) == "2025-03-01"
+    assert pd.isna(dates["Extra"])
+
+
+def test_columnar_export_matches_the_monthly_records(tmp_path):
+    import pyarrow.parquet as pq
+
+    trends = {"ufficio design": {"last_value": 40, "year_trend": "Up"}}
+    paths = generate_columnar_report(MONTHLY_DATA, trends, str(tmp_path), basename="r", periods=months_of_year(2025))
+    assert set(paths) == {"monthly", "summary"}
+    monthly = pq.read_table(paths["monthly"]).to_pandas()
+    assert list(monthly["month_label"]) == ["Gen 2025", "Feb 2025"]
+    assert [d.isoformat() for d in monthly["month"]] == ["2025-01-01", "2025-02-01"]
+    assert list(monthly["clicks"]) == [5, 2]
+    summary = pq.read_table(paths["summary"]).to_pandas().iloc[0]
+    assert (summary["Total Clicks"], summary["Trend last_value"]) == (7, 40)
@@ -0,0 +1,38 @@
+from tools.report_diff import build_changes, key_totals, load_snapshot, save_snapshot
+from tools.record_stream import records_to_frame
+
+
+def row(query, clicks, impressions=100, position=5.0, page="/p"):
+    return {"query": query, "page": page, "clicks": clicks, "impressions": impressions, "average_position": position}
+
+
+def test_key_totals_weight_position_by_impressions():
+    totals = key_totals(records_to_frame([row("a", 1, 100, 2.0), row("a", 1, 300, 6.0), row("a", 1, 0, None, page="/q")]))
+    by_page = totals.set_index("page")
+    assert by_page.loc["/p", "clicks"] == 2
+    assert by_page.loc["/p", "position"] == 5.0
+    assert by_page.loc["/q", "impressions"] == 0
+
+
+def test_month_over_month_join_finds_new_lost_and_moved_rows():
+    monthly = {
+        "Gen 2025": [row("stable", 100), row("grows", 10), row("drops", 40), row("gone", 5)],
+        "Feb 2025": [row("stable", 101), row("grows", 30), row("drops", 10), row("fresh", 3)],
+    }
+    changes, _ = build_changes(monthly)
+    status = dict(zip(changes["Query"], changes["Status"]))
+    assert status == {"fresh": "new", "gone": "lost", "grows": "up", "drops": "down"}
+    assert list(changes["Status"]) == ["new", "lost", "up", "down"]
+    grows = changes[changes["Query"] == "grows"].iloc[0]
+    assert (grows["Clicks Before"], grows["Clicks"], grows["Clicks Delta"], grows["Clicks Change %"]) == (10, 30, 20, 200.0)
+    assert (changes["Comparison"] == "month").all()
+
+
+def test_snapshot_round_trip_drives_the_run_over_run_diff(tmp_path):
+    _, totals = build_changes({"Gen 2025": [row("a", 50), row("b", 5)]}, month_over_month=False)
+    save_snapshot(totals, "sc-domain:example.com", "ITA", 2025, base_dir=str(tmp_path), scope="a")
+    assert load_snapshot("sc-domain:example.com", "ITA", 2025, base_dir=str(tmp_path), scope="b") is None
+
+    previous = load_snapshot("sc-domain:example.com", "ITA", 2025, base_dir=str(tmp_path), scope="a")
+    changes, _ = build_changes({"Gen 2025": [row("a", 10), row("b", 5)]}, previous, month_over_month=False)
+    assert list(zip(changes["Query"], changes["Status"], changes["Comparison"])) == [("a", "down", "run")]
@@ -0,0 +1,46 @@
+from datetime import date
+
+from tools.response_cache import DAY, HOUR, ResponseCache, credential_scope, ttl_for_period
+
+
+def test_ttl_follows_how_settled_the_period_is():
+    today = date(2026, 10, 18)
+    assert ttl_for_period("2026-10-31", today) == 1 * HOUR
+    assert ttl_for_period("2026-10-16", today) == 6 * HOUR
+    assert ttl_for_period("2026-09-30", today) == 30 * DAY
+
+
+def test_key_ignores_payload_order_but_not_values():
+    key = ResponseCache.make_key("src", {"a": 1, "b": [1, 2]})
+    assert key == ResponseCache.make_key("src", {"b": [1, 2], "a": 1})
+    assert key != ResponseCache.make_key("src", {"a": 2, "b": [1, 2]})
+    assert key != ResponseCache.make_key("other", {"a": 1, "b": [1, 2]})
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.put("src", {"q": 1}, [1, 2], ttl=60)
+    cache.put("src", {"q": 2}, [3], ttl=-1)
+    assert cache.get("src", {"q": 1}) == [1, 2]
+    assert cache.get("src", {"q": 2}) is None
+    assert cache.stats_line() == "Cache: src: 1 hit / 1 miss"
+
+
+def test_scoped_entries_are_only_served_to_the_same_token(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    owner = credential_scope("token-a")
+    cache.put("src", {"q": 1}, ["private"], ttl=60, scope=owner)
+    assert "token-a" not in owner
+    assert cache.get("src", {"q": 1}, credential_scope("token-a")) == ["private"]
+    assert cache.get("src", {"q": 1}, credential_scope("token-b")) is None
+    assert cache.get("src", {"q": 1}) is None
+
+
+def test_list_writer_stores_on_commit_only(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    writer = cache.list_writer("src", {"q": 1}, ttl=60, scope="s")
+    for item in ({"k": "a"}, {"k": "b"}):
+        writer.append(item)
+    assert cache.get("src", {"q": 1}, "s") is None
+    writer.commit()
+    assert cache.get("src", {"q": 1}, "s") == [{"k": "a"}, {"k": "b"}]
@@ -0,0 +1,29 @@
+from tools.run_checkpoint import RunCheckpoint
+
+MONTHS = [("Gen 2025", "2025-01-01", "2025-01-31"), ("Feb 2025", "2025-02-01", "2025-02-28")]
+
+
+def test_interrupted_run_resumes_saved_months_and_trends(tmp_path):
+    checkpoint = RunCheckpoint("sc-domain:example.com", "ITA", 2025, base_dir=str(tmp_path), scope="a").start()
+    checkpoint.save_month("Gen 2025", "2025-01-01", "2025-01-31", [{"keyword": "a"}])
+    checkpoint.save_month("Feb 2025", "2025-02-01", "2025-02-15", [{"keyword": "b"}])
+    checkpoint.save_trends({"a": {"trend": "Up"}, "b": {"trend": "Error"}})
+
+    resumed = RunCheckpoint("sc-domain:example.com", "ITA", 2025, base_dir=str(tmp_path), scope="a")
+    assert resumed.is_unfinished()
+    # A month saved with another date range is fetched again, a failed trend is retried
+    assert resumed.completed_months(MONTHS) == {"Gen 2025": [{"keyword": "a"}]}
+    assert resumed.trends() == {"a": {"trend": "Up"}}
+
+
+def test_runs_are_scoped_to_the_token(tmp_path):
+    RunCheckpoint("sc-domain:example.com", "ITA", 2025, base_dir=str(tmp_path), scope="a").start()
+    assert not RunCheckpoint("sc-domain:example.com", "ITA", 2025, base_dir=str(tmp_path), scope="b").is_unfinished()
+
+
+def test_finished_run_drops_the_months(tmp_path):
+    checkpoint = RunCheckpoint("sc-domain:example.com", "ITA", 2025, base_dir=str(tmp_path)).start()
+    checkpoint.save_month("Gen 2025", "2025-01-01", "2025-01-31", [{"keyword": "a"}])
+    checkpoint.finish()
+    assert not checkpoint.is_unfinished()
+    assert checkpoint.completed_months(MONTHS) == {}
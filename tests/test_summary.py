@@ -0,0 +1,23 @@
+import pandas as pd
+
+from benchmarks.bench_summary import legacy_summary, streaming_summary, synthetic_master_df, synthetic_trends
+from tools.report_builder import SummaryAccumulator
+
+
+def test_accumulator_matches_the_legacy_loop():
+    master_df = synthetic_master_df(3_000)
+    trends = synthetic_trends(master_df)
+    # Small batches: every query is spread over several batches and months
+    pd.testing.assert_frame_equal(legacy_summary(master_df, trends), streaming_summary(master_df, trends, batch_size=100),
+                                  check_dtype=False)
+
+
+def test_query_without_clicks_has_no_click_months():
+    acc = SummaryAccumulator()
+    for month in ("2025-01-01", "2025-02-01"):
+        acc.add(pd.DataFrame({'query': ["q"], 'page': ["/p"], 'clicks': [0], 'impressions': [10],
+                              'average_position': [4.0], 'ctr': [0.0], 'search_volume': [90]}), pd.Timestamp(month))
+    row = acc.result({}).iloc[0]
+    assert (row['First Click Month'], row['Last Click Month']) == ("N/A", "N/A")
+    assert row['Peak Click Month'] == "Jan 2025"
+    assert row['Total Impressions'] == 20
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tools import telemetry
+
+
+def test_spans_nest_and_counters_reach_every_open_span(tmp_path):
+    run = telemetry.RunTelemetry("example.com", meta={"year": 2025})
+    telemetry.activate(run)
+    try:
+        with telemetry.span("extract", months=2):
+            telemetry.record("requests", 2)
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                with telemetry.span("month"):
+                    # Recorded from a worker thread into the open spans of the caller
+                    telemetry.submit(pool, telemetry.record, "requests").result()
+        with pytest.raises(RuntimeError), telemetry.span("report"):
+            raise RuntimeError("disk full")
+    finally:
+        telemetry.activate(None)
+
+    spans = {s["name"]: s for s in run.spans}
+    assert (spans["month"]["parent"], spans["month"]["requests"]) == ("extract", 1)
+    assert (spans["extract"]["requests"], spans["extract"]["months"]) == (3, 2)
+    assert spans["report"]["error"] == "RuntimeError: disk full"
+    report = telemetry.load_run_report(run.export_json(str(tmp_path / "run.json")))
+    # Children are not counted twice in the totals
+    assert report["totals"]["requests"] == 3
+    assert report["meta"] == {"year": 2025}
+
+
+def test_nothing_is_recorded_outside_a_run():
+    with telemetry.span("extract") as span:
+        span.add("rows", 10)
+        telemetry.record("requests")
+    assert telemetry.current_run() is None
+
+
+def test_compare_runs_by_stage():
+    previous = {"spans": [{"name": "extract", "parent": None, "wall_s": 10.0, "requests": 12}]}
+    current = {"spans": [{"name": "extract", "parent": None, "wall_s": 5.0, "requests": 12},
+                         {"name": "month", "parent": "extract", "wall_s": 4.0, "requests": 12}]}
+    row = telemetry.compare_runs(previous, current).loc["extract"]
+    assert (row["wall_s_previous"], row["wall_s"], row["wall_change_pct"]) == (10.0, 5.0, -50.0)
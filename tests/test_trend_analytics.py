@@ -0,0 +1,37 @@
+import pandas as pd
+
+from benchmarks.bench_trend_analytics import per_keyword_metrics, synthetic_series
+from tools.trend_analytics import analyze_series_batch, trend_metrics
+
+
+def weekly(*values, start="2025-01-06"):
+    dates = pd.date_range(start, periods=len(values), freq="7D")
+    return [{'date_from': d.date().isoformat(), 'date_to': (d + pd.Timedelta(days=6)).date().isoformat(),
+             'values': [] if v is None else [v]} for d, v in zip(dates, values)]
+
+
+def test_vectorized_metrics_match_the_per_keyword_loop():
+    series = synthetic_series(300)
+    old, new = per_keyword_metrics(series), trend_metrics(series)
+    pd.testing.assert_frame_equal(
+        old.astype(object).where(old.notna(), None), new.astype(object).where(new.notna(), None),
+        check_dtype=False, check_names=False, check_exact=False, atol=1e-3
+    )
+
+
+def test_metrics_of_a_rising_series_with_a_gap():
+    metrics = analyze_series_batch({"rising": weekly(10, 20, None, 40, 50, 60), "empty": []})
+    assert metrics["empty"] == {"trend": "No Data"}
+    rising = metrics["rising"]
+    assert (rising["last_value"], rising["year_trend"], rising["data_points"]) == (60, "Up", 6)
+    assert rising["slope_per_week"] == 10
+    assert rising["delta_7d"] == 10
+    # 30 days before the last point is before the second one: the value of the first counts
+    assert rising["delta_30d"] == 60 - 10
+    assert rising["peak_month"] == "Feb 2025"
+
+
+def test_series_on_different_dates_are_aligned():
+    metrics = trend_metrics({"a": weekly(1, 2), "b": weekly(5, 4, start="2025-01-13")})
+    assert list(metrics["data_points"]) == [2, 2]
+    assert list(metrics["year_trend"]) == ["Up", "Down"]
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+from tools.query_index import QueryIndex
+from tools.trend_priority import coverage_line, query_values, rank_keywords, trend_coverage
+
+TABLE = pd.DataFrame({
+    'query': ["clicked", "seen at the top", "seen far", "variant a", "a variant"],
+    'clicks': [5, 0, 0, 2, 2],
+    'impressions': [0, 1000, 1000, 0, 0],
+    'average_position': [3.0, 1.0, 0.0, 5.0, 5.0],
+})
+
+
+def test_impressions_near_the_top_count_as_expected_clicks():
+    values = query_values(TABLE)
+    assert values["clicked"] == 5
+    assert values["seen at the top"] == pytest.approx(100)
+    # No position: ranked as if far down the results
+    assert values["seen far"] == pytest.approx(1)
+
+
+def test_groups_are_ranked_by_the_value_of_all_their_variants():
+    values = query_values(TABLE)
+    ranked = rank_keywords(QueryIndex(TABLE['query'], weights=dict(zip(TABLE['query'], TABLE['clicks']))), values)
+    assert ranked == ["seen at the top", "clicked", "a variant", "seen far"]
+
+
+def test_coverage_weights_the_enriched_queries_by_value():
+    values = {"a": 3.0, "b": 1.0}
+    coverage = trend_coverage(["a", "b"], {"a": {"last_value": 10}, "b": {"trend": "Error"}}, values)
+    assert coverage == {"queries": 2, "enriched": 1, "missing": 1, "value_share": 0.75}
+    assert coverage_line(coverage) == "Trend coverage: 1/2 queries (50%), 75% of their value"
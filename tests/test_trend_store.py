@@ -0,0 +1,25 @@
+from tools.trend_store import TrendStore, decode_series, encode_series
+
+SERIES = [
+    {"date_from": "2025-01-05", "date_to": "2025-01-11", "values": [40]},
+    {"date_from": "2025-01-12", "date_to": "2025-01-18", "values": []},
+    {"date_from": "2025-01-19", "date_to": "2025-01-25", "values": [100]},
+]
+RANGE = (2380, "it", "2025-01-01", "2025-12-31")
+
+
+def test_series_survive_the_compact_encoding():
+    assert decode_series(encode_series(SERIES)) == SERIES
+    assert decode_series(encode_series([])) == []
+    odd = [{"date_from": "2025-01-05", "values": [1, 2], "type": "x"}]
+    assert decode_series(encode_series(odd)) == odd
+
+
+def test_series_are_found_by_keyword_and_range_until_they_expire(tmp_path):
+    store = TrendStore(str(tmp_path / "trends.sqlite"))
+    store.upsert_many({"scarpe": SERIES, "borse": SERIES[:1]}, *RANGE, ttl=60)
+    store.upsert_many({"vecchia": SERIES}, *RANGE, ttl=-1)
+    assert store.get_many(["scarpe", "borse", "vecchia", "altro"], *RANGE) == {"scarpe": SERIES, "borse": SERIES[:1]}
+    assert store.get_many(["scarpe"], 2380, "it", "2024-01-01", "2024-12-31") == {}
+    assert store.purge_expired() == 1
+    assert store.stats_line() == "Trend store: 2 hit / 3 miss (2 series stored)"
@@ -0,0 +1,9 @@
+"""
+API clients, extraction pipeline and report building of the app and the batch runner.
+
+Importing a module of this package must stay cheap: pandas / numpy / pyarrow, openpyxl and
+requests are imported inside the functions that use them, except in the modules built around
+DataFrames (compact_dataset, query_selection, report_builder, report_diff, trend_analytics,
+trend_priority). benchmarks/import_time.py checks it, and that app.py only imports the cheap
+ones at module level.
+"""
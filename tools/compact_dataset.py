@@ -0,0 +1,87 @@
+import hashlib
+
+import pandas as pd
+
+from tools.record_stream import records_to_frame
+
+MONTH_COLUMN = '_month'
+
+
+def build_dataset(monthly_data):
+    """
+    Packs { month_name: records } into one compact, typed DataFrame:
+    categorical 'query'/'page'/'_month', Int32 counts and float32 metrics
+    (see RECORD_DTYPES). Month order is preserved in the '_month' categories.
+    Returns (dataset, fingerprint); the fingerprint identifies the content and is
+    meant to key memoized computations (e.g. st.cache_data).
+    """
+    months = [m for m, records in monthly_data.items() if len(records)]
+    frames = []
+    for month_name in months:
+        records = monthly_data[month_name]
+        df = records if isinstance(records, pd.DataFrame) else records_to_frame(records)
+        df = df.copy()
+        df[MONTH_COLUMN] = month_name
+        frames.append(df)
+
+    if not frames:
+        return pd.DataFrame(columns=[MONTH_COLUMN, 'query']), "empty"
+
+    dataset = pd.concat(frames, ignore_index=True)
+    del frames
+    dataset[MONTH_COLUMN] = pd.Categorical(dataset[MONTH_COLUMN], categories=months, ordered=True)
+    for col in ['query', 'page']:
+        if col in dataset.columns:
+            dataset[col] = dataset[col].astype('category')
+
+    return dataset, dataset_fingerprint(dataset)
+
+
+def dataset_fingerprint(dataset):
+    """Content hash of the dataset (row hashes of all columns)."""
+    row_hashes = pd.util.hash_pandas_object(dataset, index=False)
+    digest = hashlib.sha256(row_hashes.values.tobytes())
+    digest.update(",".join(map(str, dataset.columns)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def unique_query_count(dataset):
+    if 'query' not in dataset.columns:
+        return 0
+    return int(dataset['query'].nunique())
+
+
+def aggregate_queries(dataset):
+    """
+    Per-query totals for the Step 2 selection table: summed clicks/impressions,
+    mean position/CTR (missing values count as 0, as in the original table).
+    """
+    metrics = {
+        'clicks': 'sum',
+        'impressions': 'sum',
+        'average_position': 'mean',
+        'ctr': 'mean',
+    }
+    numeric = pd.DataFrame({'query': dataset['query']}, index=dataset.index)
+    for col in metrics:
+        if col in dataset.columns:
+            numeric[col] = pd.to_numeric(dataset[col], errors='coerce').astype('float64').fillna(0)
+        else:
+            numeric[col] = 0.0
+
+    grouped = numeric.groupby('query', observed=True).agg(metrics).reset_index()
+    grouped['query'] = grouped['query'].astype(str)
+    for col in ['clicks', 'impressions']:
+        grouped[col] = grouped[col].astype('int64')
+    return grouped
+
+
+def split_months(dataset):
+    """Returns { month_name: DataFrame } in month order, for generate_report."""
+    if dataset.empty:
+        return {}
+    columns = [c for c in dataset.columns if c != MONTH_COLUMN]
+    return {
+        str(month_name): part[columns]
+        for month_name, part in dataset.groupby(MONTH_COLUMN, observed=True, sort=True)
+    }
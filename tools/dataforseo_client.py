@@ -1,91 +1,290 @@
 
-import requests
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 
-def fetch_keyword_trends(keywords, username, password, location_code=2380, date_from="2024-01-01", date_to="2024-12-31", progress_callback=None):
+from tools import telemetry
+from tools.rate_limit import SharedBackoff, TokenBucket, jittered_backoff, retry_after_seconds
+from tools.response_cache import ttl_for_period
+
+TRENDS_URL = "https://api.dataforseo.com/v3/keywords_data/google_trends/explore/live"
+
+# Google Trends explore accepts at most 5 keywords per task
+MAX_KEYWORDS_PER_TASK = 5
+
+# Google Trends scales every series of a task against the busiest keyword of the task, so a
+# series only has a scale of its own (reusable from cache / store, comparable with the others)
+# when its keyword is fetched alone
+DEFAULT_BATCH_SIZE = 1
+
+CACHE_SOURCE = "dataforseo_trends"
+
+def default_transport():
+    from tools.http_transport import get_transport
+    return get_transport("dataforseo", pool_size=16, connect_timeout=10, read_timeout=60)
+
+
+def fetch_keyword_trends(keywords, username, password, location_code=2380, date_from="2024-01-01", date_to="2024-12-31", progress_callback=None,
+                         batch_size=DEFAULT_BATCH_SIZE, max_in_flight=4, requests_per_second=2.0, max_retries=5, cache=None, limiter=None, slots=None, transport=None, on_batch_done=None, store=None, language_code="it", adaptive=None, url=None, budget=None):
     """
     Fetches Google Trends data for a list of keywords using DataForSEO Live API.
     Returns a dictionary: { keyword: { 'trend_7d': ..., 'trend_30d': ..., 'rising': ... } }
     progress_callback: Function accepting (current_index, total_count, message)
+
+    Keywords are packed `batch_size` per task and up to `max_in_flight` tasks run
+    at once, paced by a token bucket at `requests_per_second` (our plan's rate).
+    429/5xx/network errors are retried with jittered exponential backoff; a keyword
+    whose batch still fails after `max_retries` gets {"trend": "Error"} instead of
+    disappearing from the results.
+    batch_size: Keywords per task (up to MAX_KEYWORDS_PER_TASK). Google Trends scales the values
+           of a task relative to its busiest keyword, so with batch_size > 1 the metrics of
+           keywords fetched in different tasks are not comparable. Forced to 1 when a cache or
+           store is given, since their series are shared with any later batch.
+    cache: Optional ResponseCache; the raw series of every keyword is cached separately.
+    limiter / slots: Optional TokenBucket and semaphore shared between several calls (e.g. a
+           batch of properties), so the plan's rate and concurrency apply to all of them.
+    transport: Optional HTTPTransport (pooled session); defaults to the shared "dataforseo" one.
+    on_batch_done: Function accepting ({ keyword: result }), called from the calling thread
+           after every task (e.g. RunCheckpoint.save_trends).
+    store: Optional TrendStore (raw series shared across properties and runs); keywords
+           found there are not fetched, fetched series are upserted after every task.
+    adaptive: Optional AdaptiveLimiter: concurrency follows the observed latency and 429/5xx
+           (up to adaptive.max_limit tasks in flight) instead of the fixed `max_in_flight`.
+           Pass requests_per_second=None to drop the fixed token bucket as well.
+    url: Endpoint override (e.g. a local stand-in server, see benchmarks/mock_dataforseo.py).
+    budget: Optional CallBudget: every task spends one call; once it runs out no more tasks are
+           started, the tasks in flight finish and the keywords left out are recorded in
+           budget.skipped (they get no result, not an error). Pass the keywords in priority
+           order (see tools/trend_priority.py): tasks are started in that order.
     """
-    url = "https://api.dataforseo.com/v3/keywords_data/google_trends/explore/live"
+    # requests and numpy/pandas are loaded on first use, not when the module is imported
+    import requests
+    from tools.trend_analytics import analyze_series_batch
+
+    keywords = list(keywords)
     results = {}
     total = len(keywords)
     
-    print(f"[*] Fetching Trends for {total} keywords...")
+    def cache_payload(kw):
+        # "scale": series fetched alone, on their own scale (see DEFAULT_BATCH_SIZE)
+        return {"keyword": kw, "location_code": location_code, "language_code": language_code, "date_from": date_from, "date_to": date_to, "scale": "keyword"}
     
-    for i, kw in enumerate(keywords):
-        if i > 0 and i % 10 == 0:
-            print(f"    Progress: {i}/{total}")
-            
-        if progress_callback:
-            progress_callback(i, total, f"Fetching trend for: {kw}")
-            
+    if store is not None:
+        stored = store.get_many(keywords, location_code, language_code, date_from, date_to)
+        results.update(analyze_series_batch(stored))
+        telemetry.record("store_hits", len(stored))
+        if stored:
+            print(f"    [OK] {len(stored)} trends served from the trend store.")
+        keywords = [kw for kw in keywords if kw not in stored]
+    
+    if cache is not None:
+        # Google Trends series are public: unlike FattoBoost data they are shared, not scoped to the login
+        to_fetch = []
+        cached = {}
+        for kw in keywords:
+            series = cache.get(CACHE_SOURCE, cache_payload(kw))
+            if series is None:
+                to_fetch.append(kw)
+            else:
+                cached[kw] = series
+        results.update(analyze_series_batch(cached))
+        telemetry.record("cache_hits", len(cached))
+        if len(to_fetch) < len(keywords):
+            print(f"    [OK] {len(keywords) - len(to_fetch)} trends served from cache.")
+        keywords = to_fetch
+    
+    batch_size = max(1, min(batch_size, MAX_KEYWORDS_PER_TASK))
+    if batch_size > 1 and (cache is not None or store is not None):
+        # A cached series must not depend on the other keywords of its task
+        print(f"    [WARN] batch_size {batch_size} ignored: cached and stored trends are fetched one keyword per task.")
+        batch_size = 1
+    batches = [keywords[i:i + batch_size] for i in range(0, len(keywords), batch_size)]
+    
+    if adaptive is not None:
+        max_in_flight = adaptive.max_limit
+    print(f"[*] Fetching Trends for {len(keywords)} keywords ({len(batches)} tasks, {'adaptive, max ' if adaptive else ''}{max_in_flight} in flight)...")
+    if progress_callback:
+        progress_callback(len(results), total, f"Queued {len(batches)} tasks")
+    
+    if limiter is None and requests_per_second:
+        limiter = TokenBucket(requests_per_second)
+    backoff = SharedBackoff()
+    auth = requests.auth.HTTPBasicAuth(username, password)
+    transport = transport or default_transport()
+    url = url or TRENDS_URL
+
+    def fetch_batch(batch):
         payload = [{
-            "keywords": [kw],
+            "keywords": batch,
             "location_code": location_code,
-            "language_code": "it",
+            "language_code": language_code,
             "date_from": date_from,
             "date_to": date_to
         }]
+        error = "Unknown error"
+        no_series = {}
         
-        try:
-            response = requests.post(url, json=payload, auth=(username, password), timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-                if data['status_code'] == 20000:
-                    tasks = data.get('tasks', [])
-                    if tasks:
-                        result_items = tasks[0].get('result', [])
-                        if result_items:
-                            item = result_items[0].get('items', [])
-                            if item:
-                                ts_data = item
-                                results[kw] = analyze_trend(ts_data)
-                            else:
-                                results[kw] = {"trend": "No Data"}
-                else:
-                    print(f"    [ERROR] API Error for '{kw}': {data['status_message']}")
-            elif response.status_code == 429:
-                print("    [WARN] Rate limit hit. Sleeping 5s.")
-                if progress_callback:
-                    progress_callback(i, total, "Rate limited and sleeping...")
-                time.sleep(5)
+        for attempt in range(max_retries + 1):
+            if attempt > 0:
+                time.sleep(jittered_backoff(attempt - 1))
+            backoff.wait()
+            if limiter is not None:
+                limiter.acquire()
             
-            time.sleep(0.5) 
+            try:
+                response = transport.post(url, json=payload, auth=auth, limiter=adaptive)
+            except requests.exceptions.RequestException as e:
+                error = f"Network error: {e}"
+                print(f"    [WARN] {error} (attempt {attempt + 1}/{max_retries + 1})")
+                telemetry.record("retries")
+                continue
+                
+            if response.status_code == 429:
+                # Everybody slows down, not only this worker
+                backoff.trigger(retry_after_seconds(response) or jittered_backoff(attempt, base=2.0))
+                error = "Rate limited (429)"
+                print(f"    [WARN] Rate limit hit (attempt {attempt + 1}/{max_retries + 1}).")
+                telemetry.record("retries")
+                continue
+            if response.status_code >= 500:
+                error = f"Status {response.status_code}"
+                print(f"    [WARN] Server error {response.status_code} (attempt {attempt + 1}/{max_retries + 1}).")
+                telemetry.record("retries")
+                continue
+            if response.status_code != 200:
+                # 4xx other than 429: retrying won't help
+                return {kw: {"trend": "Error"} for kw in batch}, no_series, f"Status {response.status_code}: {response.text[:200]}"
+                
+            data = response.json()
+            if data.get('status_code') != 20000:
+                return {kw: {"trend": "Error"} for kw in batch}, no_series, f"API Error: {data.get('status_message')}"
+                
+            extracted = _extract_series(data, batch)
+            series = {kw: extracted.get(kw) or [] for kw in batch}
+            if cache is not None:
+                ttl = ttl_for_period(date_to)
+                for kw in batch:
+                    cache.put(CACHE_SOURCE, cache_payload(kw), series[kw], ttl)
+            return analyze_series_batch(series), series, None
             
-        except Exception as e:
-            print(f"    [ERROR] Exception for '{kw}': {e}")
+        return {kw: {"trend": "Error"} for kw in batch}, no_series, f"{error} - gave up after {max_retries + 1} attempts"
+
+    done = len(results)
+    queued = iter(batches)
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        def run_batch(batch):
+            if slots is None:
+                return fetch_batch(batch)
+            with slots:
+                return fetch_batch(batch)
+        
+        futures = {}
+        def submit_next():
+            # Tasks are started in keyword order, and only while the budget lasts
+            batch = next(queued, None)
+            if batch is None:
+                return None
+            if budget is not None and not budget.spend(1):
+                left_out = batch + [kw for rest in queued for kw in rest]
+                budget.skip(left_out)
+                print(f"    [WARN] Trend budget exhausted: {len(left_out)} keywords left out. {budget.status_line()}")
+                return None
+            future = telemetry.submit(pool, run_batch, batch)
+            futures[future] = batch
+            return future
+        
+        # A few tasks beyond the workers are queued, so no worker waits for the next one
+        pending = set()
+        for _ in range(max(1, max_in_flight) * 2):
+            future = submit_next()
+            if future is None:
+                break
+            pending.add(future)
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch = futures.pop(future)
+                following = submit_next()
+                if following is not None:
+                    pending.add(following)
+                try:
+                    batch_results, batch_series, error = future.result()
+                except Exception as e:
+                    batch_results, batch_series, error = {kw: {"trend": "Error"} for kw in batch}, {}, f"Exception: {e}"
+                    
+                if store is not None and batch_series:
+                    store.upsert_many(batch_series, location_code, language_code, date_from, date_to)
+                if error:
+                    print(f"    [ERROR] {error} for {batch}")
+                results.update(batch_results)
+                telemetry.record("rows", len(batch))
+                if on_batch_done:
+                    on_batch_done(batch_results)
+                done += len(batch)
+                
+                if done % 50 < len(batch):
+                    print(f"    Progress: {done}/{total}")
+                if progress_callback:
+                    msg = f"Error for: {', '.join(batch)}" if error else f"Fetched trend for: {', '.join(batch)}"
+                    progress_callback(done, total, msg)
             
     if progress_callback:
-        progress_callback(total, total, "Trends Fetch Complete")
+        if done < total:
+            # Keywords left out by the budget were never fetched: the bar stays where it is
+            progress_callback(done, total, f"Trends budget exhausted: {total - done} keywords left out")
+        else:
+            progress_callback(total, total, "Trends Fetch Complete")
         
     return results
 
+def _extract_series(data, batch):
+    """
+    Splits the explore/live response of a multi-keyword task into one time series per keyword.
+    Returns { keyword: [ { 'date_from', 'date_to', 'values': [value] }, ... ] }
+    """
+    tasks = data.get('tasks') or []
+    if not tasks:
+        return {}
+    result_items = tasks[0].get('result') or []
+    if not result_items:
+        return {}
+    items = result_items[0].get('items') or []
+    
+    series = {}
+    for item in items:
+        if item.get('type') != 'google_trends_graph' or not item.get('data'):
+            continue
+        item_keywords = item.get('keywords') or batch
+        for idx, kw in enumerate(item_keywords):
+            points = []
+            for point in item['data']:
+                values = point.get('values') or []
+                value = values[idx] if idx < len(values) else None
+                points.append({
+                    'date_from': point.get('date_from'),
+                    'date_to': point.get('date_to'),
+                    'values': [value] if value is not None else []
+                })
+            series[kw] = points
+        break
+    
+    # Older single-keyword shape: items are already the time series points
+    if not series and len(batch) == 1 and items and 'values' in items[0]:
+        series[batch[0]] = items
+        
+    return series
+
 def analyze_trend(ts_data):
     """
     Analyzes the time series data to extract 7d, 30d, etc. trends.
     Expects ts_data to be list of dicts with 'date_from', 'date_to', 'values' (list of integers).
+    Single-series convenience over analyze_series_batch (tools/trend_analytics.py), which
+    computes the same metrics for many keywords in one vectorized pass.
     """
     if not ts_data:
         return {}
-        
-    # Sort by date just in case
-    # Assuming standard format
-    
-    # Simple extraction (mock logic needs refinement based on actual JSON shape)
-    # The API returns 'values': [relative_search_volume]
-    
-    # Calculate simple slope or avg of last few points
-    last_val = ts_data[-1]['values'][0] if ts_data[-1].get('values') else 0
-    first_val = ts_data[0]['values'][0] if ts_data[0].get('values') else 0
-    
-    return {
-        "last_value": last_val,
-        "year_trend": "Up" if last_val > first_val else "Down",
-        "data_points": len(ts_data)
-    }
+    from tools.trend_analytics import analyze_series_batch
+    return analyze_series_batch({None: ts_data})[None]
 
 if __name__ == "__main__":
     # Test
@@ -0,0 +1,115 @@
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from tools.response_cache import DEFAULT_CACHE_DIR
+
+DATASETS_DIR = os.path.join(DEFAULT_CACHE_DIR, "datasets")
+
+# GSC keeps revising the last few days of a period; until then the month is "open"
+SETTLE_DAYS = 3
+
+
+def _dataset_path(property_url, country, base_dir=DATASETS_DIR, scope=None):
+    name = f"{property_url}_{country}" if scope is None else f"{property_url}_{country}_{scope}"
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return os.path.join(base_dir, f"{slug}.json.gz")
+
+
+def load_property_dataset(property_url, country, base_dir=DATASETS_DIR, scope=None):
+    """
+    Loads the monthly results stored by previous runs for a property.
+    scope: credential_scope() of the FattoBoost token (see tools/response_cache.py). Datasets
+           are stored per scope, so a session only reuses the data fetched with its own token,
+           never the data another login fetched for the same property.
+    Returns { 'property': ..., 'country': ..., 'months': { month_name: month_entry } }
+    where month_entry is { 'start', 'end', 'status', 'fetched_at', 'records' }.
+    """
+    path = _dataset_path(property_url, country, base_dir, scope)
+    if os.path.exists(path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    return {"property": property_url, "country": country, "months": {}}
+
+
+def save_property_dataset(dataset, base_dir=DATASETS_DIR, scope=None):
+    os.makedirs(base_dir, exist_ok=True)
+    path = _dataset_path(dataset["property"], dataset["country"], base_dir, scope)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(dataset, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return path
+
+
+def is_month_open(entry, today=None):
+    """A month is open if it hasn't ended yet or was fetched before its data settled."""
+    today = today or date.today()
+    end = date.fromisoformat(entry["end"])
+    if end + timedelta(days=SETTLE_DAYS) >= today:
+        return True
+    fetched_at = entry.get("fetched_at")
+    if not fetched_at:
+        return True
+    return datetime.fromisoformat(fetched_at).date() <= end + timedelta(days=SETTLE_DAYS)
+
+
+def plan_refresh(dataset, months, today=None):
+    """
+    Compares the stored dataset with the requested months.
+    months: List of (month_name, start_date, end_date)
+    Returns the sublist of months that must be fetched again: missing, failed/empty, still open,
+    or stored with a different date range.
+    """
+    stored = dataset.get("months", {})
+    to_fetch = []
+    for month_name, start_d, end_d in months:
+        entry = stored.get(month_name)
+        if (entry is None
+                or entry.get("status") != "ok"
+                or entry.get("start") != start_d or entry.get("end") != end_d
+                or is_month_open(entry, today)):
+            to_fetch.append((month_name, start_d, end_d))
+    return to_fetch
+
+
+def merge_months(dataset, fetched_months, results, now=None):
+    """
+    Merges freshly fetched months into the dataset (in place).
+    fetched_months: The months that were requested in this run
+    results: Dictionary { month_name: records } (months without data are treated as failed)
+    A failed month never overwrites records from an earlier successful run.
+    """
+    now = now or datetime.now()
+    stored = dataset.setdefault("months", {})
+    for month_name, start_d, end_d in fetched_months:
+        records = results.get(month_name)
+        if records:
+            stored[month_name] = {
+                "start": start_d,
+                "end": end_d,
+                "status": "ok",
+                "fetched_at": now.isoformat(timespec="seconds"),
+                "records": records,
+            }
+        elif month_name not in stored or stored[month_name].get("status") != "ok":
+            stored[month_name] = {
+                "start": start_d,
+                "end": end_d,
+                "status": "failed",
+                "fetched_at": now.isoformat(timespec="seconds"),
+                "records": [],
+            }
+    return dataset
+
+
+def monthly_records(dataset, months):
+    """Returns { month_name: records } for the requested months that have data, in calendar order."""
+    stored = dataset.get("months", {})
+    return {
+        month_name: stored[month_name]["records"]
+        for month_name, _, _ in months
+        if month_name in stored and stored[month_name].get("records")
+    }
@@ -0,0 +1,109 @@
+from tools.record_stream import widen_float32
+
+# Excel hard limit, header row included
+EXCEL_MAX_ROWS = 1_048_576
+SHEET_NAME_LIMIT = 31
+
+
+class StreamingExcelWriter:
+    """
+    Constant-memory .xlsx writer built on openpyxl's write-only mode.
+    Rows are streamed to disk as soon as they are appended, so memory does not
+    grow with the size of the report.
+
+    Every logical sheet gets a bold header row and an autofilter. When a sheet
+    reaches Excel's row limit it continues on "<name> (2)", "<name> (3)", ...
+    with the same header.
+
+    Usage:
+        with StreamingExcelWriter(path) as writer:
+            for chunk in chunks:
+                writer.write_frame("Gen 2025", chunk)
+    """
+
+    def __init__(self, output_path, max_rows=EXCEL_MAX_ROWS):
+        self.output_path = output_path
+        self.max_rows = max_rows
+        # openpyxl is only loaded when a workbook is actually written
+        from openpyxl import Workbook
+        from openpyxl.styles import Font
+        self._wb = Workbook(write_only=True)
+        self._sheets = {}
+        self._used_titles = set()
+        self._bold = Font(bold=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Don't leave a half-written report behind on errors
+        if exc_type is None:
+            self.close()
+
+    def _unique_title(self, base, part):
+        suffix = "" if part == 1 else f" ({part})"
+        title = base[:SHEET_NAME_LIMIT - len(suffix)] + suffix
+        n = 2
+        while title in self._used_titles:
+            extra = f"~{n}"
+            title = base[:SHEET_NAME_LIMIT - len(suffix) - len(extra)] + extra + suffix
+            n += 1
+        self._used_titles.add(title)
+        return title
+
+    def _finish_sheet(self, state):
+        from openpyxl.utils import get_column_letter
+        ws = state["ws"]
+        last_col = get_column_letter(max(1, len(state["columns"])))
+        ws.auto_filter.ref = f"A1:{last_col}{state['rows'] + 1}"
+
+    def _new_sheet(self, name, columns, part):
+        from openpyxl.cell import WriteOnlyCell
+        ws = self._wb.create_sheet(self._unique_title(name, part))
+        header = []
+        for col in columns:
+            cell = WriteOnlyCell(ws, value=str(col))
+            cell.font = self._bold
+            header.append(cell)
+        ws.append(header)
+        return {"ws": ws, "columns": list(columns), "rows": 0, "part": part}
+
+    def write_frame(self, sheet_name, df):
+        """
+        Appends the rows of a DataFrame chunk to a logical sheet.
+        The first chunk of a sheet defines its columns; later chunks are aligned to them.
+        """
+        state = self._sheets.get(sheet_name)
+        if state is None:
+            state = self._new_sheet(sheet_name, df.columns, 1)
+            self._sheets[sheet_name] = state
+        elif list(df.columns) != state["columns"]:
+            extra = [c for c in df.columns if c not in state["columns"]]
+            if extra:
+                print(f"    [WARN] Sheet '{sheet_name}': dropping columns not in header: {extra}")
+            df = df.reindex(columns=state["columns"])
+
+        if df.empty:
+            return
+
+        # NaN/NaT/NA -> empty cells
+        df = widen_float32(df).astype(object).where(df.notna(), None)
+
+        for row in df.itertuples(index=False, name=None):
+            if state["rows"] >= self.max_rows - 1:
+                self._finish_sheet(state)
+                state = self._new_sheet(sheet_name, state["columns"], state["part"] + 1)
+                self._sheets[sheet_name] = state
+            state["ws"].append(row)
+            state["rows"] += 1
+
+    def close(self):
+        if self._wb is None:
+            return
+        for state in self._sheets.values():
+            self._finish_sheet(state)
+        if not self._sheets:
+            # openpyxl refuses to save a workbook without sheets
+            self._wb.create_sheet("Report")
+        self._wb.save(self.output_path)
+        self._wb = None
@@ -0,0 +1,215 @@
+import math
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from tools.fattoboost_client import fetch_fattoboost_month, WindowTimeout
+from tools.periods import Window, split_window, window_days, MIN_WINDOW_DAYS
+from tools.rate_limit import SharedBackoff
+from tools import telemetry
+
+# Fields summed when the records of split windows are merged back together
+ADDITIVE_FIELDS = ('clicks', 'impressions')
+
+
+class IncompleteWindow(Exception):
+    """A sub-window of a split month failed or came back empty: the month can't be rebuilt."""
+
+
+def fetch_months_concurrently(months, fetch_kwargs, max_in_flight=4, log_callback=None, on_month_done=None, backoff=None, slots=None, fetch_fn=None,
+                              split_timeout=None, max_records=None):
+    """
+    Fetches several months from FattoBoost in parallel.
+    months: List of (month_name, start_date, end_date)
+    fetch_kwargs: Extra arguments for fetch_fattoboost_month (token, property_url, ...)
+    max_in_flight: Max number of months being processed by the server at the same time.
+    on_month_done: Function accepting (month_name, records, error, done_count, total_count)
+    slots: Optional semaphore shared with other extractions (e.g. several properties in a
+           batch) to cap the total number of FattoBoost requests in flight.
+    fetch_fn: Month fetcher with the signature of fetch_fattoboost_month (the default),
+              e.g. fetch_fattoboost_month_job.
+    split_timeout: Seconds a window may take (passed as read_timeout, so fetch_fn must accept
+                   it). A window that times out is split in two halves fetched in parallel,
+                   recursively down to MIN_WINDOW_DAYS days.
+    max_records: A window returning at least this many records (e.g. a server-side cap) is
+                 fetched again as two halves.
+    The records of split windows are merged back into one list per month (see merge_split_records);
+    if any sub-window fails or comes back empty (fetch_fn also returns [] once out of retries)
+    the whole month is reported with an IncompleteWindow error instead of a partial month.
+    Returns a dictionary { month_name: records } in the original month order (failed months are omitted).
+
+    Both callbacks are always invoked from the calling thread, so they can safely
+    update the Streamlit UI.
+    """
+    if backoff is None:
+        backoff = SharedBackoff()
+    fetch_fn = fetch_fn or fetch_fattoboost_month
+    extra_kwargs = {"read_timeout": split_timeout} if split_timeout else {}
+
+    # Worker threads only push messages here, the calling thread forwards them.
+    messages = queue.Queue()
+
+    def log(msg):
+        if log_callback: log_callback(msg)
+        else: print(msg)
+
+    def emit_pending():
+        while True:
+            try:
+                msg = messages.get_nowait()
+            except queue.Empty:
+                return
+            log(msg)
+
+    def fetch_one(window_name, start_d, end_d):
+        def month_log(msg):
+            messages.put(f"[{window_name}] {msg.strip()}")
+
+        with telemetry.span(f"month {window_name}"):
+            if slots is None:
+                return fetch_fn(start_date=start_d, end_date=end_d, log_callback=month_log, backoff=backoff, **extra_kwargs, **fetch_kwargs)
+            with slots:
+                return fetch_fn(start_date=start_d, end_date=end_d, log_callback=month_log, backoff=backoff, **extra_kwargs, **fetch_kwargs)
+
+    def splittable(window):
+        return window_days(window) >= 2 * MIN_WINDOW_DAYS
+
+    results = {}
+    total = len(months)
+    done = 0
+    # Per requested month: (start, end) of the windows still outstanding, records of the
+    # finished ones, first error, and whether the month was split
+    progress = {month_name: {"outstanding": {(start_d, end_d)}, "parts": [], "error": None, "split": False}
+                for month_name, start_d, end_d in months}
+
+    # Split windows add work, so the pool is only sized down to the months when nothing can be split
+    workers = max_in_flight if split_timeout or max_records else min(max_in_flight, total or 1)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {}
+
+        def submit(window, month_name):
+            future = telemetry.submit(pool, fetch_one, *window)
+            futures[future] = (Window(*window), month_name)
+            return future
+
+        for window in months:
+            submit(window, window[0])
+        pending = set(futures)
+
+        while pending:
+            finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            emit_pending()
+
+            for future in finished:
+                window, month_name = futures.pop(future)
+                state = progress[month_name]
+                records, error = [], None
+                try:
+                    records = future.result()
+                except Exception as e:
+                    error = e
+
+                # Oversized window: fetch it again in two halves
+                too_slow = isinstance(error, WindowTimeout)
+                too_big = error is None and max_records and len(records or []) >= max_records
+                if (too_slow or too_big) and splittable(window):
+                    halves = split_window(window, 2)
+                    reason = "timed out" if too_slow else f"returned {len(records)} records (limit {max_records})"
+                    log(f"[*] {window.label} {reason}: splitting into {', '.join(f'{h.start}..{h.end}' for h in halves)}")
+                    state["outstanding"].discard((window.start, window.end))
+                    state["outstanding"].update((half.start, half.end) for half in halves)
+                    state["split"] = True
+                    pending.update(submit(half, month_name) for half in halves)
+                    continue
+
+                state["outstanding"].discard((window.start, window.end))
+                if error is None and not records and state["split"]:
+                    # An empty half can't be told apart from a failed one: the month would be incomplete
+                    error = IncompleteWindow(f"{window.label} ({window.start}..{window.end}) returned no records")
+                if error is not None:
+                    state["error"] = state["error"] or (
+                        IncompleteWindow(f"{window.label} ({window.start}..{window.end}): {error}")
+                        if state["split"] and not isinstance(error, IncompleteWindow) else error)
+                elif records:
+                    state["parts"].append((window.start, records))
+                if state["outstanding"]:
+                    continue
+
+                # All the windows of this month are done
+                records = []
+                if state["error"] is None and state["parts"]:
+                    parts = [part for _, part in sorted(state["parts"], key=lambda p: p[0])]
+                    records = parts[0] if len(parts) == 1 else merge_split_records(parts)
+                if records:
+                    results[month_name] = records
+
+                done += 1
+                if on_month_done:
+                    on_month_done(month_name, records, state["error"], done, total)
+
+    emit_pending()
+
+    # Keep the calendar order regardless of completion order
+    return {month_name: results[month_name] for month_name, _, _ in months if month_name in results}
+
+
+def _number(value):
+    """Numeric value of a record field (the API may send numbers as strings), None if missing or invalid."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def _plain(number):
+    return int(number) if number.is_integer() else number
+
+
+def merge_split_records(parts):
+    """
+    Merges the records of the sub-windows of one window into the records of the whole
+    window: one record per (query, page), clicks and impressions summed, average_position
+    and ctr averaged weighted by impressions (plain mean where there are none; ctr stays in
+    the unit the API sent), search_volume the max; other fields are taken from the first
+    sub-window. Numeric fields sent as strings are converted, missing or invalid ones skipped.
+    parts: Record lists of the sub-windows, in date order
+    """
+    merged = {}
+    totals = {}
+    for records in parts:
+        for r in records:
+            key = (r.get('query'), r.get('page'))
+            if key not in merged:
+                merged[key] = dict(r)
+                # Per averaged field: [weighted sum, weight, plain sum, count]
+                totals[key] = {'sums': {}, 'average_position': [0.0, 0.0, 0.0, 0], 'ctr': [0.0, 0.0, 0.0, 0], 'search_volume': None}
+            t = totals[key]
+            impressions = _number(r.get('impressions')) or 0.0
+            for field in ADDITIVE_FIELDS:
+                if field in r:
+                    t['sums'][field] = t['sums'].get(field, 0.0) + (_number(r[field]) or 0.0)
+            for field in ('average_position', 'ctr'):
+                value = _number(r.get(field))
+                if value is not None:
+                    acc = t[field]
+                    acc[0] += value * impressions
+                    acc[1] += impressions
+                    acc[2] += value
+                    acc[3] += 1
+            volume = _number(r.get('search_volume'))
+            if volume is not None:
+                t['search_volume'] = volume if t['search_volume'] is None else max(t['search_volume'], volume)
+
+    for key, m in merged.items():
+        t = totals[key]
+        for field, total in t['sums'].items():
+            m[field] = _plain(total)
+        for field in ('average_position', 'ctr'):
+            weighted, weight, plain, count = t[field]
+            if count:
+                m[field] = weighted / weight if weight > 0 else plain / count
+        if t['search_volume'] is not None:
+            m['search_volume'] = _plain(t['search_volume'])
+    return list(merged.values())
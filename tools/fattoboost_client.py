@@ -1,14 +1,40 @@
 
-import requests
+import os
 import time
-import logging
 
-def fetch_fattoboost_month(token, start_date, end_date, property_url, property_pattern, show_keywords="nobrand", country="ITA", location="ITA", log_callback=None):
-    """
-    Fetches internal linking opportunities for a specific date range.
-    """
-    url = "https://boost.fattorettosrl.it/api/internal_linking_opportunities"
-    
+from tools.response_cache import ttl_for_period, credential_scope
+from tools.job_store import load_job_handle, save_job_handle, clear_job_handle
+from tools.http_transport import get_transport
+from tools import telemetry
+from tools.rate_limit import retry_after_seconds
+from tools.record_stream import iter_json_array, iter_record_batches, records_to_frame, DEFAULT_BATCH_SIZE
+
+FATTOBOOST_URL = "https://boost.fattorettosrl.it/api/internal_linking_opportunities"
+
+CACHE_SOURCE = "fattoboost"
+
+# Job mode: the month is submitted as a job, then polled and downloaded when ready.
+#   POST {jobs_url}                -> {"success": true, "job_id": "..."}
+#   GET  {jobs_url}/{id}           -> {"status": "queued|running|done|failed", "progress": 0.4, "message": ...}
+#   GET  {jobs_url}/{id}/result    -> same body as the synchronous endpoint
+# This contract is not part of the documented FattoBoost API (only benchmarks/mock_fattoboost.py
+# implements it): job mode is off unless a jobs endpoint is configured explicitly.
+FATTOBOOST_JOBS_URL = os.environ.get("FATTOBOOST_JOBS_URL") or None
+JOB_SOURCE = "fattoboost_job"
+POLL_TIMEOUT = (10, 60)
+
+# The server can take hours to build a month, but connecting should be quick
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 27100
+
+
+class WindowTimeout(Exception):
+    """The server did not answer within the read timeout given for a date range (see fetch_months_concurrently)."""
+
+def default_transport():
+    return get_transport("fattoboost", pool_size=12, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT)
+
+def _build_request(token, start_date, end_date, property_url, property_pattern, show_keywords, country, location):
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
@@ -24,15 +50,60 @@ def fetch_fattoboost_month(token, start_date, end_date, property_url, property_p
         "showKeywords": show_keywords,
         "excluded_queries": []
     }
+    return headers, payload
+
+def fetch_fattoboost_month(token, start_date, end_date, property_url, property_pattern, show_keywords="nobrand", country="ITA", location="ITA", log_callback=None, backoff=None, cache=None, transport=None, url=None, limiter=None, read_timeout=None):
+    """
+    Fetches internal linking opportunities for a specific date range.
+    The request stays open until the server has built the month; see
+    fetch_fattoboost_month_job for the submit/poll variant.
+    backoff: Optional SharedBackoff, used when several months are fetched in parallel
+             so that a 429 on one month pauses all of them.
+    cache: Optional ResponseCache; successful responses are stored keyed on the payload.
+    transport: Optional HTTPTransport (pooled session); defaults to the shared "fattoboost" one.
+    url: Endpoint override (e.g. a local stand-in server).
+    limiter: Optional AdaptiveLimiter shared by the FattoBoost workers (adaptive concurrency).
+    read_timeout: Seconds to wait for the response instead of READ_TIMEOUT. When it expires
+                  (or the gateway answers 502/504) WindowTimeout is raised right away instead of
+                  retrying, so the caller can fetch the range in smaller windows.
+    """
+    # requests is loaded on first use, not when the module is imported
+    import requests
+
+    url = url or FATTOBOOST_URL
+    transport = transport or default_transport()
+    headers, payload = _build_request(token, start_date, end_date, property_url, property_pattern, show_keywords, country, location)
+    # Cached responses are only served back to the same token (see credential_scope)
+    scope = credential_scope(token)
+    
+    if cache is not None:
+        cached = cache.get(CACHE_SOURCE, payload, scope)
+        if cached is not None:
+            msg = f"[*] FattoBoost data for {start_date} to {end_date} served from cache ({len(cached)} records)."
+            if log_callback: log_callback(msg)
+            else: print(msg)
+            telemetry.record("cache_hits")
+            telemetry.record("rows", len(cached))
+            return cached
     
     msg = f"[*] Fetching FattoBoost data for {start_date} to {end_date}..."
     if log_callback: log_callback(msg)
     else: print(msg)
     
     for attempt in range(3):
+        if backoff:
+            backoff.wait()
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=27100)  # Long timeout for data processing
+            timeout = (CONNECT_TIMEOUT, read_timeout) if read_timeout else None
+            try:
+                response = transport.post(url, json=payload, headers=headers, limiter=limiter, timeout=timeout)  # Long read timeout for data processing
+            except requests.exceptions.ReadTimeout:
+                if read_timeout:
+                    raise WindowTimeout(f"No response for {start_date} to {end_date} within {read_timeout:g}s")
+                raise
             
+            if read_timeout and response.status_code in (502, 504):
+                raise WindowTimeout(f"Gateway timeout ({response.status_code}) for {start_date} to {end_date}")
             if response.status_code == 200:
                 data = response.json()
                 if data.get("success"):
@@ -40,6 +111,9 @@ def fetch_fattoboost_month(token, start_date, end_date, property_url, property_p
                     msg = f"    [OK] Retrieved {len(records)} records."
                     if log_callback: log_callback(msg)
                     else: print(msg)
+                    if cache is not None:
+                        cache.put(CACHE_SOURCE, payload, records, ttl_for_period(end_date), scope)
+                    telemetry.record("rows", len(records))
                     return records
                 else:
                     msg = f"    [ERROR] API Success=False: {data.get('message')}"
@@ -53,20 +127,27 @@ def fetch_fattoboost_month(token, start_date, end_date, property_url, property_p
                 else: print(msg)
                 raise Exception("Invalid Token")
             elif response.status_code == 429:
-                msg = f"    [WARN] Rate Limited. Waiting {2**attempt}s..."
+                delay = retry_after_seconds(response, 2**attempt)
+                msg = f"    [WARN] Rate Limited. Waiting {delay:g}s..."
                 if log_callback: log_callback(msg)
                 else: print(msg)
-                time.sleep(2**attempt)
+                telemetry.record("retries")
+                if backoff:
+                    backoff.trigger(delay)
+                else:
+                    time.sleep(delay)
             else:
                 msg = f"    [ERROR] Status {response.status_code}: {response.text[:200]}"
                 if log_callback: log_callback(msg)
                 else: print(msg)
+                telemetry.record("retries")
                 time.sleep(2**attempt)
                 
         except requests.exceptions.RequestException as e:
             msg = f"    [ERROR] Network error: {e}"
             if log_callback: log_callback(msg)
             else: print(msg)
+            telemetry.record("retries")
             time.sleep(2**attempt)
 
     msg = "    [FAIL] Max retries reached for this month."
@@ -74,6 +155,228 @@ def fetch_fattoboost_month(token, start_date, end_date, property_url, property_p
     else: print(msg)
     return []
 
+def stream_fattoboost_month(token, start_date, end_date, property_url, property_pattern, show_keywords="nobrand", country="ITA", location="ITA", log_callback=None, backoff=None, cache=None, batch_size=DEFAULT_BATCH_SIZE, transport=None, url=None, limiter=None):
+    """
+    Streaming variant of fetch_fattoboost_month: yields typed DataFrame batches (see
+    tools/record_stream.py) while the response body is still arriving, instead of
+    parsing the whole body and returning a list of records.
+    Retries only happen before the first batch is yielded; a failure mid-stream raises.
+    url: Endpoint override (e.g. a local stand-in server).
+    limiter: Optional AdaptiveLimiter shared by the FattoBoost workers (adaptive concurrency).
+    """
+    import requests
+
+    def log(msg):
+        if log_callback: log_callback(msg)
+        else: print(msg)
+        
+    url = url or FATTOBOOST_URL
+    transport = transport or default_transport()
+    headers, payload = _build_request(token, start_date, end_date, property_url, property_pattern, show_keywords, country, location)
+    # Cached responses are only served back to the same token (see credential_scope)
+    scope = credential_scope(token)
+    
+    if cache is not None:
+        cached = cache.get(CACHE_SOURCE, payload, scope)
+        if cached is not None:
+            log(f"[*] FattoBoost data for {start_date} to {end_date} served from cache ({len(cached)} records).")
+            for start in range(0, len(cached), batch_size):
+                yield records_to_frame(cached[start:start + batch_size])
+            return
+    
+    log(f"[*] Streaming FattoBoost data for {start_date} to {end_date}...")
+    
+    response = None
+    for attempt in range(3):
+        if backoff:
+            backoff.wait()
+        try:
+            response = transport.post(url, json=payload, headers=headers, stream=True, limiter=limiter)  # Long read timeout for data processing
+        except requests.exceptions.RequestException as e:
+            log(f"    [ERROR] Network error: {e}")
+            telemetry.record("retries")
+            time.sleep(2**attempt)
+            continue
+            
+        if response.status_code == 200:
+            break
+        if response.status_code == 401:
+            log("    [CRITICAL] Unauthorized (401). Check Token.")
+            raise Exception("Invalid Token")
+        if response.status_code == 429:
+            delay = retry_after_seconds(response, 2**attempt)
+            log(f"    [WARN] Rate Limited. Waiting {delay:g}s...")
+            telemetry.record("retries")
+            if backoff:
+                backoff.trigger(delay)
+            else:
+                time.sleep(delay)
+        else:
+            log(f"    [ERROR] Status {response.status_code}: {response.text[:200]}")
+            telemetry.record("retries")
+            time.sleep(2**attempt)
+        response.close()
+        response = None
+        
+    if response is None:
+        log("    [FAIL] Max retries reached for this month.")
+        return
+        
+    meta = {}
+    cache_writer = cache.list_writer(CACHE_SOURCE, payload, ttl_for_period(end_date), scope) if cache is not None else None
+    
+    def records():
+        for record in iter_json_array(response.iter_content(chunk_size=64 * 1024), key="data", meta=meta):
+            if cache_writer is not None:
+                cache_writer.append(record)
+            yield record
+    
+    count = 0
+    try:
+        for batch in iter_record_batches(records(), batch_size):
+            count += len(batch)
+            yield batch
+    finally:
+        transport.stream_finished(response)
+        response.close()
+        
+    if meta.get("success"):
+        log(f"    [OK] Streamed {count} records.")
+        if cache_writer is not None:
+            cache_writer.commit()
+    else:
+        log(f"    [ERROR] API Success=False: {meta.get('message')}")
+
+def fetch_fattoboost_month_job(token, start_date, end_date, property_url, property_pattern, show_keywords="nobrand", country="ITA", location="ITA", log_callback=None, backoff=None, cache=None, transport=None, jobs_url=None, poll_interval=15, max_wait=27100, jobs_dir=None, limiter=None):
+    """
+    Job-based variant of fetch_fattoboost_month: the month is submitted as a server-side
+    job whose handle is stored locally (tools/job_store.py), then polled with short
+    requests and downloaded once done. A dropped connection only costs one poll, and an
+    interrupted run resumes the same job instead of starting the computation over.
+    Same arguments and return value as fetch_fattoboost_month, plus:
+    jobs_url: Jobs endpoint; defaults to FATTOBOOST_JOBS_URL (env), required.
+    poll_interval: Max seconds between polls (polling starts faster and slows down).
+    max_wait: Seconds after which a job still running is given up (its handle is kept).
+    jobs_dir: Directory of the job handles (defaults to .cache/jobs).
+    limiter: Optional AdaptiveLimiter shared by the FattoBoost workers, applied to every call.
+    """
+    import requests
+
+    def log(msg):
+        if log_callback: log_callback(msg)
+        else: print(msg)
+        
+    jobs_url = jobs_url or FATTOBOOST_JOBS_URL
+    if not jobs_url:
+        raise ValueError("Job mode needs a FattoBoost jobs endpoint: set FATTOBOOST_JOBS_URL or pass jobs_url")
+    jobs_url = jobs_url.rstrip("/")
+    transport = transport or default_transport()
+    headers, payload = _build_request(token, start_date, end_date, property_url, property_pattern, show_keywords, country, location)
+    # Cached responses are only served back to the same token (see credential_scope)
+    scope = credential_scope(token)
+    store_kwargs = {"base_dir": jobs_dir, "scope": scope} if jobs_dir else {"scope": scope}
+    
+    if cache is not None:
+        cached = cache.get(CACHE_SOURCE, payload, scope)
+        if cached is not None:
+            log(f"[*] FattoBoost data for {start_date} to {end_date} served from cache ({len(cached)} records).")
+            telemetry.record("cache_hits")
+            telemetry.record("rows", len(cached))
+            return cached
+    
+    def call(method, url, **kwargs):
+        """One request with the usual status handling; returns the parsed body or None."""
+        for attempt in range(3):
+            if backoff:
+                backoff.wait()
+            try:
+                response = transport.request(method, url, headers=headers, timeout=POLL_TIMEOUT, limiter=limiter, **kwargs)
+            except requests.exceptions.RequestException as e:
+                log(f"    [WARN] Network error, retrying: {e}")
+                telemetry.record("retries")
+                time.sleep(2**attempt)
+                continue
+            if response.status_code in (200, 201, 202):
+                return response.json()
+            if response.status_code == 401:
+                log("    [CRITICAL] Unauthorized (401). Check Token.")
+                raise Exception("Invalid Token")
+            if response.status_code == 404:
+                return {"status": "missing"}
+            if response.status_code == 429:
+                delay = retry_after_seconds(response, 2**attempt)
+                log(f"    [WARN] Rate Limited. Waiting {delay:g}s...")
+                telemetry.record("retries")
+                if backoff:
+                    backoff.trigger(delay)
+                else:
+                    time.sleep(delay)
+            else:
+                log(f"    [ERROR] Status {response.status_code}: {response.text[:200]}")
+                telemetry.record("retries")
+                time.sleep(2**attempt)
+        return None
+    
+    handle = load_job_handle(JOB_SOURCE, payload, **store_kwargs)
+    submissions = 0
+    started = time.monotonic()
+    while time.monotonic() - started < max_wait:
+        if handle is None:
+            if submissions >= 2:
+                break
+            log(f"[*] Submitting FattoBoost job for {start_date} to {end_date}...")
+            body = call("POST", jobs_url, json=payload)
+            submissions += 1
+            if not body or not body.get("job_id"):
+                log(f"    [ERROR] Job not accepted: {(body or {}).get('message')}")
+                break
+            handle = {"job_id": body["job_id"], "submitted_at": time.time(), "start": start_date, "end": end_date}
+            save_job_handle(JOB_SOURCE, payload, handle, **store_kwargs)
+        else:
+            log(f"[*] Resuming FattoBoost job {handle['job_id']} for {start_date} to {end_date}...")
+        
+        job_url = f"{jobs_url}/{handle['job_id']}"
+        delay = min(2.0, poll_interval)
+        status = None
+        while time.monotonic() - started < max_wait:
+            body = call("GET", job_url)
+            status = (body or {}).get("status")
+            if status in ("done", "failed", "missing"):
+                break
+            time.sleep(delay)
+            delay = min(delay * 1.5, poll_interval)
+        
+        if status == "missing":
+            # Expired or unknown on the server: submit again
+            log(f"    [WARN] Job {handle['job_id']} no longer exists on the server.")
+            clear_job_handle(JOB_SOURCE, payload, **store_kwargs)
+            handle = None
+            continue
+        if status == "failed":
+            log(f"    [ERROR] Job failed: {body.get('message')}")
+            clear_job_handle(JOB_SOURCE, payload, **store_kwargs)
+            return []
+        if status != "done":
+            break
+        
+        data = call("GET", f"{job_url}/result")
+        if data is None:
+            log("    [FAIL] Could not download the job result; the job is kept for the next run.")
+            return []
+        clear_job_handle(JOB_SOURCE, payload, **store_kwargs)
+        if not data.get("success"):
+            log(f"    [ERROR] API Success=False: {data.get('message')}")
+            return []
+        records = data.get("data", [])
+        log(f"    [OK] Retrieved {len(records)} records.")
+        if cache is not None:
+            cache.put(CACHE_SOURCE, payload, records, ttl_for_period(end_date), scope)
+        telemetry.record("rows", len(records))
+        return records
+    
+    log("    [FAIL] Job did not complete for this month.")
+    return []
+
 if __name__ == "__main__":
     # Test execution
     import sys
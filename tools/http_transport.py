@@ -0,0 +1,166 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+from tools.rate_limit import retry_after_seconds
+from tools import telemetry
+
+DEFAULT_POOL_SIZE = 16
+DEFAULT_CONNECT_TIMEOUT = 10
+
+
+class HTTPTransport:
+    """
+    Pooled keep-alive HTTP session shared by an API client.
+    - One requests.Session with a connection pool of `pool_size` per host, so TCP+TLS
+      handshakes happen once per connection instead of once per request.
+    - Compressed responses are requested (Accept-Encoding) and decoded transparently.
+    - Separate connect and read timeouts.
+    - Per-host counters: requests, errors, status codes, latency and bytes on the wire
+      (also added to the open telemetry spans of the calling run, see tools/telemetry.py).
+    Retries are left to the clients (they know which errors are worth retrying).
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=60):
+        # requests is loaded with the first transport, not when the module is imported
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util import make_headers
+
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(make_headers(accept_encoding=True, keep_alive=True))
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _host_stats(self, url):
+        host = urlsplit(url).netloc
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = self._stats[host] = {
+                "requests": 0, "errors": 0, "status": {}, "latency_s": 0.0, "max_latency_s": 0.0, "bytes": 0,
+            }
+        return stats
+
+    def request(self, method, url, timeout=None, limiter=None, **kwargs):
+        """
+        Same as requests.request, through the pooled session. `timeout` defaults to (connect, read).
+        limiter: Optional AdaptiveLimiter; the request waits for a slot and reports its outcome.
+        """
+        import requests
+
+        ticket = limiter.acquire() if limiter is not None else None
+        start = time.monotonic()
+        # (status, retry_after) reported to the limiter; None if the request failed for a
+        # reason that says nothing about the server (bad URL, interrupt, ...)
+        outcome = None
+        try:
+            response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            outcome = (response.status_code, retry_after_seconds(response))
+        except requests.exceptions.RequestException:
+            self._record(url, None, time.monotonic() - start, 0)
+            outcome = (None, None)
+            raise
+        finally:
+            # The slot is given back whatever happened, or the limiter runs out of slots
+            if limiter is not None:
+                if outcome is None:
+                    limiter.cancel(ticket)
+                else:
+                    limiter.release(ticket, *outcome)
+        # Streamed bodies are counted by stream_finished() once they have been consumed
+        wire_bytes = 0 if kwargs.get("stream") else _wire_bytes(response)
+        self._record(url, response.status_code, time.monotonic() - start, wire_bytes)
+        return response
+
+    def post(self, url, timeout=None, limiter=None, **kwargs):
+        return self.request("POST", url, timeout=timeout, limiter=limiter, **kwargs)
+
+    def get(self, url, timeout=None, limiter=None, **kwargs):
+        return self.request("GET", url, timeout=timeout, limiter=limiter, **kwargs)
+
+    def stream_finished(self, response):
+        """Adds the bytes of a streamed response (post(..., stream=True)) to the counters."""
+        wire_bytes = _wire_bytes(response)
+        telemetry.record("bytes", wire_bytes)
+        with self._lock:
+            self._host_stats(response.url)["bytes"] += wire_bytes
+
+    def _record(self, url, status, elapsed, wire_bytes):
+        telemetry.record("requests")
+        telemetry.record("bytes", wire_bytes)
+        if status is None or status >= 400:
+            telemetry.record("http_errors")
+        with self._lock:
+            stats = self._host_stats(url)
+            stats["requests"] += 1
+            stats["latency_s"] += elapsed
+            stats["max_latency_s"] = max(stats["max_latency_s"], elapsed)
+            stats["bytes"] += wire_bytes
+            if status is None or status >= 400:
+                stats["errors"] += 1
+            key = str(status) if status is not None else "network_error"
+            stats["status"][key] = stats["status"].get(key, 0) + 1
+
+    def stats(self):
+        """Snapshot of the per-host counters."""
+        with self._lock:
+            return {host: dict(s, status=dict(s["status"])) for host, s in self._stats.items()}
+
+
+def _wire_bytes(response):
+    # Bytes read from the socket (compressed), falling back to the decoded body size
+    try:
+        return int(response.raw.tell())
+    except Exception:
+        try:
+            return len(response.content or b"")
+        except Exception:
+            return 0
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(name, **kwargs):
+    """
+    Process-wide transport registered under `name` (e.g. "fattoboost", "dataforseo").
+    Keyword arguments (pool_size, connect_timeout, read_timeout) only apply when the
+    transport is created; use configure_transport() to replace an existing one.
+    """
+    with _transports_lock:
+        transport = _transports.get(name)
+        if transport is None:
+            transport = _transports[name] = HTTPTransport(**kwargs)
+        return transport
+
+
+def configure_transport(name, **kwargs):
+    """Creates (or replaces) the transport registered under `name`."""
+    with _transports_lock:
+        _transports[name] = HTTPTransport(**kwargs)
+        return _transports[name]
+
+
+def transport_stats():
+    """{ host: counters } merged over all registered transports."""
+    with _transports_lock:
+        transports = list(_transports.values())
+    merged = {}
+    for transport in transports:
+        merged.update(transport.stats())
+    return merged
+
+
+def transport_stats_line():
+    """Human readable per-host counters, e.g. for the UI log."""
+    parts = []
+    for host, s in sorted(transport_stats().items()):
+        avg = s["latency_s"] / s["requests"] if s["requests"] else 0
+        parts.append(f"{host}: {s['requests']} req, {s['errors']} err, avg {avg:.2f}s, {s['bytes'] / 1e6:.1f} MB")
+    return "HTTP: " + ("; ".join(parts) if parts else "no requests yet")
@@ -0,0 +1,273 @@
+import importlib
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from tools import telemetry
+
+# Worker processes of the app (one long extraction or report each); OPPORTUNITY_WORKERS overrides
+DEFAULT_WORKERS = int(os.environ.get("OPPORTUNITY_WORKERS", 0)) or min(4, os.cpu_count() or 1)
+
+# Finished jobs nobody collected (e.g. the tab was closed) are dropped after this many seconds
+FINISHED_JOB_TTL = 3600
+
+# Seconds to wait for the last events of a job whose result is already there
+EVENT_GRACE_SECONDS = 2
+
+# Log lines kept per job
+MAX_LOG_LINES = 500
+
+STATUSES = ("queued", "running", "done", "failed")
+
+# Set in every worker process by _init_worker
+_events = None
+
+
+class JobReporter:
+    """
+    Handed to a task in the worker process: log lines and progress are sent back to the
+    queue of the server process, where the UI polls them (see JobQueue.status).
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def log(self, msg):
+        _events.put((self.job_id, "log", (time.time(), msg)))
+
+    def progress(self, fraction, text=None):
+        _events.put((self.job_id, "progress", (max(0.0, min(1.0, fraction)), text)))
+
+
+def _init_worker(events):
+    global _events
+    _events = events
+
+
+def resolve_task(task):
+    """A task given as "module:function" (imported in the worker only), or the function itself."""
+    if isinstance(task, str):
+        module, _, name = task.partition(":")
+        return getattr(importlib.import_module(module), name)
+    return task
+
+
+def _start_method():
+    # forkserver: workers are forked from a small single-threaded server started once, which
+    # has already imported the task modules (see JobQueue preload); spawn where unavailable
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _run_job(task, job_id, kwargs):
+    """Worker side: runs the task under its own telemetry; returns (result, telemetry spans)."""
+    task = resolve_task(task)
+    run = telemetry.RunTelemetry(job_id)
+    telemetry.activate(run)
+    _events.put((job_id, "started", os.getpid()))
+    try:
+        result = task(JobReporter(job_id), **kwargs)
+    finally:
+        # Sent after the last log line (see JobQueue._is_finished)
+        _events.put((job_id, "end", None))
+        telemetry.activate(None)
+    return result, run.spans
+
+
+class JobQueue:
+    """
+    Local job queue: runs long pipeline steps in a bounded pool of worker processes, so the
+    Streamlit script thread only submits a job and polls its status instead of being held
+    for the whole extraction. One queue per server process, shared by all sessions: jobs
+    beyond max_workers wait in the queue in submission order.
+
+    Job arguments are pickled to the worker and never kept in the job record, so
+    credentials can be passed to the task without being stored.
+    preload: Modules the workers import before their first job (e.g. the module of the tasks
+             with pandas & co.), once for all workers where forkserver is available.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, preload=()):
+        self.max_workers = max(1, max_workers)
+        # Workers are never forked from the threaded Streamlit server itself
+        self._ctx = multiprocessing.get_context(_start_method())
+        self.preload = list(preload)
+        if self.preload and self._ctx.get_start_method() == "forkserver":
+            self._ctx.set_forkserver_preload(self.preload)
+        self._events = None
+        self._pool = None
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _ensure_pool(self):
+        if self._events is None:
+            self._events = self._ctx.Queue()
+            threading.Thread(target=self._drain_events, name="job-queue-events", daemon=True).start()
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._ctx,
+                                             initializer=_init_worker, initargs=(self._events,))
+        return self._pool
+
+    def _drain_events(self):
+        while True:
+            try:
+                job_id, kind, payload = self._events.get()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                if kind == "log":
+                    job["logs"].append(payload)
+                elif kind == "progress":
+                    job["progress"], text = payload
+                    if text is not None:
+                        job["status_text"] = text
+                elif kind == "started":
+                    job["status"] = "running"
+                    job["started_at"] = time.time()
+                    job["pid"] = payload
+                elif kind == "end":
+                    job["ended"] = True
+
+    def submit(self, name, task, **kwargs):
+        """
+        Queues task(reporter, **kwargs) and returns the job id.
+        task: "module:function", so the caller doesn't have to import the task's module (and
+              its dependencies), or a module-level function; reporter is a JobReporter.
+        """
+        with self._lock:
+            self._expire()
+            pool = self._ensure_pool()
+            job_id = f"{name}-{next(self._ids)}"
+            self._jobs[job_id] = {
+                "id": job_id,
+                "name": name,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "pid": None,
+                "progress": 0.0,
+                "status_text": None,
+                "logs": deque(maxlen=MAX_LOG_LINES),
+                "ended": False,
+                "future": None,
+            }
+            future = pool.submit(_run_job, task, job_id, kwargs)
+            self._jobs[job_id]["future"] = future
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+        return job_id
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["finished_at"] = time.time()
+            if isinstance(future.exception(), BrokenProcessPool):
+                # A worker died (e.g. out of memory): the pool can't be used any more
+                self._pool = None
+
+    def _is_finished(self, job):
+        # The result and the log events travel on different pipes: a finished job is only
+        # reported once its "end" event has arrived (a worker that died never sends one)
+        if job["finished_at"] is None:
+            return False
+        return job["ended"] or time.time() - job["finished_at"] > EVENT_GRACE_SECONDS
+
+    def status(self, job_id):
+        """
+        Snapshot of a job: { id, name, status, progress, status_text, logs, position,
+        submitted_at, started_at, finished_at, error }, or None for an unknown (or expired) job.
+        position is the number of jobs ahead in the queue (0 once running).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            status = job["status"]
+            error = None
+            if self._is_finished(job):
+                error = None if job["future"].cancelled() else job["future"].exception()
+                status = "failed" if job["future"].cancelled() or error is not None else "done"
+            position = 0
+            if status == "queued":
+                position = sum(1 for other in self._jobs.values()
+                               if other["status"] == "queued" and other["finished_at"] is None
+                               and other["submitted_at"] < job["submitted_at"])
+            return {
+                "id": job_id,
+                "name": job["name"],
+                "status": status,
+                "progress": 1.0 if status == "done" else job["progress"],
+                "status_text": job["status_text"],
+                "logs": list(job["logs"]),
+                "position": position,
+                "submitted_at": job["submitted_at"],
+                "started_at": job["started_at"],
+                "finished_at": job["finished_at"],
+                "error": "Cancelled" if job["future"].cancelled() else (str(error) if error is not None else None),
+            }
+
+    def result(self, job_id):
+        """
+        Removes a finished job from the queue and returns (result, telemetry spans);
+        the error of a failed job is raised. Raises KeyError for an unknown job.
+        """
+        with self._lock:
+            job = self._jobs[job_id]
+            if not self._is_finished(job):
+                raise RuntimeError(f"Job {job_id} is still {job['status']}")
+            del self._jobs[job_id]
+        return job["future"].result()
+
+    def cancel(self, job_id):
+        """Cancels a job still waiting in the queue; running jobs can't be cancelled."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job is not None and job["future"].cancel()
+
+    def counts(self):
+        """{ status: n } of the jobs in the queue."""
+        counts = dict.fromkeys(STATUSES, 0)
+        for job_id in list(self._jobs):
+            snapshot = self.status(job_id)
+            if snapshot is not None:
+                counts[snapshot["status"]] += 1
+        return counts
+
+    def stats_line(self):
+        counts = self.counts()
+        return (f"Job queue: {counts['running']} running, {counts['queued']} queued "
+                f"({self.max_workers} workers)")
+
+    def _expire(self, now=None):
+        now = now or time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job["finished_at"] is not None and now - job["finished_at"] > FINISHED_JOB_TTL:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+def get_default_job_queue(preload=()):
+    """Process-wide job queue, shared by all the Streamlit sessions of the server."""
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue(preload=preload)
+        return _default_queue
@@ -0,0 +1,51 @@
+import json
+import os
+import time
+
+from tools.response_cache import DEFAULT_CACHE_DIR, DAY, ResponseCache
+
+JOBS_DIR = os.path.join(DEFAULT_CACHE_DIR, "jobs")
+
+# Server-side jobs are not kept forever; older handles are not worth resuming
+JOB_HANDLE_TTL = 1 * DAY
+
+
+def _handle_path(source, payload, base_dir=JOBS_DIR, scope=None):
+    return os.path.join(base_dir, f"{ResponseCache.make_key(source, payload, scope)}.json")
+
+
+def load_job_handle(source, payload, base_dir=JOBS_DIR, max_age=JOB_HANDLE_TTL, scope=None):
+    """
+    Returns the handle of a job submitted by a previous (possibly interrupted) run for
+    the same request payload and scope, or None. Handles are keyed like the response cache
+    (scope: credential_scope() of the token that submitted the job), so credentials are
+    never part of the file name or content and a job is only resumed with the same token.
+    Handle: { 'job_id': ..., 'submitted_at': epoch seconds, 'start': ..., 'end': ... }
+    """
+    path = _handle_path(source, payload, base_dir, scope)
+    try:
+        with open(path, encoding="utf-8") as f:
+            handle = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - handle.get("submitted_at", 0) > max_age:
+        clear_job_handle(source, payload, base_dir, scope)
+        return None
+    return handle
+
+
+def save_job_handle(source, payload, handle, base_dir=JOBS_DIR, scope=None):
+    os.makedirs(base_dir, exist_ok=True)
+    path = _handle_path(source, payload, base_dir, scope)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(handle, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def clear_job_handle(source, payload, base_dir=JOBS_DIR, scope=None):
+    try:
+        os.remove(_handle_path(source, payload, base_dir, scope))
+    except OSError:
+        pass
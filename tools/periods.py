@@ -0,0 +1,127 @@
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+
+# Italian month abbreviations used for sheet names and UI labels
+IT_MONTH_ABBR = ["Gen", "Feb", "Mar", "Apr", "Mag", "Giu", "Lug", "Ago", "Set", "Ott", "Nov", "Dic"]
+
+GRANULARITIES = ("month", "week")
+
+# A window is never split below this many days
+MIN_WINDOW_DAYS = 2
+
+# One fetch window. `label` is only for display (sheet names, logs, UI); `start` and `end`
+# are the real dates (ISO strings, both inclusive) carried through the pipeline.
+# Being a tuple, a Window unpacks as (month_name, start_date, end_date).
+Window = namedtuple("Window", ["label", "start", "end"])
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def _month_label(d):
+    return f"{IT_MONTH_ABBR[d.month - 1]} {d.year}"
+
+
+def _week_label(d):
+    return f"{d.day:02d} {IT_MONTH_ABBR[d.month - 1]} {d.year}"
+
+
+def plan_windows(start, end, granularity="month"):
+    """
+    Fetch windows covering start..end (dates or ISO strings, inclusive):
+    - "month": calendar months, labelled "Gen 2025"
+    - "week": Monday to Sunday weeks, labelled by their first day ("06 Gen 2025")
+    The first and last windows are clipped to the span.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}', expected one of {GRANULARITIES}")
+    start, end = _as_date(start), _as_date(end)
+    if end < start:
+        raise ValueError(f"Empty span: {start} > {end}")
+
+    windows = []
+    current = start
+    while current <= end:
+        if granularity == "month":
+            boundary = current.replace(day=calendar.monthrange(current.year, current.month)[1])
+            label = _month_label(current)
+        else:
+            boundary = current + timedelta(days=6 - current.weekday())
+            label = _week_label(current)
+        window_end = min(boundary, end)
+        windows.append(Window(label, current.isoformat(), window_end.isoformat()))
+        current = window_end + timedelta(days=1)
+    return windows
+
+
+def months_of_year(year):
+    """
+    Returns the 12 fetch windows of a year as (month_name, start_date, end_date),
+    e.g. ("Gen 2025", "2025-01-01", "2025-01-31").
+    """
+    return plan_windows(date(year, 1, 1), date(year, 12, 31), "month")
+
+
+def plan_year(year, granularity="month"):
+    return plan_windows(date(year, 1, 1), date(year, 12, 31), granularity)
+
+
+def window_days(window):
+    return (_as_date(window[2]) - _as_date(window[1])).days + 1
+
+
+def split_window(window, parts=2):
+    """
+    Splits a window into `parts` consecutive sub-windows of about the same length
+    (fewer if the window is too short). Sub-windows keep the label of the original window
+    plus their days, e.g. "Gen 2025 [01-16]".
+    """
+    label, start, end = window
+    label = label.split(" [")[0]
+    start, days = _as_date(start), window_days(window)
+    parts = max(1, min(parts, days // MIN_WINDOW_DAYS))
+    if parts == 1:
+        return [Window(label, start.isoformat(), _as_date(end).isoformat())]
+    pieces = []
+    offset = 0
+    for i in range(parts):
+        length = days // parts + (1 if i < days % parts else 0)
+        piece_start = start + timedelta(days=offset)
+        piece_end = piece_start + timedelta(days=length - 1)
+        pieces.append(Window(f"{label} [{piece_start.day:02d}-{piece_end.day:02d}]",
+                             piece_start.isoformat(), piece_end.isoformat()))
+        offset += length
+    return pieces
+
+
+def label_date(label):
+    """
+    First day of the month of a sheet label such as "Gen 2025" (or English, "Jan 2025"),
+    for month data that comes without its windows; None if the label isn't a month.
+    """
+    parts = str(label).split()
+    if len(parts) != 2 or not parts[1].isdigit():
+        return None
+    abbr = parts[0].capitalize()
+    english = [calendar.month_abbr[m] for m in range(1, 13)]
+    for names in (IT_MONTH_ABBR, english):
+        if abbr in names:
+            return date(int(parts[1]), names.index(abbr) + 1, 1)
+    return None
+
+
+def trend_range(windows, today=None):
+    """
+    (date_from, date_to) of the trend series of a report: the span of its windows as ISO
+    strings, with the end clipped to today (Google Trends has no future points).
+    """
+    start = min(_as_date(w[1]) for w in windows)
+    end = min(max(_as_date(w[2]) for w in windows), today or date.today())
+    return start.isoformat(), max(start, end).isoformat()
+
+
+def period_dates(windows):
+    """{ label: start date } of the windows, for generate_report (no label parsing needed)."""
+    return {label: _as_date(start) for label, start, _ in windows}
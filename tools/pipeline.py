@@ -0,0 +1,127 @@
+from tools.dataset_store import load_property_dataset, save_property_dataset, plan_refresh, merge_months, monthly_records
+from tools.response_cache import credential_scope
+
+
+def extract_domain(prop_url):
+    # Simple extraction logic
+    s = prop_url.replace("sc-domain:", "").replace("https://", "").replace("http://", "")
+    if "/" in s:
+        s = s.split("/")[0]
+    return s
+
+
+def extract_property_months(token, property_url, country, months, max_in_flight=4, incremental=True, cache=None,
+                            log_callback=None, on_month_done=None, slots=None, backoff=None, use_jobs=False, checkpoint=None, limiter=None,
+                            split_timeout=None, max_records=None):
+    """
+    Phase 1 for one property: fetches the requested months from FattoBoost.
+    In incremental mode only missing/failed/open months are fetched and the result is
+    merged into the dataset stored by previous runs with the same token.
+    months: List of (month_name, start_date, end_date), e.g. windows from tools/periods.plan_windows
+    use_jobs: Submit each month as a FattoBoost job and poll it, instead of one long blocking request.
+              Opt-in: needs the jobs endpoint (FATTOBOOST_JOBS_URL, see tools/fattoboost_client.py).
+    checkpoint: Optional RunCheckpoint; every fetched month is saved to it right away and
+                months it already holds are not fetched again (resumed run).
+    limiter: Optional AdaptiveLimiter for the FattoBoost calls; max_in_flight is then the ceiling
+             and the actual concurrency follows the observed latency and errors.
+    split_timeout / max_records: Windows that take longer than split_timeout seconds (not in
+             job mode) or return max_records records are fetched again in smaller windows and
+             merged (see fetch_months_concurrently).
+    Returns (monthly_data, stats) where monthly_data is { month_name: records } and
+    stats is { 'fetched': n, 'reused': n, 'resumed': n, 'failed': [month_name, ...] }, where
+    'fetched' counts the months requested in this run and 'resumed' those read back from the checkpoint.
+    """
+    # The HTTP side (requests) is only loaded when months are actually fetched
+    from tools.extraction_engine import fetch_months_concurrently
+    from tools.fattoboost_client import fetch_fattoboost_month, fetch_fattoboost_month_job, FATTOBOOST_JOBS_URL
+
+    def log(msg):
+        if log_callback: log_callback(msg)
+        else: print(msg)
+
+    if use_jobs and not FATTOBOOST_JOBS_URL:
+        raise ValueError("Job mode needs a FattoBoost jobs endpoint: set FATTOBOOST_JOBS_URL")
+
+    if incremental:
+        dataset = load_property_dataset(property_url, country, scope=credential_scope(token))
+        months_to_fetch = plan_refresh(dataset, months)
+    else:
+        dataset = {"property": property_url, "country": country, "months": {}}
+        months_to_fetch = list(months)
+
+    resumed = checkpoint.completed_months(months_to_fetch) if checkpoint is not None else {}
+    if resumed:
+        log(f"[*] Resuming run: {len(resumed)} months already fetched.")
+    pending = [m for m in months_to_fetch if m[0] not in resumed]
+    
+    ranges = {name: (start_d, end_d) for name, start_d, end_d in pending}
+    def save_month_done(month_name, records, error, done_count, total_count):
+        if records:
+            checkpoint.save_month(month_name, *ranges[month_name], records)
+        if on_month_done:
+            on_month_done(month_name, records, error, done_count, total_count)
+    month_done_callback = save_month_done if checkpoint is not None else on_month_done
+    
+    fetched = dict(resumed)
+    if pending:
+        fetched.update(fetch_months_concurrently(
+            pending,
+            fetch_kwargs=dict(
+                token=token,
+                property_url=property_url,
+                property_pattern=extract_domain(property_url),
+                show_keywords="nobrand",
+                country=country,
+                cache=cache,
+                limiter=limiter,
+            ),
+            max_in_flight=max_in_flight,
+            log_callback=log_callback,
+            on_month_done=month_done_callback,
+            backoff=backoff,
+            slots=slots,
+            fetch_fn=fetch_fattoboost_month_job if use_jobs else fetch_fattoboost_month,
+            split_timeout=None if use_jobs else split_timeout,
+            max_records=max_records
+        ))
+    if months_to_fetch:
+        merge_months(dataset, months_to_fetch, fetched)
+        if incremental:
+            save_property_dataset(dataset, scope=credential_scope(token))
+
+    stats = {
+        "fetched": len(pending),
+        "reused": len(months) - len(months_to_fetch),
+        "resumed": len(resumed),
+        "failed": [name for name, _, _ in months_to_fetch if name not in fetched],
+    }
+    return monthly_records(dataset, months), stats
+
+
+def resume_trends(queries, checkpoint, fetch):
+    """
+    Trend enrichment that survives interruptions.
+    fetch: Function (queries, on_batch_done) -> { query: trend }, e.g. a wrapper of
+           fetch_keyword_trends; on_batch_done must be called with each batch's results.
+    Only the queries without a checkpointed trend are fetched; returns the trends of all queries.
+    """
+    if checkpoint is None:
+        return fetch(queries, None)
+    saved = checkpoint.trends()
+    remaining = [q for q in queries if q not in saved]
+    results = {q: saved[q] for q in queries if q in saved}
+    if results:
+        print(f"[*] Resuming run: {len(results)} trends already fetched, {len(remaining)} left.")
+    if remaining:
+        results.update(fetch(remaining, checkpoint.save_trends))
+    return results
+
+
+def unique_queries(monthly_data):
+    """Sorted list of the distinct queries found in the monthly records."""
+    queries = set()
+    for records in monthly_data.values():
+        for r in records:
+            if 'query' in r:
+                queries.add(r['query'])
+    return sorted(queries)
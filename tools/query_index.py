@@ -0,0 +1,71 @@
+import math
+import re
+import unicodedata
+
+from tools.dataforseo_client import DEFAULT_BATCH_SIZE
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize_query(query):
+    """
+    Canonical key of a query: accents removed, case folded, punctuation turned into
+    spaces, whitespace collapsed and words sorted, so that "Olio d'Oliva", "olio d oliva"
+    and "oliva olio d" share the same key.
+    """
+    text = unicodedata.normalize("NFKD", str(query))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _NON_WORD.sub(" ", text.casefold())
+    key = " ".join(sorted(text.split()))
+    return key or str(query).strip().casefold()
+
+
+class QueryIndex:
+    """
+    Groups equivalent query variants (see normalize_query) before trend enrichment, so
+    each group costs one DataForSEO keyword instead of one per variant.
+    - representatives(): the keyword to fetch for each group (the variant with the highest
+      weight, e.g. clicks; ties go to the alphabetically first variant)
+    - expand(trends): maps the trends fetched for the representatives back to every variant,
+      ready for generate_report
+    """
+
+    def __init__(self, queries, weights=None):
+        weights = weights or {}
+        self.groups = {}
+        for query in queries:
+            self.groups.setdefault(normalize_query(query), []).append(query)
+        self.representative = {
+            key: min(variants, key=lambda q: (-weights.get(q, 0), q))
+            for key, variants in self.groups.items()
+        }
+        self.query_count = sum(len(v) for v in self.groups.values())
+
+    def representatives(self):
+        """One keyword per group, in the order the groups were first seen."""
+        return list(self.representative.values())
+
+    def variants(self, query):
+        return self.groups.get(normalize_query(query), [])
+
+    def expand(self, trends):
+        """{ representative: trend } -> { variant: trend } for every variant of the fetched groups."""
+        expanded = {}
+        for key, variants in self.groups.items():
+            trend = trends.get(self.representative[key])
+            if trend is not None:
+                for query in variants:
+                    expanded[query] = trend
+        return expanded
+
+    @property
+    def duplicates(self):
+        return self.query_count - len(self.groups)
+
+    def saved_tasks(self, batch_size=DEFAULT_BATCH_SIZE):
+        """DataForSEO tasks saved by fetching one keyword per group."""
+        return math.ceil(self.query_count / batch_size) - math.ceil(len(self.groups) / batch_size)
+
+    def stats_line(self, batch_size=DEFAULT_BATCH_SIZE):
+        return (f"Query index: {self.query_count} queries -> {len(self.groups)} trend keywords "
+                f"({self.duplicates} variants merged, {self.saved_tasks(batch_size)} API calls saved)")
@@ -0,0 +1,100 @@
+import math
+
+import pandas as pd
+
+SORT_COLUMNS = ['clicks', 'impressions', 'average_position', 'ctr', 'query']
+
+
+class QuerySelection:
+    """
+    Compact set of selected queries for the Step 2 table.
+    Stored as a default (all selected / none selected) plus the set of queries that
+    differ from it, so "all 50,000 queries except 3" costs three strings, not a
+    50,000-row edited DataFrame.
+    `version` changes on bulk operations; the UI uses it to reset the page editor.
+    """
+
+    def __init__(self, default=True):
+        self.default = default
+        self.toggled = set()
+        self.version = 0
+
+    def is_selected(self, query):
+        return self.default != (query in self.toggled)
+
+    def mask(self, queries):
+        """Boolean array: selection state of each query in `queries`."""
+        toggled = pd.Series(queries).isin(self.toggled).to_numpy()
+        return ~toggled if self.default else toggled
+
+    def set(self, queries, selected):
+        """Selects (or deselects) the given queries, leaving the others unchanged."""
+        if selected == self.default:
+            self.toggled.difference_update(queries)
+        else:
+            self.toggled.update(queries)
+
+    def set_bulk(self, queries, selected):
+        self.set(queries, selected)
+        self.version += 1
+
+    def reset(self, default, queries=()):
+        """Selects everything (default=True) or nothing, except the given queries which get the opposite state."""
+        self.default = default
+        self.toggled = set(queries)
+        self.version += 1
+
+    def count(self, total):
+        """Number of selected queries, out of `total` queries in the table."""
+        return total - len(self.toggled) if self.default else len(self.toggled)
+
+    def selected(self, queries):
+        """The selected queries, in the order of `queries`."""
+        queries = pd.Series(queries)
+        return queries[self.mask(queries)].tolist()
+
+
+def filter_queries(table, search="", min_clicks=0, min_impressions=0, position_range=None):
+    """
+    Rows of the aggregated query table (see compact_dataset.aggregate_queries) matching
+    the filters: case-insensitive substring search on the query, minimum clicks and
+    impressions, and an inclusive (min, max) average position range.
+    """
+    mask = pd.Series(True, index=table.index)
+    if search:
+        mask &= table['query'].str.contains(search, case=False, regex=False, na=False)
+    if min_clicks:
+        mask &= table['clicks'] >= min_clicks
+    if min_impressions:
+        mask &= table['impressions'] >= min_impressions
+    if position_range is not None:
+        low, high = position_range
+        mask &= table['average_position'].between(low, high)
+    return table if mask.all() else table[mask]
+
+
+def sort_queries(table, by='clicks', ascending=False):
+    """Sorted copy of the table; ties are broken by query so that pages are stable."""
+    if by not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort by {by}")
+    if by == 'query':
+        return table.sort_values('query', ascending=ascending, kind='stable')
+    return table.sort_values([by, 'query'], ascending=[ascending, True], kind='stable')
+
+
+def page_count(rows, page_size):
+    return max(1, math.ceil(rows / page_size))
+
+
+def page_slice(table, page, page_size):
+    """Rows of the 1-based `page` (clamped to the valid range)."""
+    page = min(max(1, page), page_count(len(table), page_size))
+    start = (page - 1) * page_size
+    return table.iloc[start:start + page_size]
+
+
+def top_queries(table, n, by='clicks'):
+    """The `n` queries with the highest `by` (ties broken by query)."""
+    if n <= 0:
+        return []
+    return sort_queries(table, by=by, ascending=False)['query'].head(n).tolist()
@@ -0,0 +1,241 @@
+import random
+from collections import deque
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class SharedBackoff:
+    """
+    Pause shared by every worker that talks to the same API.
+    When one request gets a 429, all the others wait too instead of
+    hammering the server with requests that will be rejected anyway.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def trigger(self, delay):
+        """Blocks new requests for at least `delay` seconds from now."""
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    def wait(self):
+        """Sleeps until the current backoff window (if any) has expired."""
+        while True:
+            with self._lock:
+                remaining = self._resume_at - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` requests per second on average, with bursts
+    of at most `capacity` requests. Safe to share between threads.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until one token is available and consumes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                missing = (1 - self._tokens) / self.rate
+            time.sleep(missing)
+
+
+class CallBudget:
+    """
+    Cap on the API calls (e.g. DataForSEO tasks, which are billed one by one) and/or the
+    wall time of an enrichment. Callers spend() before every call and stop cleanly when it
+    returns False; the work left out is recorded in `skipped`. Safe to share between threads
+    (e.g. one budget for a whole batch of properties).
+    max_calls / max_seconds: None for no limit; the clock starts with the first spend().
+    """
+
+    def __init__(self, max_calls=None, max_seconds=None):
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.spent = 0
+        self.skipped = []
+        self.reason = None
+        self._started = None
+        self._lock = threading.Lock()
+
+    def spend(self, calls=1):
+        """Takes `calls` from the budget; False (and nothing taken) once it has run out."""
+        with self._lock:
+            now = time.monotonic()
+            if self._started is None:
+                self._started = now
+            if self.max_calls is not None and self.spent + calls > self.max_calls:
+                self.reason = self.reason or "calls"
+                return False
+            if self.max_seconds is not None and now - self._started >= self.max_seconds:
+                self.reason = self.reason or "time"
+                return False
+            self.spent += calls
+            return True
+
+    def skip(self, items):
+        with self._lock:
+            self.skipped.extend(items)
+
+    @property
+    def exhausted(self):
+        return self.reason is not None
+
+    def status_line(self):
+        limits = []
+        if self.max_calls is not None:
+            limits.append(f"{self.spent}/{self.max_calls} calls")
+        else:
+            limits.append(f"{self.spent} calls")
+        if self.max_seconds is not None:
+            elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+            limits.append(f"{elapsed:.0f}s/{self.max_seconds:g}s")
+        state = f", exhausted ({self.reason}), {len(self.skipped)} left out" if self.exhausted else ""
+        return f"Budget: {', '.join(limits)}{state}"
+
+
+def jittered_backoff(attempt, base=1.0, cap=60.0):
+    """Exponential backoff with full jitter: random value in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# Window of the throughput reported by AdaptiveLimiter
+RATE_WINDOW = 60.0
+
+
+def retry_after_seconds(response, default=None):
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP date), or `default`."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency controller for one API, shared by all its workers.
+    - acquire() blocks while `limit` requests are already in flight (or during a
+      Retry-After pause) and returns a ticket; release(ticket, status) reports the outcome.
+    - Additive increase: after `limit` healthy responses in a row, with the average latency
+      within `latency_tolerance` x the best average seen so far, the limit grows by one.
+    - Multiplicative decrease: a 429, a 5xx or a network error halves the limit (at most
+      once per cooldown, so a burst of failures of requests already in flight counts once);
+      a Retry-After header also pauses every worker for the requested time.
+    Limit changes are logged through log_callback (must be thread safe) and kept in status_line().
+    """
+
+    def __init__(self, name, initial=2, min_limit=1, max_limit=16, latency_tolerance=2.0,
+                 decrease_factor=0.5, cooldown=2.0, log_callback=None):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial, self.min_limit), self.max_limit)
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.log_callback = log_callback
+        self.in_flight = 0
+        self.latency = None
+        self._best_latency = None
+        self._healthy = 0
+        self._last_decrease = 0.0
+        self._resume_at = 0.0
+        self._completed = deque()
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                pause = self._resume_at - time.monotonic()
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self.in_flight >= self.limit:
+                    self._cond.wait()
+                else:
+                    self.in_flight += 1
+                    return time.monotonic()
+
+    def release(self, ticket, status=None, retry_after=None):
+        """
+        ticket: Value returned by acquire()
+        status: HTTP status code of the response, None for a network error
+        retry_after: Seconds from a Retry-After header, if any
+        """
+        now = time.monotonic()
+        message = None
+        with self._cond:
+            self.in_flight -= 1
+            self._completed.append(now)
+            while now - self._completed[0] > RATE_WINDOW:
+                self._completed.popleft()
+            if retry_after:
+                self._resume_at = max(self._resume_at, now + retry_after)
+            if status is None or status == 429 or status >= 500:
+                self._healthy = 0
+                if now - self._last_decrease >= self.cooldown:
+                    self._last_decrease = now
+                    message = self._set_limit(max(self.min_limit, int(self.limit * self.decrease_factor)),
+                                              f"status {status or 'network error'}")
+            else:
+                elapsed = now - ticket
+                self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+                self._best_latency = min(self._best_latency or self.latency, self.latency)
+                self._healthy += 1
+                if (self._healthy >= self.limit and self.limit < self.max_limit
+                        and self.latency <= self._best_latency * self.latency_tolerance):
+                    self._healthy = 0
+                    message = self._set_limit(self.limit + 1, "healthy")
+            self._cond.notify_all()
+        if message and self.log_callback:
+            self.log_callback(message)
+
+    def cancel(self, ticket):
+        """Gives back the slot of a request that failed before reaching the server, without feedback."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _set_limit(self, new_limit, reason):
+        # Called with the lock held
+        if new_limit == self.limit:
+            return None
+        old, self.limit = self.limit, new_limit
+        return f"[*] {self.name}: concurrency {old} -> {new_limit} ({reason}; {self._describe()})"
+
+    def rate(self):
+        """Completed requests per second over the last RATE_WINDOW seconds."""
+        now = time.monotonic()
+        with self._cond:
+            return sum(1 for t in self._completed if now - t <= RATE_WINDOW) / RATE_WINDOW
+
+    def _describe(self):
+        latency = f"{self.latency:.1f}s" if self.latency is not None else "n/a"
+        return f"avg latency {latency}, {self.in_flight} in flight"
+
+    def status_line(self):
+        return f"{self.name}: concurrency {self.limit}/{self.max_limit}, {self._describe()}, {self.rate():.2f} req/s"
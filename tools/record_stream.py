@@ -0,0 +1,158 @@
+import codecs
+import json
+
+# Compact dtypes for the known FattoBoost fields; anything else is kept as object
+RECORD_DTYPES = {
+    'clicks': 'Int32',
+    'impressions': 'Int32',
+    'search_volume': 'Int32',
+    'average_position': 'float32',
+    'ctr': 'float32',
+    'search_volume_variation': 'float32',
+}
+
+DEFAULT_BATCH_SIZE = 20_000
+
+_decoder = json.JSONDecoder()
+
+
+class JSONStreamError(ValueError):
+    pass
+
+
+class _Buffer:
+    """Text buffer fed from an iterator of bytes/str chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self):
+        """Reads one more chunk; returns False when the stream is over."""
+        if self.exhausted:
+            return False
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            if isinstance(chunk, bytes):
+                chunk = self._decode.decode(chunk)
+            # Drop what has already been consumed to keep the buffer small
+            self.text = self.text[self.pos:] + chunk
+            self.pos = 0
+            return True
+        self.text = self.text[self.pos:] + self._decode.decode(b"", final=True)
+        self.pos = 0
+        self.exhausted = True
+        return False
+
+    def peek(self):
+        """Next non-whitespace character (reading more if needed), '' at end of stream."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise JSONStreamError(f"Expected '{char}' at offset {self.pos}, found '{self.peek()}'")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value, reading more chunks until it is complete."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.text, self.pos)
+                # A number at the very end of the buffer may continue in the next chunk
+                if end < len(self.text) or self.exhausted:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self.fill()
+
+
+def iter_json_array(chunks, key="data", meta=None):
+    """
+    Incrementally parses a JSON object like {"success": true, "data": [ {...}, {...} ]}
+    coming in as chunks (e.g. response.iter_content()) and yields the elements of the
+    `key` array one at a time, without ever holding the whole body in memory.
+    meta: Optional dict filled with the other top-level fields (e.g. 'success', 'message').
+          Fields that come after the array are only available once the generator is exhausted.
+    """
+    buf = _Buffer(chunks)
+    buf.expect("{")
+    if buf.peek() == "}":
+        return
+    while True:
+        name = buf.value()
+        buf.expect(":")
+        if name == key and buf.peek() == "[":
+            buf.pos += 1
+            if buf.peek() == "]":
+                buf.pos += 1
+            else:
+                while True:
+                    yield buf.value()
+                    sep = buf.peek()
+                    buf.pos += 1
+                    if sep == "]":
+                        break
+                    if sep != ",":
+                        raise JSONStreamError(f"Expected ',' or ']' in '{key}' array, found '{sep}'")
+        else:
+            value = buf.value()
+            if meta is not None:
+                meta[name] = value
+        sep = buf.peek()
+        buf.pos += 1
+        if sep == "}":
+            return
+        if sep != ",":
+            raise JSONStreamError(f"Expected ',' or '}}', found '{sep}'")
+
+
+def records_to_frame(records):
+    """Converts a list of records (dicts) to a DataFrame with the compact RECORD_DTYPES."""
+    import pandas as pd
+    df = pd.DataFrame.from_records(records)
+    for col, dtype in RECORD_DTYPES.items():
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            if dtype.startswith('Int'):
+                values = values.round()
+            df[col] = values.astype(dtype)
+    return df
+
+
+def widen_float32(df):
+    """
+    Returns df with float32 columns converted to float64 through their shortest decimal
+    representation (6.91 stays 6.91 instead of becoming 6.909999847412109), for writers.
+    """
+    float32_cols = [c for c in df.columns if df[c].dtype == 'float32']
+    if not float32_cols:
+        return df
+    df = df.copy()
+    for col in float32_cols:
+        df[col] = df[col].astype(str).astype('float64')
+    return df
+
+
+def iter_record_batches(records, batch_size=DEFAULT_BATCH_SIZE):
+    """Groups any iterable of records into typed DataFrame batches of at most `batch_size` rows."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield records_to_frame(batch)
+            batch = []
+    if batch:
+        yield records_to_frame(batch)
@@ -3,132 +3,413 @@ import pandas as pd
 from datetime import datetime
 import os
 
-def generate_report(monthly_data, trends_data, output_path="c:/Users/undrg/Opportunities/Opportunities_Report.xlsx"):
+from tools.excel_writer import StreamingExcelWriter
+from tools.record_stream import widen_float32
+from tools import telemetry
+from tools.periods import period_dates, label_date
+
+# Rows converted from records to a DataFrame (and written) at a time
+REPORT_CHUNK_ROWS = 50_000
+
+def month_dates(monthly_data, periods):
+    """
+    { month_name: Timestamp } of the sheets, from the fetch windows they came from.
+    periods: List of windows (label, start, end) as planned by tools/periods.py, or { label: date }.
+    Sheets without a window are dated from their label when it is a month ("Gen 2025"), else
+    get NaT (their clicks don't count towards the Summary months).
+    """
+    if periods is None:
+        periods = {}
+    elif not isinstance(periods, dict):
+        periods = period_dates(periods)
+    dates = {}
+    for name in monthly_data:
+        day = periods[name] if name in periods else label_date(name)
+        dates[name] = pd.Timestamp(day) if day is not None else pd.NaT
+    return dates
+
+def iter_month_frames(month_data, chunk_size=REPORT_CHUNK_ROWS):
+    """
+    Normalises the value of a monthly_data entry to an iterator of DataFrame chunks.
+    Accepts a list of records, a DataFrame, or any iterable of DataFrame batches
+    (e.g. the generator returned by stream_fattoboost_month).
+    """
+    if month_data is None:
+        return
+    if isinstance(month_data, pd.DataFrame):
+        for start in range(0, len(month_data), chunk_size):
+            yield month_data.iloc[start:start + chunk_size]
+    elif isinstance(month_data, list):
+        for start in range(0, len(month_data), chunk_size):
+            yield pd.DataFrame(month_data[start:start + chunk_size])
+    else:
+        for batch in month_data:
+            yield batch if isinstance(batch, pd.DataFrame) else pd.DataFrame(batch)
+
+def _resolve_trends(trends_data, accumulator):
+    # trends_data may be computed lazily once the queries of all months are known
+    if callable(trends_data):
+        return trends_data(accumulator.query_table()) or {}
+    return trends_data or {}
+
+def generate_report(monthly_data, trends_data, output_path="c:/Users/undrg/Opportunities/Opportunities_Report.xlsx", chunk_size=REPORT_CHUNK_ROWS, periods=None, changes=None):
     """
     Generates the Excel report with monthly tabs and a summary tab.
-    monthly_data: Dict { "Jan 2025": [records], ... }
-    trends_data: Dict { query: trend_info }
+    The workbook is streamed to disk (write-only mode): sheets get bold headers and
+    autofilters, and are split automatically when they exceed Excel's row limit.
+    monthly_data: Dict { "Jan 2025": [records] | DataFrame | iterable of DataFrame batches, ... }
+    trends_data: Dict { query: trend_info }, or a function (query_table) -> dict called
+                 after the monthly sheets are written, so that monthly data can be streamed
+                 straight from the API into the report. query_table has one row per query
+                 (sorted), with the columns of aggregate_queries (see SummaryAccumulator.query_table).
+    periods: The fetch windows of monthly_data (see month_dates); they date the Summary months.
+    changes: Optional Changes table (see tools/report_diff.build_changes), written after the Summary.
+    Peak memory is one chunk plus the per-query Summary aggregates.
     """
     print(f"[*] Generating Excel Report at {output_path}...")
     
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        all_records = []
+    with StreamingExcelWriter(output_path) as writer:
+        summary_acc = SummaryAccumulator()
+        dates = month_dates(monthly_data, periods)
         
         # 1. Create Monthly Sheets
-        for month_name, records in monthly_data.items():
-            if not records:
-                continue
-                
-            df = pd.DataFrame(records)
-            if df.empty:
-                continue
-                
-            # Add Month column for aggregation later
-            # Add Month column for aggregation later
-            df['_month_name'] = month_name
-            
-            # Helper to parse Italian months if needed, or fallback
-            # Mapping Italian -> English for strptime
-            it_to_en = {
-                "Gen": "Jan", "Feb": "Feb", "Mar": "Mar", "Apr": "Apr", "Mag": "May", "Giu": "Jun",
-                "Lug": "Jul", "Ago": "Aug", "Set": "Sep", "Ott": "Oct", "Nov": "Nov", "Dic": "Dec"
-            }
-            
-            clean_name = month_name
-            for it, en in it_to_en.items():
-                if month_name.startswith(it):
-                    clean_name = month_name.replace(it, en)
-                    break
-            
-            df['_month_date'] = pd.to_datetime(clean_name, format='%b %Y', errors='coerce')
-            
-            # Select relevant columns for the sheet (remove internal ones if needed)
-            cols_to_save = [c for c in df.columns if not c.startswith('_')]
-            
+        for month_name, month_data in monthly_data.items():
+            month_date = dates[month_name]
             sheet_name = month_name[:31] # Excel limit
-            df[cols_to_save].to_excel(writer, sheet_name=sheet_name, index=False)
-            
-            all_records.extend(df.to_dict('records'))
-            
-        # 2. Create Summary Sheet
-        if all_records:
-            master_df = pd.DataFrame(all_records)
-            
-            # Ensure _month_date is datetime
-            master_df['_month_date'] = pd.to_datetime(master_df['_month_date'])
-            
-            # Define aggregation logic
-            summary_list = []
             
-            grouped = master_df.groupby('query')
-            
-            for query, group in grouped:
-                # Basic metrics
-                total_clicks = group['clicks'].sum()
-                total_impressions = group['impressions'].sum()
-                avg_pos = group['average_position'].mean()
-                avg_ctr = group['ctr'].mean()
-                max_vol = group['search_volume'].max()
-                
-                # Time-based metrics
-                # Sort by date
-                sorted_group = group.sort_values('_month_date')
-                
-                clicks_only = sorted_group[sorted_group['clicks'] > 0]
-                
-                first_click_month = "N/A"
-                last_click_month = "N/A"
-                peak_month = "N/A"
-                
-                if not clicks_only.empty:
-                    # Check for NaT before formatting
-                    f_date = clicks_only.iloc[0]['_month_date']
-                    l_date = clicks_only.iloc[-1]['_month_date']
+            # Stream the month to the sheet chunk by chunk, aggregating as we go
+            for df in iter_month_frames(month_data, chunk_size):
+                if df.empty:
+                    continue
                     
-                    if pd.notnull(f_date):
-                        first_click_month = f_date.strftime('%b %Y')
-                    if pd.notnull(l_date):
-                        last_click_month = l_date.strftime('%b %Y')
-                
-                # Peak Month
-                # Month with max clicks
-                peak_idx = sorted_group['clicks'].idxmax()
-                peak_row = sorted_group.loc[peak_idx]
-                p_date = peak_row['_month_date']
-                
-                if pd.notnull(p_date):
-                    peak_month = p_date.strftime('%b %Y')
-                
-                record = {
-                    'Query': query,
-                    'Total Clicks': total_clicks,
-                    'Total Impressions': total_impressions,
-                    'Avg Position': avg_pos,
-                    'Avg CTR': avg_ctr,
-                    'Max Search Volume': max_vol,
-                    'First Click Month': first_click_month,
-                    'Peak Click Month': peak_month,
-                    'Last Click Month': last_click_month
-                }
-                
-                # Integrate Trends
-                if query in trends_data:
-                     t = trends_data[query]
-                     # Flatten trend dict
-                     # e.g. { 'trend_7d': ..., 'rising': ... }
-                     for k, v in t.items():
-                         record[f"Trend {k}"] = v
-                
-                summary_list.append(record)
+                # Select relevant columns for the sheet (remove internal ones if needed)
+                cols_to_save = [c for c in df.columns if not str(c).startswith('_')]
+                writer.write_frame(sheet_name, df[cols_to_save])
+                summary_acc.add(df, month_date)
+                telemetry.record("rows", len(df))
             
-            summary_df = pd.DataFrame(summary_list)
-            summary_df.to_excel(writer, sheet_name="Summary", index=False)
+        # 2. Create Summary Sheet
+        trends_data = _resolve_trends(trends_data, summary_acc)
+        summary_df = summary_acc.result(trends_data)
+        if not summary_df.empty:
+            for start in range(0, len(summary_df), chunk_size):
+                writer.write_frame("Summary", summary_df.iloc[start:start + chunk_size])
             print("    [OK] Summary sheet created.")
             
         else:
             print("    [WARN] No records found to build report.")
             
+        # 3. Create Changes Sheet
+        if changes is not None and not changes.empty:
+            for start in range(0, len(changes), chunk_size):
+                writer.write_frame("Changes", changes.iloc[start:start + chunk_size])
+            print(f"    [OK] Changes sheet created ({len(changes)} rows).")
+            
     return output_path
 
+# Columns of the monthly records used to build the Summary sheet
+SUMMARY_INPUT_COLUMNS = ['query', 'clicks', 'impressions', 'average_position', 'ctr', 'search_volume']
+
+# Explicit types for the known FattoBoost fields; other fields keep the type
+# inferred from the first chunk
+MONTHLY_INT_COLUMNS = ['clicks', 'impressions', 'search_volume']
+MONTHLY_FLOAT_COLUMNS = ['average_position', 'ctr', 'search_volume_variation']
+MONTHLY_STRING_COLUMNS = ['query', 'page']
+SUMMARY_INT_COLUMNS = ['Total Clicks', 'Total Impressions', 'Max Search Volume']
+SUMMARY_FLOAT_COLUMNS = ['Avg Position', 'Avg CTR']
+SUMMARY_STRING_COLUMNS = ['Query', 'First Click Month', 'Peak Click Month', 'Last Click Month']
+CHANGES_INT_COLUMNS = ['Clicks Before', 'Clicks', 'Clicks Delta', 'Impressions Before', 'Impressions', 'Impressions Delta']
+CHANGES_FLOAT_COLUMNS = ['Clicks Change %', 'Position Before', 'Position', 'Position Delta']
+CHANGES_STRING_COLUMNS = ['Comparison', 'Period', 'Compared To', 'Query', 'Page', 'Status']
+
+COLUMNAR_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+def _columnar_schema(pa, df, int_cols, float_cols, string_cols, leading=()):
+    fields = list(leading)
+    leading_names = {f.name for f in leading}
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    for name in df.columns:
+        if name in leading_names:
+            continue
+        if name in int_cols:
+            fields.append(pa.field(name, pa.int64()))
+        elif name in float_cols:
+            fields.append(pa.field(name, pa.float64()))
+        elif name in string_cols:
+            fields.append(pa.field(name, pa.string()))
+        else:
+            field = inferred.field(name)
+            fields.append(pa.field(name, pa.string() if pa.types.is_null(field.type) else field.type))
+    return pa.schema(fields)
+
+def _coerce_for_schema(df, schema):
+    df = widen_float32(df.reindex(columns=schema.names))
+    for field in schema:
+        col = df[field.name]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            df[field.name] = col = col.astype(object)
+        if str(field.type) == "int64":
+            df[field.name] = pd.to_numeric(col, errors='coerce').round().astype('Int64')
+        elif str(field.type) == "double":
+            df[field.name] = pd.to_numeric(col, errors='coerce').astype('float64')
+    return df
+
+class _ColumnarWriter:
+    """Chunked Parquet / Arrow IPC file writer with a fixed schema and zstd compression."""
+
+    def __init__(self, path, schema, fmt):
+        import pyarrow as pa
+        self.pa = pa
+        self.schema = schema
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+        else:
+            options = pa.ipc.IpcWriteOptions(compression="zstd")
+            self._writer = pa.ipc.new_file(path, schema, options=options)
+
+    def write(self, df):
+        table = self.pa.Table.from_pandas(_coerce_for_schema(df, self.schema), schema=self.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+
+def generate_columnar_report(monthly_data, trends_data, output_dir, basename="Report", fmt="parquet", chunk_size=REPORT_CHUNK_ROWS, periods=None, changes=None):
+    """
+    Writes the report in a columnar format for downstream BI jobs (requires pyarrow):
+    - <basename>_monthly<ext>: All monthly records in one table, with 'month' (date) and 'month_label' columns
+    - <basename>_summary<ext>: The Summary table
+    - <basename>_changes<ext>: The Changes table, if `changes` is given and not empty
+    fmt: "parquet" or "arrow" (Arrow IPC / Feather v2). Both use zstd compression.
+    periods: The fetch windows of monthly_data, as for generate_report ('month' is their start date).
+    Returns a dictionary { 'monthly': path, 'summary': path, 'changes': path } (only the files that were written).
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Columnar export requires pyarrow: pip install pyarrow")
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown columnar format '{fmt}', expected one of {list(COLUMNAR_FORMATS)}")
+        
+    ext = COLUMNAR_FORMATS[fmt]
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    print(f"[*] Generating {fmt} export in {output_dir}...")
+    
+    leading = [pa.field('month', pa.date32()), pa.field('month_label', pa.string())]
+    monthly_path = os.path.join(output_dir, f"{basename}_monthly{ext}")
+    writer = None
+    summary_acc = SummaryAccumulator()
+    dates = month_dates(monthly_data, periods)
+    try:
+        for month_name, month_data in monthly_data.items():
+            month_date = dates[month_name]
+            for df in iter_month_frames(month_data, chunk_size):
+                if df.empty:
+                    continue
+                summary_acc.add(df, month_date)
+                df = df[[c for c in df.columns if not str(c).startswith('_')]].copy()
+                df.insert(0, 'month_label', month_name)
+                df.insert(0, 'month', month_date.date() if pd.notnull(month_date) else None)
+                
+                if writer is None:
+                    schema = _columnar_schema(pa, df, MONTHLY_INT_COLUMNS, MONTHLY_FLOAT_COLUMNS, MONTHLY_STRING_COLUMNS, leading)
+                    writer = _ColumnarWriter(monthly_path, schema, fmt)
+                writer.write(df)
+                telemetry.record("rows", len(df))
+    finally:
+        if writer is not None:
+            writer.close()
+            
+    if writer is None:
+        print("    [WARN] No records found to build columnar export.")
+        return paths
+    paths['monthly'] = monthly_path
+    
+    summary_df = summary_acc.result(_resolve_trends(trends_data, summary_acc))
+    
+    summary_path = os.path.join(output_dir, f"{basename}_summary{ext}")
+    schema = _columnar_schema(pa, summary_df, SUMMARY_INT_COLUMNS, SUMMARY_FLOAT_COLUMNS, SUMMARY_STRING_COLUMNS)
+    summary_writer = _ColumnarWriter(summary_path, schema, fmt)
+    try:
+        summary_writer.write(summary_df)
+    finally:
+        summary_writer.close()
+    paths['summary'] = summary_path
+    
+    if changes is not None and not changes.empty:
+        changes_path = os.path.join(output_dir, f"{basename}_changes{ext}")
+        schema = _columnar_schema(pa, changes, CHANGES_INT_COLUMNS, CHANGES_FLOAT_COLUMNS, CHANGES_STRING_COLUMNS)
+        changes_writer = _ColumnarWriter(changes_path, schema, fmt)
+        try:
+            for start in range(0, len(changes), chunk_size):
+                changes_writer.write(changes.iloc[start:start + chunk_size])
+        finally:
+            changes_writer.close()
+        paths['changes'] = changes_path
+    
+    print(f"    [OK] Columnar export created: {', '.join(paths.values())}")
+    return paths
+
+def _attach_trends(summary, trends_data):
+    # Integrate Trends
+    # Flatten trend dict, e.g. { 'trend_7d': ..., 'rising': ... } -> 'Trend trend_7d', 'Trend rising'
+    matched = [q for q in summary['Query'] if q in trends_data]
+    if matched:
+        trends_df = pd.DataFrame([trends_data[q] for q in matched])
+        trends_df.columns = [f"Trend {k}" for k in trends_df.columns]
+        trends_df.insert(0, 'Query', matched)
+        summary = summary.merge(trends_df, on='Query', how='left')
+    
+    return summary
+
+class SummaryAccumulator:
+    """
+    Builds the Summary table (one row per query) of generate_report: monthly batches are
+    reduced to per-query partial aggregates as they arrive, with whole-frame groupby
+    operations, so memory depends on the number of distinct queries and not on the
+    number of rows.
+    Every batch passed to add() must belong to a single month.
+    """
+
+    def __init__(self, compact_every=200_000):
+        self._parts = []
+        self._pending_rows = 0
+        self.compact_every = compact_every
+
+    def add(self, df, month_date):
+        if df.empty or 'query' not in df.columns:
+            return
+        df = widen_float32(df[[c for c in SUMMARY_INPUT_COLUMNS if c in df.columns]])
+        
+        def numeric(col):
+            if col in df.columns:
+                return pd.to_numeric(df[col], errors='coerce').astype('float64')
+            return pd.Series(float('nan'), index=df.index)
+        
+        clicks = numeric('clicks')
+        position = numeric('average_position')
+        ctr = numeric('ctr')
+        rows = pd.DataFrame({
+            'query': df['query'].astype(object),
+            'clicks': clicks,
+            'impressions': numeric('impressions'),
+            'pos_sum': position,
+            'pos_n': position.notna().astype('int64'),
+            'ctr_sum': ctr,
+            'ctr_n': ctr.notna().astype('int64'),
+            'search_volume': numeric('search_volume'),
+            'has_click': (clicks > 0).astype('int64'),
+        })
+        part = rows.groupby('query').agg(
+            clicks=('clicks', 'sum'),
+            impressions=('impressions', 'sum'),
+            pos_sum=('pos_sum', 'sum'),
+            pos_n=('pos_n', 'sum'),
+            ctr_sum=('ctr_sum', 'sum'),
+            ctr_n=('ctr_n', 'sum'),
+            search_volume=('search_volume', 'max'),
+            peak_clicks=('clicks', 'max'),
+            has_click=('has_click', 'max'),
+        )
+        month_date = pd.Timestamp(month_date) if pd.notnull(month_date) else pd.NaT
+        part['first_click'] = month_date
+        part['first_click'] = part['first_click'].where(part['has_click'] > 0)
+        part['last_click'] = part['first_click']
+        part['peak_date'] = month_date
+        part = part.drop(columns='has_click').reset_index()
+        
+        self._parts.append(part)
+        self._pending_rows += len(part)
+        if self._pending_rows >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        if len(self._parts) <= 1:
+            return
+        parts = pd.concat(self._parts, ignore_index=True)
+        grouped = parts.groupby('query')
+        merged = grouped.agg(
+            clicks=('clicks', 'sum'),
+            impressions=('impressions', 'sum'),
+            pos_sum=('pos_sum', 'sum'),
+            pos_n=('pos_n', 'sum'),
+            ctr_sum=('ctr_sum', 'sum'),
+            ctr_n=('ctr_n', 'sum'),
+            search_volume=('search_volume', 'max'),
+            first_click=('first_click', 'min'),
+            last_click=('last_click', 'max'),
+        )
+        # Peak: highest monthly max, earliest month wins ties
+        peak = parts.sort_values(['peak_date'], kind='mergesort', na_position='last')
+        peak = peak.sort_values('peak_clicks', ascending=False, kind='mergesort', na_position='last')
+        peak = peak.drop_duplicates('query', keep='first').set_index('query')[['peak_clicks', 'peak_date']]
+        merged = merged.join(peak).reset_index()
+        self._parts = [merged]
+        self._pending_rows = len(merged)
+
+    def queries(self):
+        """Sorted list of the distinct queries seen so far."""
+        self._compact()
+        if not self._parts:
+            return []
+        return sorted(self._parts[0]['query'])
+
+    def query_table(self):
+        """
+        Per-query totals seen so far, shaped like aggregate_queries (tools/compact_dataset.py):
+        query (sorted), clicks, impressions, average_position, ctr (missing values as 0).
+        """
+        self._compact()
+        columns = ['query', 'clicks', 'impressions', 'average_position', 'ctr']
+        if not self._parts:
+            return pd.DataFrame(columns=columns)
+        agg = self._parts[0].sort_values('query', kind='mergesort')
+        table = pd.DataFrame({
+            'query': agg['query'].astype(str).values,
+            'clicks': agg['clicks'].fillna(0).values,
+            'impressions': agg['impressions'].fillna(0).values,
+            'average_position': (agg['pos_sum'] / agg['pos_n'].where(agg['pos_n'] > 0)).fillna(0).values,
+            'ctr': (agg['ctr_sum'] / agg['ctr_n'].where(agg['ctr_n'] > 0)).fillna(0).values,
+        })
+        for col in ['clicks', 'impressions']:
+            table[col] = table[col].astype('int64')
+        return table
+
+    def result(self, trends_data):
+        """
+        Returns the Summary table: Query, Total Clicks, Total Impressions, Avg Position,
+        Avg CTR, Max Search Volume, First/Peak/Last Click Month, then the trends_data
+        of the query flattened into 'Trend <key>' columns.
+        """
+        self._compact()
+        if not self._parts:
+            return pd.DataFrame()
+        agg = self._parts[0].sort_values('query', kind='mergesort')
+        
+        def month_label(col):
+            return agg[col].dt.strftime('%b %Y').fillna('N/A').values
+        
+        def mean(total, count):
+            return (agg[total] / agg[count].where(agg[count] > 0)).values
+        
+        summary = pd.DataFrame({
+            'Query': agg['query'].values,
+            'Total Clicks': agg['clicks'].values,
+            'Total Impressions': agg['impressions'].values,
+            'Avg Position': mean('pos_sum', 'pos_n'),
+            'Avg CTR': mean('ctr_sum', 'ctr_n'),
+            'Max Search Volume': agg['search_volume'].values,
+            'First Click Month': month_label('first_click'),
+            'Peak Click Month': month_label('peak_date'),
+            'Last Click Month': month_label('last_click'),
+        })
+        # Counts are integers unless the source had no values at all
+        for col in ['Total Clicks', 'Total Impressions', 'Max Search Volume']:
+            if summary[col].notna().all() and (summary[col] % 1 == 0).all():
+                summary[col] = summary[col].astype('int64')
+        return _attach_trends(summary, trends_data)
+
 if __name__ == "__main__":
     pass
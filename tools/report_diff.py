@@ -0,0 +1,217 @@
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from tools.response_cache import DEFAULT_CACHE_DIR
+from tools.record_stream import records_to_frame
+
+SNAPSHOTS_DIR = os.path.join(DEFAULT_CACHE_DIR, "snapshots")
+
+# Rows are matched on these columns
+DIFF_KEYS = ['query', 'page']
+
+# A matched row is reported as "up"/"down" only if its clicks moved by at least
+# CHANGE_MIN_CLICKS and CHANGE_MIN_PCT percent (from 0 clicks, any move of CHANGE_MIN_CLICKS)
+CHANGE_MIN_CLICKS = 10
+CHANGE_MIN_PCT = 50
+
+# Order of the statuses in the Changes table (unchanged rows are left out)
+STATUS_ORDER = ["new", "lost", "up", "down"]
+
+CHANGES_COLUMNS = [
+    'Comparison', 'Period', 'Compared To', 'Query', 'Page', 'Status',
+    'Clicks Before', 'Clicks', 'Clicks Delta', 'Clicks Change %',
+    'Impressions Before', 'Impressions', 'Impressions Delta',
+    'Position Before', 'Position', 'Position Delta',
+]
+
+
+def _frame(month_data):
+    if isinstance(month_data, pd.DataFrame):
+        return month_data
+    if isinstance(month_data, list):
+        return records_to_frame(month_data)
+    frames = [b if isinstance(b, pd.DataFrame) else pd.DataFrame(b) for b in month_data]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def key_totals(df):
+    """
+    One row per (query, page): summed clicks and impressions, average position weighted by
+    impressions (plain mean where there are none), and '_key', a 64-bit hash of the pair
+    used to join the tables of two periods.
+    df: Monthly records as a DataFrame
+    """
+    if df.empty or 'query' not in df.columns:
+        return pd.DataFrame(columns=DIFF_KEYS + ['clicks', 'impressions', 'position', '_key'])
+
+    def numeric(col):
+        if col in df.columns:
+            return pd.to_numeric(df[col], errors='coerce').astype('float64')
+        return pd.Series(np.nan, index=df.index)
+
+    impressions = numeric('impressions')
+    position = numeric('average_position')
+    weight = impressions.where(position.notna()).fillna(0)
+    rows = pd.DataFrame({
+        'query': df['query'].astype(str),
+        'page': df['page'].astype(str) if 'page' in df.columns else '',
+        'clicks': numeric('clicks').fillna(0),
+        'impressions': impressions.fillna(0),
+        'pos_weighted': (position * weight).fillna(0),
+        'pos_weight': weight,
+        'pos_sum': position.fillna(0),
+        'pos_n': position.notna().astype('int64'),
+    })
+    totals = rows.groupby(DIFF_KEYS, sort=False).sum().reset_index()
+    weighted = totals['pos_weighted'] / totals['pos_weight'].where(totals['pos_weight'] > 0)
+    plain = totals['pos_sum'] / totals['pos_n'].where(totals['pos_n'] > 0)
+    totals['position'] = weighted.fillna(plain)
+    totals['_key'] = pd.util.hash_pandas_object(totals[DIFF_KEYS], index=False).to_numpy()
+    return totals[DIFF_KEYS + ['clicks', 'impressions', 'position', '_key']]
+
+
+def period_totals(monthly_data):
+    """
+    key_totals of every month, plus '' for the whole period.
+    monthly_data: { month_name: records | DataFrame | iterable of DataFrame batches } (read once)
+    Returns ({ month_name: totals }, totals of the whole period).
+    """
+    by_month = {name: key_totals(_frame(data)) for name, data in monthly_data.items()}
+    by_month = {name: t for name, t in by_month.items() if not t.empty}
+    if not by_month:
+        return by_month, key_totals(pd.DataFrame())
+
+    stacked = pd.concat(by_month.values(), ignore_index=True)
+    stacked['pos_weighted'] = stacked['position'] * stacked['impressions']
+    stacked['pos_weight'] = stacked['impressions'].where(stacked['position'].notna(), 0)
+    stacked['pos_sum'] = stacked['position']
+    whole = stacked.groupby('_key', sort=False).agg(
+        query=('query', 'first'),
+        page=('page', 'first'),
+        clicks=('clicks', 'sum'),
+        impressions=('impressions', 'sum'),
+        pos_weighted=('pos_weighted', 'sum'),
+        pos_weight=('pos_weight', 'sum'),
+        pos_sum=('pos_sum', 'mean'),
+    ).reset_index()
+    whole['position'] = (whole['pos_weighted'] / whole['pos_weight'].where(whole['pos_weight'] > 0)).fillna(whole['pos_sum'])
+    return by_month, whole[DIFF_KEYS + ['clicks', 'impressions', 'position', '_key']]
+
+
+def diff_totals(current, previous, min_clicks=CHANGE_MIN_CLICKS, min_change_pct=CHANGE_MIN_PCT):
+    """
+    Compares two key_totals tables with one hash join on '_key' (no per-row Python loop).
+    Returns one row per (query, page) that is new, lost, or whose clicks moved past the
+    thresholds ("up"/"down"), with the before/after values and their deltas.
+    """
+    joined = current.merge(previous, on='_key', how='outer', suffixes=('', '_before'), indicator=True, sort=False)
+    joined['query'] = joined['query'].fillna(joined['query_before'])
+    joined['page'] = joined['page'].fillna(joined['page_before'])
+
+    clicks_delta = joined['clicks'].fillna(0) - joined['clicks_before'].fillna(0)
+    change_pct = (clicks_delta / joined['clicks_before'].where(joined['clicks_before'] > 0) * 100).round(1)
+    moved = (clicks_delta.abs() >= min_clicks) & (change_pct.abs().fillna(np.inf) >= min_change_pct)
+    status = np.select(
+        [joined['_merge'] == 'left_only', joined['_merge'] == 'right_only', moved & (clicks_delta > 0), moved & (clicks_delta < 0)],
+        STATUS_ORDER,
+        default='unchanged'
+    )
+
+    out = pd.DataFrame({
+        'Query': joined['query'],
+        'Page': joined['page'],
+        'Status': status,
+        'Clicks Before': joined['clicks_before'],
+        'Clicks': joined['clicks'],
+        'Clicks Delta': clicks_delta,
+        'Clicks Change %': change_pct,
+        'Impressions Before': joined['impressions_before'],
+        'Impressions': joined['impressions'],
+        'Impressions Delta': joined['impressions'].fillna(0) - joined['impressions_before'].fillna(0),
+        'Position Before': joined['position_before'].round(2),
+        'Position': joined['position'].round(2),
+        # Negative = better (closer to the top)
+        'Position Delta': (joined['position'] - joined['position_before']).round(2),
+    })
+    out = out[out['Status'] != 'unchanged']
+    out['_order'] = pd.Categorical(out['Status'], categories=STATUS_ORDER, ordered=True).codes
+    out['_size'] = -out['Clicks Delta'].abs()
+    out = out.sort_values(['_order', '_size', 'Query'], kind='mergesort')
+    return out.drop(columns=['_order', '_size']).reset_index(drop=True)
+
+
+def build_changes(monthly_data, previous_totals=None, month_over_month=True, min_clicks=CHANGE_MIN_CLICKS, min_change_pct=CHANGE_MIN_PCT):
+    """
+    The Changes table of a report:
+    - run over run: totals of the whole period against previous_totals (the snapshot of the
+      previous run, see load_snapshot), Comparison = "run"
+    - month over month: every month against the month before, Comparison = "month"
+    monthly_data: { month_name: records | DataFrame } in period order
+    Returns (changes, totals) where totals is the snapshot of this run (see save_snapshot).
+    """
+    by_month, totals = period_totals(monthly_data)
+    parts = []
+
+    def add(part, comparison, period, compared_to):
+        if part.empty:
+            return
+        part.insert(0, 'Compared To', compared_to)
+        part.insert(0, 'Period', period)
+        part.insert(0, 'Comparison', comparison)
+        parts.append(part)
+
+    if previous_totals is not None:
+        add(diff_totals(totals, previous_totals, min_clicks, min_change_pct), "run", "", "previous run")
+    if month_over_month:
+        names = list(by_month)
+        for before, after in zip(names, names[1:]):
+            add(diff_totals(by_month[after], by_month[before], min_clicks, min_change_pct), "month", after, before)
+
+    changes = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=CHANGES_COLUMNS)
+    return changes[CHANGES_COLUMNS], totals
+
+
+def changes_stats_line(changes):
+    counts = changes['Status'].value_counts() if not changes.empty else {}
+    by_status = ", ".join(f"{counts.get(s, 0)} {s}" for s in STATUS_ORDER)
+    return f"Changes: {by_status}"
+
+
+def _snapshot_path(property_url, country, period, base_dir=SNAPSHOTS_DIR, scope=None):
+    name = f"{property_url}_{country}_{period}" if scope is None else f"{property_url}_{country}_{period}_{scope}"
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return os.path.join(base_dir, f"{slug}.json.gz")
+
+
+def save_snapshot(totals, property_url, country, period, base_dir=SNAPSHOTS_DIR, scope=None):
+    """
+    Keeps the (query, page) totals of this report for the run-over-run diff of the next one.
+    scope: credential_scope() of the FattoBoost token (see tools/response_cache.py); the
+           snapshot is only compared with reports made with the same token.
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    path = _snapshot_path(property_url, country, period, base_dir, scope)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    totals[DIFF_KEYS + ['clicks', 'impressions', 'position']].to_json(tmp_path, orient="split", index=False, compression="gzip")
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_snapshot(property_url, country, period, base_dir=SNAPSHOTS_DIR, scope=None):
+    """Totals saved by the previous report of the same property, period and scope, or None."""
+    path = _snapshot_path(property_url, country, period, base_dir, scope)
+    try:
+        totals = pd.read_json(path, orient="split", dtype=False, compression="gzip")
+    except (OSError, ValueError):
+        return None
+    for col in DIFF_KEYS:
+        totals[col] = totals[col].astype(str)
+    for col in ['clicks', 'impressions', 'position']:
+        totals[col] = pd.to_numeric(totals[col], errors='coerce').astype('float64')
+    totals['_key'] = pd.util.hash_pandas_object(totals[DIFF_KEYS], index=False).to_numpy()
+    totals.attrs['saved_at'] = datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+    return totals
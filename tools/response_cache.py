@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+DEFAULT_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIR, "responses.sqlite")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def ttl_for_period(end_date, today=None):
+    """
+    Cache TTL in seconds for data covering a period that ends on `end_date` (YYYY-MM-DD).
+    Closed months rarely change once GSC data has settled, the current one changes daily.
+    """
+    today = today or date.today()
+    end = date.fromisoformat(end_date)
+    if end >= today:
+        return 1 * HOUR
+    if (today - end).days <= 3:
+        # GSC data of the last few days is still being finalised
+        return 6 * HOUR
+    return 30 * DAY
+
+
+def credential_scope(secret):
+    """
+    One-way fingerprint of a credential (e.g. the FattoBoost token), used to scope stored
+    data to the credential that fetched it: on a server shared by several analysts, a
+    session with another token (or with none) never gets that data back. The credential
+    can't be recovered from it.
+    """
+    return hashlib.sha256(f"opportunity-engine\n{secret or ''}".encode("utf-8")).hexdigest()[:24]
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for API responses, stored in a single SQLite file.
+    Entries are keyed on (source, request payload, scope) and stored as zlib-compressed JSON.
+    Credentials are never part of the key or the stored value: responses that only the
+    owner of a credential may see are stored under its credential_scope(), so they are only
+    served to a caller with the same credential. Entries without a scope are shared by
+    everybody (e.g. Google Trends series, which are public).
+    When the file grows past `max_bytes`, least recently used entries are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        self._conn.commit()
+        self.hits = {}
+        self.misses = {}
+
+    @staticmethod
+    def make_key(source, payload, scope=None):
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        scoped = f"{source}\n{canonical}" if scope is None else f"{source}\n{scope}\n{canonical}"
+        return hashlib.sha256(scoped.encode("utf-8")).hexdigest()
+
+    def get(self, source, payload, scope=None):
+        """
+        Returns the cached value, or None on miss/expiry.
+        scope: credential_scope() of the caller, for entries stored with one.
+        """
+        key = self.make_key(source, payload, scope)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses[source] = self.misses.get(source, 0) + 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits[source] = self.hits.get(source, 0) + 1
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, source, payload, value, ttl, scope=None):
+        blob = zlib.compress(json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), 6)
+        self._put_blob(source, payload, blob, ttl, scope)
+
+    def list_writer(self, source, payload, ttl, scope=None):
+        """
+        Incremental writer for list values that are produced one item at a time
+        (streamed responses): only the compressed bytes are kept in memory.
+        Nothing is stored unless commit() is called.
+        """
+        return _ListWriter(self, source, payload, ttl, scope)
+
+    def _put_blob(self, source, payload, blob, ttl, scope=None):
+        key = self.make_key(source, payload, scope)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, source, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, source, blob, len(blob), now + ttl, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Called with the lock held
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            victims.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats_line(self):
+        """Human readable hit/miss counters, e.g. for the UI log."""
+        sources = sorted(set(self.hits) | set(self.misses))
+        if not sources:
+            return "Cache: no lookups yet"
+        parts = [f"{s}: {self.hits.get(s, 0)} hit / {self.misses.get(s, 0)} miss" for s in sources]
+        return "Cache: " + ", ".join(parts)
+
+
+class _ListWriter:
+    def __init__(self, cache, source, payload, ttl, scope=None):
+        self._cache = cache
+        self._source = source
+        self._payload = payload
+        self._ttl = ttl
+        self._scope = scope
+        self._compressor = zlib.compressobj(6)
+        self._parts = [self._compressor.compress(b"[")]
+        self._count = 0
+
+    def append(self, item):
+        prefix = b"," if self._count else b""
+        data = prefix + json.dumps(item, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self._parts.append(self._compressor.compress(data))
+        self._count += 1
+
+    def commit(self):
+        self._parts.append(self._compressor.compress(b"]"))
+        self._parts.append(self._compressor.flush())
+        self._cache._put_blob(self._source, self._payload, b"".join(self._parts), self._ttl, self._scope)
+        self._parts = []
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache instance stored in DEFAULT_CACHE_PATH."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
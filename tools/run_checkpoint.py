@@ -0,0 +1,176 @@
+import gzip
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+
+from tools.response_cache import DEFAULT_CACHE_DIR
+
+RUNS_DIR = os.path.join(DEFAULT_CACHE_DIR, "runs")
+
+# Stages of a run, in order
+STAGES = ("extract", "select", "enrich", "done")
+
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", text).strip("_")
+
+
+class RunCheckpoint:
+    """
+    On-disk progress of one analysis run (property + country + year), so that a run
+    interrupted by a closed tab, a Streamlit rerun or a crash continues from the last
+    completed unit of work instead of starting over:
+    - run.json: stage, settings, selected queries
+    - months/<month>.json.gz: every month as soon as it has been fetched
+    - trends.jsonl: trend results appended after every DataForSEO batch
+    Files are only written from the calling thread (see fetch_months_concurrently).
+    Credentials are never stored; scope is the credential_scope() of the FattoBoost token
+    (see tools/response_cache.py), so a run is only resumed by a session with the same token.
+    """
+
+    def __init__(self, property_url, country, year, base_dir=RUNS_DIR, scope=None):
+        self.property_url = property_url
+        self.country = country
+        self.year = year
+        name = f"{property_url}_{country}_{year}" if scope is None else f"{property_url}_{country}_{year}_{scope}"
+        self.path = os.path.join(base_dir, _slug(name))
+        self._state = None
+
+    @property
+    def _state_path(self):
+        return os.path.join(self.path, "run.json")
+
+    @property
+    def _trends_path(self):
+        return os.path.join(self.path, "trends.jsonl")
+
+    def _month_path(self, month_name):
+        return os.path.join(self.path, "months", f"{_slug(month_name)}.json.gz")
+
+    def state(self):
+        """The run.json content, or None if no run was started."""
+        if self._state is None:
+            try:
+                with open(self._state_path, encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                return None
+        return self._state
+
+    def _write_state(self):
+        self._state["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self._state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._state_path)
+
+    def is_unfinished(self):
+        state = self.state()
+        return state is not None and state.get("stage") != "done"
+
+    def start(self, settings=None):
+        """Starts a new run, discarding the checkpoints of any previous one."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        now = datetime.now().isoformat(timespec="seconds")
+        self._state = {
+            "property": self.property_url,
+            "country": self.country,
+            "year": self.year,
+            "stage": "extract",
+            "settings": dict(settings or {}),
+            "selected_queries": None,
+            "started_at": now,
+        }
+        self._write_state()
+        return self
+
+    @property
+    def stage(self):
+        return (self.state() or {}).get("stage")
+
+    @property
+    def settings(self):
+        return (self.state() or {}).get("settings", {})
+
+    def set_stage(self, stage):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+        self.state()["stage"] = stage
+        self._write_state()
+
+    def save_month(self, month_name, start_date, end_date, records):
+        path = self._month_path(month_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"start": start_date, "end": end_date, "records": records}, f,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def completed_months(self, months):
+        """
+        months: List of (month_name, start_date, end_date)
+        Returns { month_name: records } for the months already fetched by this run
+        (same date range, non-empty), in the given order.
+        """
+        completed = {}
+        for month_name, start_d, end_d in months:
+            try:
+                with gzip.open(self._month_path(month_name), "rt", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if entry.get("start") == start_d and entry.get("end") == end_d and entry.get("records"):
+                completed[month_name] = entry["records"]
+        return completed
+
+    def save_selection(self, queries):
+        self.state()["selected_queries"] = list(queries)
+        self._write_state()
+
+    def selection(self):
+        return (self.state() or {}).get("selected_queries")
+
+    def save_trends(self, results):
+        """Appends { keyword: trend } results; errors are left out so they are retried on resume."""
+        lines = [
+            json.dumps({"keyword": kw, "result": res}, ensure_ascii=False)
+            for kw, res in results.items() if res.get("trend") != "Error"
+        ]
+        if not lines:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._trends_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+
+    def trends(self):
+        """{ keyword: trend } saved so far (a line cut short by a crash is ignored)."""
+        results = {}
+        try:
+            with open(self._trends_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    results[entry["keyword"]] = entry["result"]
+        except OSError:
+            pass
+        return results
+
+    def finish(self):
+        """Marks the run as done; the month files are dropped (they are in the dataset store)."""
+        shutil.rmtree(os.path.join(self.path, "months"), ignore_errors=True)
+        self.set_stage("done")
+
+    def describe(self):
+        """One-line summary of the saved progress."""
+        state = self.state() or {}
+        months_dir = os.path.join(self.path, "months")
+        n_months = len(os.listdir(months_dir)) if os.path.isdir(months_dir) else 0
+        return (f"stage '{state.get('stage')}', {n_months} months, {len(self.trends())} trends, "
+                f"last update {state.get('updated_at')}")
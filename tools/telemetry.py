@@ -0,0 +1,211 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Counters every span reports, even when nothing was recorded
+SPAN_COUNTERS = ['requests', 'http_errors', 'retries', 'bytes', 'rows']
+
+# Run and open spans of the current thread / context. Worker pools carry them into
+# their threads through submit(), so counters recorded by a worker land in the spans
+# of the run that started it, even with several runs in one process (batch runner).
+_run = contextvars.ContextVar("telemetry_run", default=None)
+_open = contextvars.ContextVar("telemetry_open_spans", default=())
+
+
+def peak_rss_mb():
+    """Peak resident memory of the process so far, in MB (None where it can't be read)."""
+    try:
+        import resource
+    except ImportError:
+        # Windows: only through psutil, if installed
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / 2**20, 1)
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+class Span:
+    """One timed stage of a run; counters can be added from any thread."""
+
+    def __init__(self, name, parent=None, attrs=None):
+        self.name = name
+        self.parent = parent
+        self.attrs = dict(attrs or {})
+        self.counters = dict.fromkeys(SPAN_COUNTERS, 0)
+        self._lock = threading.Lock()
+        self._started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._start_rss = peak_rss_mb()
+
+    def add(self, key, value=1):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        """Closes the span and returns its JSON-serialisable record."""
+        peak = peak_rss_mb()
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "name": self.name,
+            "parent": self.parent,
+            "started_at": self._started_at.isoformat(timespec="seconds"),
+            "wall_s": round(time.perf_counter() - self._start, 3),
+            **counters,
+            "peak_rss_mb": peak,
+            "rss_growth_mb": round(peak - self._start_rss, 1) if peak is not None and self._start_rss is not None else None,
+            **self.attrs,
+        }
+
+
+class _NullSpan:
+    # Handed out when no run is active, so instrumented code needs no checks
+    def add(self, key, value=1):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+
+class RunTelemetry:
+    """
+    Spans of one run (one property): wall time, HTTP requests / errors / bytes, retries,
+    rows processed and peak RSS per stage, exported as a JSON run report.
+    Activate it with activate(run) in the thread driving the run, then wrap every stage
+    in `with span(name):`; the clients add their counters to the open spans.
+    meta: Run description stored in the report (property, year, settings; no credentials).
+    """
+
+    def __init__(self, name, meta=None):
+        self.name = name
+        self.meta = dict(meta or {})
+        self.started_at = datetime.now()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def drop(self, *names):
+        """Forgets the spans called `names` and their children (e.g. a stage that is run again)."""
+        with self._lock:
+            self.spans = [s for s in self.spans if s["name"] not in names and s["parent"] not in names]
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        top_level = [s for s in spans if s["parent"] is None]
+        return {
+            "name": self.name,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "meta": self.meta,
+            "peak_rss_mb": peak_rss_mb(),
+            "totals": {key: round(sum(s.get(key, 0) for s in top_level), 3) for key in ['wall_s'] + SPAN_COUNTERS},
+            "spans": spans,
+        }
+
+    def export_json(self, path):
+        """Writes the run report to `path` and returns the path."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False, default=str)
+        return path
+
+    def summary_frame(self):
+        """One row per span, in completion order."""
+        return spans_frame(self.to_dict())
+
+
+def activate(run):
+    """Makes `run` (a RunTelemetry, or None to stop recording) the run of the current thread."""
+    _run.set(run)
+    _open.set(())
+
+
+def current_run():
+    return _run.get()
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times the enclosed block as a stage of the active run and yields the Span
+    (span.add('rows', n), span.set(key=value)). Spans opened inside it are its children.
+    Does nothing when no run is active.
+    """
+    run = _run.get()
+    if run is None:
+        yield _NullSpan()
+        return
+    open_spans = _open.get()
+    current = Span(name, open_spans[-1].name if open_spans else None, attrs)
+    token = _open.set(open_spans + (current,))
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _open.reset(token)
+        run.add(current.finish())
+
+
+def record(key, value=1):
+    """Adds `value` to counter `key` of every open span (no-op outside a run)."""
+    for open_span in _open.get():
+        open_span.add(key, value)
+
+
+def submit(pool, fn, *args, **kwargs):
+    """pool.submit() that carries the active run and open spans into the worker thread."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def load_run_report(path):
+    """Run report written by RunTelemetry.export_json, or None if missing or unreadable."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def spans_frame(report):
+    # pandas is only needed to display or compare reports, not to record them
+    import pandas as pd
+    columns = ['name', 'parent', 'wall_s'] + SPAN_COUNTERS + ['peak_rss_mb', 'rss_growth_mb']
+    df = pd.DataFrame(report.get("spans") or [])
+    for col in columns:
+        if col not in df.columns:
+            df[col] = None
+    return df[columns + [c for c in df.columns if c not in columns]]
+
+
+def compare_runs(previous, current):
+    """
+    Stage by stage comparison of two run reports (top-level spans, summed by name):
+    wall time and requests of both runs and the wall time change in percent.
+    """
+    def by_stage(report):
+        df = spans_frame(report)
+        df = df[df['parent'].isna()]
+        return df.groupby('name', sort=False)[['wall_s', 'requests']].sum()
+
+    prev, cur = by_stage(previous), by_stage(current)
+    out = cur.join(prev, how='outer', lsuffix='', rsuffix='_previous')
+    before = out['wall_s_previous'].where(out['wall_s_previous'] > 0)
+    out['wall_change_pct'] = ((out['wall_s'] / before - 1) * 100).round(1)
+    return out[['wall_s_previous', 'wall_s', 'wall_change_pct', 'requests_previous', 'requests']]
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+
+def series_matrix(series_by_keyword):
+    """
+    Loads Google Trends series ({ keyword: [{'date_from', 'date_to', 'values': [v]}, ...] })
+    into a keywords x time points grid, aligned on the union of the point dates.
+    Returns (keywords, dates, values, present): dates as datetime64[D], values as float64
+    with NaN where a keyword has no value, and `present` marking the points each series has
+    (a point can be present with an empty value).
+    """
+    keywords = list(series_by_keyword)
+    nan = float('nan')
+    # Flatten all points once, then scatter them into the grid with NumPy
+    lengths = [len(points) for points in series_by_keyword.values()]
+    point_dates = [p.get('date_from') for points in series_by_keyword.values() for p in points]
+    point_values = np.array([
+        v[0] if v and v[0] is not None else nan
+        for points in series_by_keyword.values() for v in (p.get('values') for p in points)
+    ], dtype='float64')
+    columns, dates = pd.factorize(pd.Series(point_dates, dtype=object), sort=True)
+    point_rows = np.repeat(np.arange(len(keywords)), lengths)
+    known = columns >= 0
+
+    values = np.full((len(keywords), len(dates)), np.nan)
+    present = np.zeros((len(keywords), len(dates)), dtype=bool)
+    values[point_rows[known], columns[known]] = point_values[known]
+    present[point_rows[known], columns[known]] = True
+    return keywords, np.asarray(dates, dtype='datetime64[D]'), values, present
+
+
+def _last_true(mask):
+    """Index of the last True of every row (-1 if none)."""
+    idx = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    return np.where(mask.any(axis=1), idx, -1)
+
+
+def _first_true(mask):
+    return np.where(mask.any(axis=1), np.argmax(mask, axis=1), -1)
+
+
+def _forward_fill(values):
+    """NaNs replaced by the last valid value on their left (row-wise)."""
+    idx = np.where(~np.isnan(values), np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return values[np.arange(values.shape[0])[:, None], idx]
+
+
+def _delta(values, filled, dates, last_valid, days):
+    """Last valid value minus the value `days` days before it (NaN when out of range)."""
+    rows = np.arange(values.shape[0])
+    has = last_valid >= 0
+    last_dates = dates[np.maximum(last_valid, 0)]
+    back = np.searchsorted(dates, last_dates - np.timedelta64(days, 'D'), side='right') - 1
+    ok = has & (back >= 0)
+    delta = np.full(values.shape[0], np.nan)
+    delta[ok] = values[rows[ok], last_valid[ok]] - filled[rows[ok], back[ok]]
+    return delta
+
+
+def trend_metrics(series_by_keyword):
+    """
+    Computes the trend metrics of many series in one vectorized pass.
+    Returns a DataFrame indexed by keyword with:
+    - last_value / year_trend / data_points: as analyze_trend always reported (last vs first point)
+    - slope_per_week: least-squares slope of the values, in points per week
+    - delta_7d / delta_30d: last value minus the value 7 / 30 days before it
+    - peak_month: month of the highest value (seasonality peak)
+    - volatility: coefficient of variation (std / mean) of the values
+    Google Trends values are relative to the busiest keyword of the task that fetched them
+    (100 = its peak). Series fetched one keyword per task (the default of fetch_keyword_trends,
+    and always with a cache or trend store) are each on their own scale: the metrics describe
+    every keyword against its own peak, so they compare as shapes (rising, falling, volatile)
+    but not as volumes. With several keywords per task, last_value, the deltas and the slope
+    are only comparable between the keywords of the same task.
+    """
+    columns = ['last_value', 'year_trend', 'data_points', 'slope_per_week', 'delta_7d', 'delta_30d', 'peak_month', 'volatility']
+    keywords, dates, values, present = series_matrix(series_by_keyword)
+    if not keywords or not len(dates):
+        return pd.DataFrame(
+            {'last_value': 0, 'year_trend': 'Down', 'data_points': 0},
+            index=pd.Index(keywords, name='keyword'), columns=columns
+        )
+    rows = np.arange(len(keywords))
+    valid = ~np.isnan(values)
+    zeros = np.nan_to_num(values)
+
+    # Backwards compatible fields: last and first point of each series (missing value -> 0)
+    last_point = _last_true(present)
+    first_point = _first_true(present)
+    last_value = np.where(last_point >= 0, zeros[rows, np.maximum(last_point, 0)], 0)
+    first_value = np.where(first_point >= 0, zeros[rows, np.maximum(first_point, 0)], 0)
+
+    # Least squares slope over the valid points, x in weeks from the first date
+    x = (dates - dates[0]).astype('float64') / 7.0
+    n = valid.sum(axis=1)
+    sx = (valid * x).sum(axis=1)
+    sy = zeros.sum(axis=1)
+    sxx = (valid * x * x).sum(axis=1)
+    sxy = (zeros * x).sum(axis=1)
+    denom = n * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denom > 0, (n * sxy - sx * sy) / denom, np.nan)
+        mean = np.where(n > 0, sy / np.maximum(n, 1), np.nan)
+        var = np.where(n > 0, (valid * (zeros - mean[:, None]) ** 2).sum(axis=1) / np.maximum(n, 1), np.nan)
+        volatility = np.where(mean > 0, np.sqrt(var) / mean, np.nan)
+
+    last_valid = _last_true(valid)
+    filled = _forward_fill(values)
+    delta_7d = _delta(values, filled, dates, last_valid, 7)
+    delta_30d = _delta(values, filled, dates, last_valid, 30)
+
+    peak = np.argmax(np.where(valid, values, -np.inf), axis=1)
+    peak_month = pd.DatetimeIndex(dates[peak]).strftime('%b %Y').to_numpy(dtype=object)
+    peak_month[n == 0] = None
+
+    return pd.DataFrame({
+        'last_value': last_value,
+        'year_trend': np.where(last_value > first_value, 'Up', 'Down'),
+        'data_points': present.sum(axis=1),
+        'slope_per_week': slope.round(3),
+        'delta_7d': delta_7d,
+        'delta_30d': delta_30d,
+        'peak_month': peak_month,
+        'volatility': volatility.round(3),
+    }, index=pd.Index(keywords, name='keyword'))
+
+
+def analyze_series_batch(series_by_keyword):
+    """
+    { keyword: series } -> { keyword: metrics dict } with plain Python values (None for
+    missing), ready for the trends dictionary consumed by generate_report.
+    Empty series get {"trend": "No Data"}, as in fetch_keyword_trends.
+    """
+    non_empty = {kw: s for kw, s in series_by_keyword.items() if s}
+    results = {kw: {"trend": "No Data"} for kw in series_by_keyword if kw not in non_empty}
+    if non_empty:
+        metrics = trend_metrics(non_empty).astype(object)
+        metrics = metrics.where(pd.notna(metrics), None)
+        for kw, row in zip(metrics.index, metrics.to_dict('records')):
+            row['last_value'] = _plain(row['last_value'])
+            row['data_points'] = int(row['data_points'])
+            for col in ['slope_per_week', 'delta_7d', 'delta_30d', 'volatility']:
+                row[col] = _plain(row[col])
+            results[kw] = row
+    return results
+
+
+def _plain(value):
+    """numpy scalar -> int/float (int when integral, as the API values are)."""
+    if value is None:
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else value
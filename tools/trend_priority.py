@@ -0,0 +1,64 @@
+import numpy as np
+
+# Share of the impressions expected to become clicks at position 1; at position p the
+# expectation is EXPECTED_TOP_CTR / p (a rough CTR curve, only used to rank queries)
+EXPECTED_TOP_CTR = 0.1
+
+# Position used when a query has none (aggregate_queries reports it as 0)
+MISSING_POSITION = 100.0
+
+
+def query_values(table):
+    """
+    Value of every query for the trend enrichment, from the per-query table of Step 2
+    (aggregate_queries): observed clicks plus the clicks its impressions are expected to
+    bring at its average position, so a query with many impressions near the top ranks
+    high even before it gets clicks.
+    Returns { query: value }.
+    """
+    if table.empty:
+        return {}
+    clicks = table['clicks'].to_numpy(dtype='float64')
+    impressions = table['impressions'].to_numpy(dtype='float64')
+    position = table['average_position'].to_numpy(dtype='float64')
+    position = np.where(position >= 1, position, MISSING_POSITION)
+    value = clicks + impressions * EXPECTED_TOP_CTR / position
+    return dict(zip(table['query'], value))
+
+
+def rank_keywords(query_index, values):
+    """
+    Trend keywords of a QueryIndex (one per group of variants), highest value first: a group
+    is worth the summed value of its variants, since one keyword serves all of them.
+    Ties go to the alphabetically first keyword.
+    Only the Search Console values (query_values) are used: trend metrics are relative to
+    each keyword's own peak (see trend_analytics.trend_metrics) and never rank keywords.
+    """
+    scored = [
+        (-sum(values.get(q, 0.0) for q in variants), query_index.representative[key])
+        for key, variants in query_index.groups.items()
+    ]
+    return [keyword for _, keyword in sorted(scored)]
+
+
+def trend_coverage(queries, trends, values):
+    """
+    How much of the selection got a trend: { 'queries', 'enriched', 'missing', 'value_share' },
+    value_share being the share of the selection's value (see query_values) covered.
+    """
+    queries = list(queries)
+    enriched = [q for q in queries if q in trends and trends[q].get("trend") != "Error"]
+    total_value = sum(values.get(q, 0.0) for q in queries)
+    enriched_value = sum(values.get(q, 0.0) for q in enriched)
+    return {
+        "queries": len(queries),
+        "enriched": len(enriched),
+        "missing": len(queries) - len(enriched),
+        "value_share": round(enriched_value / total_value, 4) if total_value > 0 else (1.0 if len(enriched) == len(queries) else 0.0),
+    }
+
+
+def coverage_line(coverage):
+    share = coverage["enriched"] / coverage["queries"] if coverage["queries"] else 1.0
+    return (f"Trend coverage: {coverage['enriched']}/{coverage['queries']} queries ({share:.0%}), "
+            f"{coverage['value_share']:.0%} of their value")
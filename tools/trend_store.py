@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date
+
+from tools.response_cache import DEFAULT_CACHE_DIR, ttl_for_period
+
+# v2: one keyword per task, every series on its own scale (v1 rows were scaled against the
+# other keywords of their task and are not read any more)
+DEFAULT_STORE_PATH = os.path.join(DEFAULT_CACHE_DIR, "trends_v2.sqlite")
+
+# SQLite's default limit on bound parameters is 999
+_LOOKUP_CHUNK = 500
+
+
+def encode_series(points):
+    """
+    Compact storage of a Google Trends series ([{'date_from', 'date_to', 'values': [v]}, ...]):
+    column-wise, dates as day offsets from the first date, zlib-compressed.
+    Series that don't fit that shape are stored as plain JSON.
+    """
+    try:
+        if any(set(p) - {'date_from', 'date_to', 'values'} or len(p.get('values') or []) > 1 for p in points):
+            raise ValueError("not a plain series")
+        origin = date.fromisoformat(points[0]['date_from']) if points else None
+        body = {
+            "o": origin.isoformat() if origin else None,
+            "f": [(date.fromisoformat(p['date_from']) - origin).days for p in points],
+            "t": [(date.fromisoformat(p['date_to']) - origin).days for p in points],
+            "v": [p['values'][0] if p.get('values') else None for p in points],
+        }
+    except (KeyError, TypeError, ValueError):
+        body = {"raw": points}
+    return zlib.compress(json.dumps(body, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def decode_series(blob):
+    body = json.loads(zlib.decompress(blob).decode("utf-8"))
+    if "raw" in body:
+        return body["raw"]
+    if body["o"] is None:
+        return []
+    origin = date.fromisoformat(body["o"]).toordinal()
+    return [
+        {
+            'date_from': date.fromordinal(origin + f).isoformat(),
+            'date_to': date.fromordinal(origin + t).isoformat(),
+            'values': [v] if v is not None else [],
+        }
+        for f, t, v in zip(body["f"], body["t"], body["v"])
+    ]
+
+
+class TrendStore:
+    """
+    Local knowledge base of raw Google Trends series, shared by every property and run.
+    Series are keyed on (keyword, location_code, language_code, date_from, date_to) and
+    kept until their date range can still change (see ttl_for_period): closed ranges for
+    30 days, open ones for an hour. Unlike ResponseCache entries they are never evicted
+    to make room for other data.
+    Every DataForSEO task holds a single keyword (see fetch_keyword_trends), so each stored
+    series is on its own 0-100 scale and can be reused whatever keywords it is shown with.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS series (
+                keyword TEXT NOT NULL,
+                location_code INTEGER NOT NULL,
+                language_code TEXT NOT NULL,
+                date_from TEXT NOT NULL,
+                date_to TEXT NOT NULL,
+                points BLOB NOT NULL,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (location_code, language_code, date_from, date_to, keyword)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keywords, location_code, language_code, date_from, date_to):
+        """Returns { keyword: series } for the keywords stored and still valid (one query per 500 keywords)."""
+        keywords = list(dict.fromkeys(keywords))
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keywords), _LOOKUP_CHUNK):
+                chunk = keywords[start:start + _LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"""SELECT keyword, points FROM series
+                        WHERE location_code = ? AND language_code = ? AND date_from = ? AND date_to = ?
+                          AND expires_at >= ? AND keyword IN ({",".join("?" * len(chunk))})""",
+                    (location_code, language_code, date_from, date_to, now, *chunk)
+                ).fetchall()
+                for keyword, blob in rows:
+                    found[keyword] = decode_series(blob)
+            self.hits += len(found)
+            self.misses += len(keywords) - len(found)
+        return found
+
+    def upsert_many(self, series_by_keyword, location_code, language_code, date_from, date_to, ttl=None):
+        """Stores { keyword: series } in one transaction, replacing older versions."""
+        if not series_by_keyword:
+            return
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else ttl_for_period(date_to))
+        rows = [
+            (kw, location_code, language_code, date_from, date_to, encode_series(points or []), now, expires_at)
+            for kw, points in series_by_keyword.items()
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM series WHERE expires_at < ?", (time.time(),)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM series").fetchone()[0]
+
+    def stats_line(self):
+        return f"Trend store: {self.hits} hit / {self.misses} miss ({self.count()} series stored)"
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_trend_store():
+    """Process-wide store in DEFAULT_STORE_PATH."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = TrendStore()
+        return _default_store